@@ -0,0 +1,65 @@
+"""Check that starting the app stays cheap.
+
+Run from the repository root:
+
+    python -m benchmarks.import_budget [--budget 0.5]
+
+Imports each entry module in a fresh interpreter with `-X importtime` and
+fails if any heavy dependency gets imported eagerly or if the cumulative
+import time exceeds the budget (in seconds).
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+ENTRY_MODULES = ["main", "cli"]
+# Only the menu option or subcommand that needs these may import them
+DEFERRED_MODULES = ["yfinance", "matplotlib", "scipy.optimize", "pandas"]
+
+PROBE = """
+import json, sys
+import {module}
+print(json.dumps([name for name in {deferred!r} if name in sys.modules]))
+"""
+
+
+def measure(module):
+    """Return (cumulative import seconds, eagerly loaded deferred modules) for one module."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module, deferred=DEFERRED_MODULES)],
+        capture_output=True, text=True, check=True,
+    )
+    total_us = 0
+    for line in completed.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"; top-level lines have no indent
+        parts = line.split("|")
+        if len(parts) == 3 and parts[0].startswith("import time:") and not parts[2].startswith("  "):
+            value = parts[1].strip()
+            if value.isdigit():
+                total_us += int(value)
+    loaded = json.loads(completed.stdout.strip().splitlines()[-1])
+    return total_us / 1e6, loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=0.5, help="max cumulative import seconds per module")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in ENTRY_MODULES:
+        seconds, loaded = measure(module)
+        status = "ok"
+        if loaded:
+            status = f"eagerly imports {', '.join(loaded)}"
+            failed = True
+        elif seconds > args.budget:
+            status = f"over budget ({args.budget:.2f}s)"
+            failed = True
+        print(f" import {module:<6} {seconds:.3f}s  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
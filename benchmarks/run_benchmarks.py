@@ -0,0 +1,227 @@
+"""Benchmark the portfolio hot paths against an offline synthetic market.
+
+Run from the repository root:
+
+    python -m benchmarks.run_benchmarks                   # quick profile, compare to baseline
+    python -m benchmarks.run_benchmarks --profile full    # adds 1000 assets and 10y history
+    python -m benchmarks.run_benchmarks --update-baseline # record new baseline numbers
+
+Each case is timed (best of --repeat runs after a warm-up) and its peak
+Python memory is measured with tracemalloc. The exit status is 1 if any case
+is slower or uses more memory than the stored baseline by more than
+--tolerance.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from models.asset import Asset
+from models.ledger import Ledger
+from models.covariance import ESTIMATORS, CovarianceModel
+from models.live_valuation import LiveValuation
+from models.portfolio import Portfolio
+from services import price_fetcher
+from services.price_store import PriceStore
+from services.quote_engine import QuoteEngine
+from services.synthetic_provider import SyntheticMarketProvider
+from views.table_view import HoldingsTable
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+PROFILES = {
+    "quick": {"assets": [10, 100], "periods": ["1y"], "paths": [1_000, 100_000], "optimize": [10, 100],
+              "trades": [100_000], "backtest": [(20, "5y")]},
+    "full": {"assets": [10, 100, 1000], "periods": ["1y", "10y"], "paths": [1_000, 100_000],
+             "optimize": [10, 100, 1000], "trades": [100_000, 1_000_000],
+             "backtest": [(20, "5y"), (100, "10y")]},
+}
+
+
+def build_portfolio(provider, num_assets):
+    """A portfolio with one lot per synthetic ticker, priced at the last close."""
+    portfolio = Portfolio()
+    for i, ticker in enumerate(provider.tickers(num_assets)):
+        asset = Asset(ticker, provider.info(ticker)["sector"], "Equity", 10 + i % 90, 100.0)
+        asset.update_price(provider.quote(ticker))
+        portfolio.holdings.add(asset)
+    return portfolio
+
+
+def build_ledger(provider, num_trades, num_tickers=500):
+    """A trade log of buys followed by partial sells, as saved ledger columns."""
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    tickers = provider.tickers(num_tickers)
+    buys = num_trades - num_trades // 4
+    columns = {
+        "date": np.sort(rng.integers(0, 20_000, num_trades)),
+        "ticker": rng.integers(0, num_tickers, num_trades),
+        "kind": np.where(np.arange(num_trades) < buys, 0, 1),
+        "quantity": np.where(np.arange(num_trades) < buys, 10.0, 1.0),
+        "price": rng.uniform(10, 200, num_trades),
+        "fees": np.zeros(num_trades),
+    }
+    return Ledger.from_columns(columns, tickers)
+
+
+def make_cases(profile, provider):
+    """Yield (name, callable) pairs for every benchmark case in a profile."""
+    for num_assets in profile["assets"]:
+        portfolio = build_portfolio(provider, num_assets)
+        engine = QuoteEngine(max_workers=16, retries=0)
+
+        yield f"update_prices[{num_assets}]", lambda p=portfolio, e=engine: e.refresh(p.assets)
+        yield f"portfolio_summary[{num_assets}]", portfolio.portfolio_summary
+        yield (f"holdings_page[{num_assets}]",
+               lambda p=portfolio: HoldingsTable(p.holdings, sort="current_value", descending=True).render())
+
+        for period in profile["periods"]:
+            portfolio.returns_matrix(period=period)  # Fill the price store before timing
+
+            def fill_store(tickers=tuple(portfolio.tickers()), period=period):
+                # Downloads are reused from the fetch scheduler, so this times storing closes and actions
+                store = PriceStore(":memory:", price_fetcher.download_history, price_fetcher.download_histories)
+                return store.get_histories(tickers, period=period)
+
+            yield f"price_store_fill[{num_assets},{period}]", fill_store
+
+            def build_matrix(p=portfolio, period=period):
+                p.invalidate_cache()
+                return p.returns_matrix(period=period)
+
+            yield f"returns_matrix[{num_assets},{period}]", build_matrix
+            yield (f"risk_metrics[{num_assets},{period}]",
+                   lambda p=portfolio, period=period: p.calculate_portfolio_risk_metrics(period=period))
+            yield (f"value_history[{num_assets},{period}]",
+                   lambda p=portfolio, period=period: p.value_history(period=period))
+
+            values = portfolio.returns_matrix(period=period).values
+            for estimator in ESTIMATORS:
+                # Fit, then one ex-ante style solve against the fresh estimate
+                yield (f"covariance[{num_assets},{period},{estimator}]",
+                       lambda v=values, e=estimator: CovarianceModel.fit(v, e).solve([1.0] * v.shape[1]))
+
+        for paths in profile["paths"]:
+            yield (f"monte_carlo[{num_assets},{paths}]",
+                   lambda p=portfolio, n=paths: p.monte_carlo_simulation(num_simulations=n, seed=1))
+        yield (f"monte_carlo_multivariate[{num_assets},1000]",
+               lambda p=portfolio: p.monte_carlo_simulation(num_simulations=1000, model="multivariate", seed=1))
+
+        if num_assets in profile["optimize"]:
+            yield f"optimize[{num_assets}]", portfolio.optimize_portfolio
+        yield (f"stress_test[{num_assets},10000]",
+               lambda p=portfolio: p.stress_test(num_simulations=10_000, seed=1))
+
+        # 100 rounds of one tick per ticker, alternating up and down so every tick moves a price
+        prices = dict(zip(portfolio.tickers(), portfolio.holdings.column("current_price").tolist()))
+        ticks = [(ticker, price * (1.001 if round_ % 2 else 0.999), 0.0)
+                 for round_ in range(100) for ticker, price in prices.items()]
+        yield (f"live_ticks[{num_assets},{len(ticks)}]",
+               lambda p=portfolio, t=ticks: LiveValuation(p.holdings, p.ledger).apply(t))
+
+    for num_assets, period in profile["backtest"]:
+        portfolio = build_portfolio(provider, num_assets)
+        portfolio.returns_matrix(period=period)  # Fill the price store before timing
+        yield (f"backtest[{num_assets},{period}]",
+               lambda p=portfolio, period=period: p.backtest(period=period))
+
+    for num_trades in profile["trades"]:
+        ledger = build_ledger(provider, num_trades)
+        yield f"ledger_replay[{num_trades},fifo]", lambda l=ledger: l.replay("fifo")
+        yield f"ledger_replay[{num_trades},average]", lambda l=ledger: l.replay("average")
+
+
+def measure(function, repeat):
+    """Return (best seconds, peak MiB) for a callable."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        function()  # Warm-up
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            best = min(best, time.perf_counter() - start)
+
+        tracemalloc.start()
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return best, peak / 1024 ** 2
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of human readable regressions against the baseline."""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        # Tiny timings are dominated by noise, so allow a small absolute slack as well
+        if result["seconds"] > reference["seconds"] * (1 + tolerance) + 0.005:
+            regressions.append(f"{name}: {result['seconds']:.4f}s vs baseline {reference['seconds']:.4f}s")
+        if result["peak_mb"] > reference["peak_mb"] * (1 + tolerance) + 1.0:
+            regressions.append(f"{name}: {result['peak_mb']:.1f} MiB vs baseline {reference['peak_mb']:.1f} MiB")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="quick")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative slowdown (0.5 = 50%%)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--filter", help="only run cases whose name contains this text")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    provider = SyntheticMarketProvider(seed=42)
+    price_fetcher.set_provider(provider)
+
+    results = {}
+    print(f"{'case':<42}{'seconds':>12}{'peak MiB':>12}")
+    for name, function in make_cases(PROFILES[args.profile], provider):
+        if args.filter and args.filter not in name:
+            continue
+        seconds, peak_mb = measure(function, args.repeat)
+        results[name] = {"seconds": round(seconds, 6), "peak_mb": round(peak_mb, 3)}
+        print(f"{name:<42}{seconds:>12.4f}{peak_mb:>12.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("\nNo baseline found; run with --update-baseline to create one.")
+        return 0
+
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    if regressions:
+        print("\nRegressions:")
+        for line in regressions:
+            print(f" {line}")
+        return 1
+    print("\nNo regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
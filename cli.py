@@ -0,0 +1,309 @@
+"""Non-interactive command line: python main.py <command> [options].
+
+Examples:
+    python main.py summary
+    python main.py pnl --format csv
+    python main.py holdings --sector Technology --sort current_value --descending --top 20
+    python main.py holdings --group-by sector --format csv --output sectors.csv
+    python main.py --portfolio a.npz --portfolio b.npz risk --format csv
+    python main.py montecarlo --simulations 100000 --seed 7 --output mc.json
+    python main.py charts --image-format svg
+    python main.py backtest --period 10y --rebalance 63 --workers 4
+    python main.py stress --sector-shock Technology=-0.25 --market -0.1 --simulations 20000 --workers 4
+    python main.py watch --duration 300 --interval 10
+    python main.py --portfolio a.npz --portfolio b.npz batch --workers 4 --format csv
+    python main.py --metrics metrics.json --profile run.prof risk
+"""
+import argparse
+import contextlib
+import csv
+import json
+import sys
+
+from services import metrics
+from services.portfolio_store import DEFAULT_PORTFOLIO_PATH
+
+
+# Mirrors models.covariance.ESTIMATORS without importing the analytics stack for --help
+COVARIANCE_ESTIMATORS = ["sample", "ewma", "ledoit_wolf", "factor"]
+
+
+def _global_options(suppress=False):
+    """Options accepted both before and after the subcommand name."""
+    options = argparse.ArgumentParser(add_help=False,
+                                      argument_default=argparse.SUPPRESS if suppress else None)
+    options.add_argument("--portfolio", action="append", dest="portfolios", metavar="PATH",
+                         help=f"portfolio file (repeatable, default {DEFAULT_PORTFOLIO_PATH})")
+    options.add_argument("--format", choices=["json", "csv"],
+                         **({} if suppress else {"default": "json"}), help="output format")
+    options.add_argument("--output", help="write results to this file instead of stdout")
+    options.add_argument("--metrics", metavar="PATH",
+                         help="collect timers and counters and write them as JSON to PATH (- for stderr)")
+    options.add_argument("--profile", metavar="PATH",
+                         help="run under cProfile, save the stats to PATH and print the top functions to stderr")
+    return options
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="main.py", description="Portfolio Tracker batch commands.",
+                                     parents=[_global_options()])
+    commands = parser.add_subparsers(dest="command", required=True)
+    common = [_global_options(suppress=True)]
+
+    commands.add_parser("update", parents=common, help="refresh current prices and save the portfolio")
+    watch = commands.add_parser("watch", parents=common,
+                                help="stream live quotes, redrawing value and weights on stderr, then save the prices")
+    watch.add_argument("--duration", type=float, default=60.0, help="seconds to watch")
+    watch.add_argument("--interval", type=float, default=5.0, help="seconds between polls (or replayed days)")
+    watch.add_argument("--replay", metavar="PERIOD", help="replay stored daily closes over PERIOD instead of polling")
+    watch.add_argument("--top", type=int, default=10, help="largest positions to show and report")
+    watch.add_argument("--refresh", type=float, default=0.5, help="minimum seconds between redraws")
+    commands.add_parser("summary", parents=common, help="total value and weights")
+
+    holdings = commands.add_parser("holdings", parents=common,
+                                   help="lots (or totals per ticker, sector or asset class), streamed as JSON or CSV")
+    holdings.add_argument("--sort", choices=["ticker", "sector", "asset_class", "lots", "quantity", "purchase_price",
+                                             "current_price", "transaction_value", "current_value", "weight"])
+    holdings.add_argument("--descending", action="store_true", help="sort largest first")
+    holdings.add_argument("--sector", help="only lots in this sector")
+    holdings.add_argument("--asset-class", help="only lots of this asset class")
+    holdings.add_argument("--prefix", help="only tickers starting with this")
+    holdings.add_argument("--group-by", choices=["ticker", "sector", "asset_class"], help="sum lots per group")
+    holdings.add_argument("--top", type=int,
+                          help="keep the N largest rows (or the first N by --sort) and fold the rest into Other")
+    holdings.add_argument("--page", type=int, help="only this page of rows")
+    holdings.add_argument("--page-size", type=int, default=50)
+    holdings.add_argument("--table", action="store_true", help="print the page as a text table")
+    commands.add_parser("pnl", parents=common, help="realized and unrealized P&L from the transaction ledger")
+
+    risk = commands.add_parser("risk", parents=common, help="Sharpe, Sortino, volatility, drawdown, beta and VaR")
+    risk.add_argument("--risk-free-rate", type=float, default=0.03)
+    risk.add_argument("--benchmark", default="SPY", help="ticker used for beta")
+    risk.add_argument("--covariance", choices=COVARIANCE_ESTIMATORS, default="sample",
+                      help="covariance estimator")
+
+    montecarlo = commands.add_parser("montecarlo", parents=common, help="Monte Carlo value projection")
+    montecarlo.add_argument("--simulations", type=int, default=1000, dest="num_simulations")
+    montecarlo.add_argument("--days", type=int, default=252)
+    montecarlo.add_argument("--model", choices=["single", "multivariate"], default="single")
+    montecarlo.add_argument("--seed", type=int)
+    montecarlo.add_argument("--workers", type=int, default=1)
+    montecarlo.add_argument("--covariance", choices=COVARIANCE_ESTIMATORS, default="sample",
+                            help="covariance estimator")
+
+    optimize = commands.add_parser("optimize", parents=common, help="optimal allocation")
+    optimize.add_argument("--objective", choices=["min_volatility", "max_sharpe", "risk_parity"],
+                          default="min_volatility")
+    optimize.add_argument("--risk-free-rate", type=float, default=0.03)
+    optimize.add_argument("--covariance", choices=COVARIANCE_ESTIMATORS, default="sample",
+                          help="covariance estimator")
+
+    backtest = commands.add_parser("backtest", parents=common,
+                                   help="walk-forward backtest of periodically rebalanced allocations")
+    backtest.add_argument("--objectives", nargs="+", choices=["min_volatility", "max_sharpe", "risk_parity",
+                                                              "equal_weight"],
+                          default=["min_volatility", "max_sharpe", "equal_weight"])
+    backtest.add_argument("--period", default="5y", help="history to backtest over, e.g. 5y, 10y, max")
+    backtest.add_argument("--window", type=int, default=252, help="estimation window in trading days")
+    backtest.add_argument("--rebalance", type=int, default=21, dest="rebalance_every",
+                          help="trading days between rebalances")
+    backtest.add_argument("--cost-bps", type=float, default=10.0, help="transaction cost per unit traded, in bps")
+    backtest.add_argument("--risk-free-rate", type=float, default=0.03)
+    backtest.add_argument("--workers", type=int, default=1, help="processes solving rebalance points")
+    backtest.add_argument("--covariance", choices=COVARIANCE_ESTIMATORS, default="sample",
+                          help="covariance estimator")
+
+    stress = commands.add_parser("stress", parents=common,
+                                 help="P&L under shock scenarios, historical replays and simulated stressed moves")
+    stress.add_argument("--scenario-file", metavar="PATH",
+                        help="JSON {name: {market, rates, sectors, asset_classes, tickers}} of scenarios to run")
+    stress.add_argument("--market", type=float, help="custom scenario: benchmark return, scaled by each beta")
+    stress.add_argument("--rates", type=float, help="custom scenario: yield change in percentage points")
+    stress.add_argument("--sector-shock", action="append", default=[], metavar="SECTOR=RETURN")
+    stress.add_argument("--class-shock", action="append", default=[], metavar="CLASS=RETURN")
+    stress.add_argument("--ticker-shock", action="append", default=[], metavar="TICKER=RETURN")
+    stress.add_argument("--historical", nargs="*", metavar="NAME|START:END",
+                        help="historical windows to replay (default all named ones; none if given empty)")
+    stress.add_argument("--simulations", type=int, default=0, dest="num_simulations",
+                        help="simulated scenarios drawn from the covariance estimate")
+    stress.add_argument("--days", type=int, default=21, help="horizon of simulated scenarios in trading days")
+    stress.add_argument("--stress", type=float, default=1.0, help="volatility multiplier for simulated scenarios")
+    stress.add_argument("--confidence", type=float, default=0.95)
+    stress.add_argument("--seed", type=int)
+    stress.add_argument("--workers", type=int, default=1, help="processes evaluating scenario blocks")
+    stress.add_argument("--period", default="1y", help="history for betas, rate sensitivities and covariance")
+    stress.add_argument("--covariance", choices=COVARIANCE_ESTIMATORS, default="sample",
+                        help="covariance estimator")
+    stress.add_argument("--benchmark", default="SPY", help="ticker the market shock is applied to")
+    stress.add_argument("--rate-proxy", default="^TNX", help="yield index the rate shock is applied to")
+
+    charts = commands.add_parser("charts", parents=common, help="render charts to image files")
+    charts.add_argument("--output-dir", default=None, help="directory for the images (default data/charts)")
+    charts.add_argument("--image-format", choices=["png", "svg"], default="png")
+    charts.add_argument("--simulations", type=int, default=1000, dest="num_simulations")
+    charts.add_argument("--seed", type=int, default=0, help="Monte Carlo seed (fixed so unchanged charts are reused)")
+    charts.add_argument("--period", default="6mo", help="history lookback, e.g. 6mo, 1y, 10y")
+
+    batch = commands.add_parser("batch", parents=common,
+                                help="run several analytics over every portfolio in parallel with one price fetch")
+    batch.add_argument("--commands", nargs="+", choices=["summary", "pnl", "risk", "montecarlo", "optimize"],
+                       default=["summary", "risk", "montecarlo", "optimize"])
+    batch.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    batch.add_argument("--period", default="1y", help="history lookback for risk, Monte Carlo and optimization")
+    batch.add_argument("--benchmark", default="SPY", help="ticker used for beta")
+    batch.add_argument("--simulations", type=int, default=1000, dest="num_simulations")
+    batch.add_argument("--seed", type=int)
+    return parser
+
+
+def _flatten(value, prefix=""):
+    """Yield (dotted key, scalar) pairs from nested dicts."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _flatten(item, f"{prefix}.{key}" if prefix else str(key))
+    else:
+        yield prefix, value
+
+
+def write_results(results, fmt, stream):
+    """Write {portfolio: result} as JSON or as portfolio,key,value CSV rows."""
+    if fmt == "json":
+        json.dump(results, stream, indent=2, default=float)
+        stream.write("\n")
+        return
+
+    writer = csv.writer(stream)
+    writer.writerow(["portfolio", "key", "value"])
+    for path, result in results.items():
+        for key, value in _flatten(result):
+            writer.writerow([path, key, value])
+
+
+def _shocks(pairs, option):
+    """Parse repeated LABEL=RETURN options into {label: return}."""
+    shocks = {}
+    for pair in pairs:
+        label, _, value = pair.rpartition("=")
+        try:
+            shocks[label] = float(value)
+        except ValueError:
+            raise SystemExit(f"main.py stress: error: {option} expects LABEL=RETURN, got {pair!r}")
+    return shocks
+
+
+def stress_scenarios(args):
+    """Pop the scenario options and return the scenarios dict, or None for the standard set."""
+    path = args.pop("scenario_file")
+    custom = {"market": args.pop("market"), "rates": args.pop("rates"),
+              "sectors": _shocks(args.pop("sector_shock"), "--sector-shock"),
+              "asset_classes": _shocks(args.pop("class_shock"), "--class-shock"),
+              "tickers": _shocks(args.pop("ticker_shock"), "--ticker-shock")}
+    custom = {key: value for key, value in custom.items() if value}
+
+    scenarios = None
+    if path:
+        with open(path) as f:
+            scenarios = json.load(f)
+    if custom:
+        scenarios = dict(scenarios or {}, custom=custom)
+    return scenarios
+
+
+def write_holdings(paths, fmt, stream, page=None, page_size=50, table=False, **options):
+    """Write the holdings table of every portfolio, streaming the rows instead of collecting them first.
+
+    A portfolio that cannot be loaded, or options its holdings reject, gets
+    {"error": message} in JSON; table and CSV output report it on stderr.
+    """
+    from services.portfolio_store import load_portfolio
+    from views.table_view import HoldingsTable
+
+    start, stop = (0, None) if page is None else ((page - 1) * page_size, page * page_size)
+    if fmt == "json" and not table:
+        stream.write("{")
+    header = True
+    for i, path in enumerate(paths):
+        try:
+            holdings = HoldingsTable(load_portfolio(path).holdings, **options)
+        except (OSError, ValueError) as e:
+            error = f"{type(e).__name__}: {e}"
+            if fmt == "json" and not table:
+                stream.write(("\n  " if i == 0 else ",\n  ") + json.dumps(path) + ": " + json.dumps({"error": error}))
+            else:
+                print(f" {path}: {error}", file=sys.stderr)
+            continue
+        if table:
+            stream.write(f" {path}\n{holdings.render(page or 1, page_size)}\n")
+        elif fmt == "csv":
+            holdings.write_csv(stream, portfolio=path, header=header, start=start, stop=stop)
+            header = False
+        else:
+            stream.write(("\n  " if i == 0 else ",\n  ") + json.dumps(path) + ": ")
+            holdings.write_json(stream, start, stop)
+    if fmt == "json" and not table:
+        stream.write("\n}\n")
+
+
+def run(argv=None):
+    """Parse arguments, run the command on every portfolio and write the results."""
+    # Imported here so `--help` and argument errors return without loading the analytics stack
+    from controllers import portfolio_api
+
+    parser = build_parser()
+    args = vars(parser.parse_args(argv))
+    command = args.pop("command")
+    paths = args.pop("portfolios") or [DEFAULT_PORTFOLIO_PATH]
+    fmt = args.pop("format")
+    output = args.pop("output")
+    metrics_path = args.pop("metrics") or metrics.env_path()
+    profile_path = args.pop("profile")
+
+    if metrics_path:
+        metrics.reset()
+        metrics.enable()
+    profiler = None
+    if profile_path:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        if command == "batch":
+            from controllers.batch_runner import run_batch
+
+            montecarlo = {"num_simulations": args.pop("num_simulations"), "seed": args.pop("seed")}
+            results = run_batch(paths, options={"montecarlo": montecarlo}, **args)
+        elif command == "holdings":
+            # Rows are written as they are formatted, so there is no results dict to write afterwards
+            with open(output, "w", newline="") if output else contextlib.nullcontext(sys.stdout) as stream:
+                write_holdings(paths, fmt, stream, **args)
+            return 0
+        elif command == "stress":
+            results = portfolio_api.run_many(command, paths, scenarios=stress_scenarios(args), **args)
+        elif command == "watch":
+            from views.cli_view import LiveDisplay
+
+            display = LiveDisplay(min_interval=args.pop("refresh"), top=args["top"], stream=sys.stderr)
+            results = portfolio_api.run_many(command, paths, save=True, display=display, **args)
+        else:
+            results = portfolio_api.run_many(command, paths, save=command == "update", **args)
+    except (OSError, ValueError) as e:
+        # A scenario file that cannot be read is reported like a bad argument
+        parser.error(str(e))
+    finally:
+        if profiler is not None:
+            import pstats
+
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+            pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(25)
+        if metrics_path:
+            metrics.write_json(metrics_path, command=command, argv=argv if argv is not None else sys.argv[1:],
+                               portfolios=paths)
+
+    if output:
+        with open(output, "w", newline="") as f:
+            write_results(results, fmt, f)
+    else:
+        write_results(results, fmt, sys.stdout)
+    return 0
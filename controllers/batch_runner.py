@@ -0,0 +1,162 @@
+"""Run analytics over many portfolio files at once and consolidate the results.
+
+Prices are fetched once for the union of every portfolio's tickers, placed in
+a shared memory matrix, and the per-portfolio analytics run in a process pool
+whose workers read prices from that matrix instead of the network.
+"""
+import datetime
+import inspect
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from controllers import portfolio_api
+from models.scenarios import historical_windows
+from services import metrics
+from services.portfolio_store import load_portfolio
+from services.price_fetcher import fetch_historical_prices_many, set_price_store
+from services.price_store import covering_period, period_start
+from services.shared_prices import SharedPriceMatrix
+
+DEFAULT_COMMANDS = ("summary", "risk", "montecarlo", "optimize")
+# Commands that read price history and accept a lookback period
+PERIOD_COMMANDS = ("risk", "montecarlo", "optimize")
+_shared_prices = None  # The worker's attached matrix, kept so its shared memory stays mapped
+
+
+def _init_worker(handle, collect_metrics):
+    """Point this worker's price store at the shared matrix."""
+    global _shared_prices
+    _shared_prices = SharedPriceMatrix.attach(*handle)
+    set_price_store(_shared_prices)
+    metrics.enable(collect_metrics)
+
+
+def _analyze_in_worker(path, commands, period, options):
+    """`analyze` in a pool worker, also returning the metrics collected for this portfolio."""
+    metrics.reset()
+    results = analyze(path, commands, period, options)
+    return results, metrics.state() if metrics.enabled() else None
+
+
+def analyze(path, commands=DEFAULT_COMMANDS, period="1y", options=None):
+    """Run each command on one portfolio file; returns {command: result or {"error": message}}."""
+    options = options or {}
+    portfolio = load_portfolio(path)
+    results = {}
+    for command in commands:
+        command_options = dict(options.get(command, {}))
+        if command in PERIOD_COMMANDS:
+            command_options.setdefault("period", period)
+        try:
+            results[command] = portfolio_api.run(command, portfolio, **command_options)
+        except Exception as e:
+            results[command] = {"error": f"{type(e).__name__}: {e}"}
+    return results
+
+
+def history_needs(commands, period="1y", options=None):
+    """(period, tickers): the longest lookback any of the commands reads and the extra tickers they fetch.
+
+    Commands read the `period` of their options or signature default (the
+    batch `period` for PERIOD_COMMANDS); stress also reaches back to its
+    historical windows and reads its benchmark and rate proxy, and risk its
+    benchmark.
+    """
+    options = options or {}
+    periods, tickers = [period], []
+    for command in commands:
+        function = portfolio_api.COMMANDS.get(command)
+        if function is None:
+            continue
+        settings = {name: parameter.default for name, parameter in inspect.signature(function).parameters.items()}
+        if command in PERIOD_COMMANDS:
+            settings["period"] = period
+        settings.update(options.get(command, {}))
+        if "period" in settings:
+            periods.append(settings["period"])
+        if command == "stress":
+            try:
+                windows = historical_windows(settings["historical"])
+            except ValueError:
+                windows = {}  # Reported by the command itself
+            if windows:
+                periods.append(covering_period(min(datetime.date.fromisoformat(start)
+                                                   for start, _ in windows.values())))
+        tickers += [settings[name] for name in ("benchmark", "rate_proxy") if settings.get(name)]
+    return min(periods, key=period_start), list(dict.fromkeys(tickers))
+
+
+def consolidate(results):
+    """Totals across portfolios: counts, combined value and combined value per ticker."""
+    ticker_values = {}
+    total_value = 0.0
+    failed = []
+    for path, result in results.items():
+        if "error" in result:
+            failed.append(path)
+            continue
+        summary = result.get("summary") or {}
+        value = summary.get("total_value", 0.0)
+        total_value += value
+        for ticker, weight in summary.get("asset_weights", {}).items():
+            ticker_values[ticker] = ticker_values.get(ticker, 0.0) + weight * value
+
+    return {
+        "portfolios": len(results),
+        "failed": failed,
+        "total_value": total_value,
+        "ticker_values": dict(sorted(ticker_values.items(), key=lambda item: -item[1])),
+    }
+
+
+def run_batch(paths, commands=DEFAULT_COMMANDS, workers=None, period="1y", benchmark="SPY", options=None):
+    """Analyze many portfolio files; returns {path: {command: result}, ..., "total": consolidated}.
+
+    `options` maps a command to extra keyword arguments, e.g.
+    {"montecarlo": {"num_simulations": 10000, "seed": 1}}. A portfolio that
+    cannot be loaded gets {"error": message} instead of results.
+    """
+    paths = list(dict.fromkeys(paths))
+    options = dict(options or {})
+    if "risk" in commands:
+        options["risk"] = {"benchmark": benchmark, **options.get("risk", {})}
+
+    results, tickers = {}, {}
+    for path in paths:
+        try:
+            tickers.update(dict.fromkeys(load_portfolio(path).tickers()))
+        except Exception as e:
+            results[path] = {"error": f"{type(e).__name__}: {e}"}
+    # Workers only see the shared matrix, so it must hold everything the commands will read
+    lookback, extra = history_needs(commands, period, options)
+    tickers.update(dict.fromkeys(extra))
+
+    pending = [path for path in paths if path not in results]
+    price_data = fetch_historical_prices_many(list(tickers), period=lookback)
+    workers = workers or min(len(pending), os.cpu_count() or 1)
+
+    if workers <= 1 or len(pending) <= 1:
+        # In process: the regular price store already holds every series fetched above
+        for path in pending:
+            results[path] = analyze(path, commands, period, options)
+    else:
+        matrix = SharedPriceMatrix.create(price_data, start=period_start(lookback))
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(matrix.handle(), metrics.enabled())) as executor:
+                futures = {path: executor.submit(_analyze_in_worker, path, commands, period, options)
+                           for path in pending}
+                for path, future in futures.items():
+                    try:
+                        results[path], collected = future.result()
+                    except Exception as e:
+                        results[path] = {"error": f"{type(e).__name__}: {e}"}
+                        continue
+                    if collected is not None:
+                        metrics.merge(collected)
+        finally:
+            matrix.close()
+
+    report = {path: results[path] for path in paths}
+    report["total"] = consolidate(report)
+    return report
@@ -0,0 +1,186 @@
+"""Programmatic API over a Portfolio: no prompts, no printing, JSON-friendly results.
+
+Every function takes a Portfolio and returns plain dicts of floats/strings, so
+scripts and nightly jobs can run analytics on many portfolios in one process.
+"""
+from services.portfolio_store import load_portfolio, save_portfolio
+from services.quote_engine import QuoteEngine
+
+
+def update_prices(portfolio, quote_engine=None):
+    """Refresh current prices; returns {ticker: new price or None if it failed}."""
+    engine = quote_engine or QuoteEngine()
+    changes = engine.refresh(portfolio.assets)
+    return {asset.ticker: new_price for asset, _, new_price in changes}
+
+
+def watch(portfolio, duration=60.0, interval=5.0, replay=None, feed=None, display=None, quote_engine=None,
+          top=None):
+    """Stream quotes into an incremental valuation for `duration` seconds; returns the final snapshot.
+
+    Quotes are polled every `interval` seconds, or with `replay` (a period
+    such as "1mo") stored daily closes are replayed one day per `interval`.
+    `display` (e.g. a views.cli_view.LiveDisplay) is refreshed after every
+    batch of ticks. The latest prices are written to the holdings when the
+    watch ends, including on Ctrl+C.
+    """
+    import time
+
+    from models.live_valuation import LiveValuation
+    from services.quote_stream import PollingQuoteFeed, ReplayQuoteFeed, TickBuffer
+
+    if feed is None and replay is not None:
+        from services.price_fetcher import fetch_historical_prices_many
+
+        price_data = fetch_historical_prices_many(portfolio.tickers(), period=replay, adjustment="adjusted")
+        feed = ReplayQuoteFeed(price_data, interval=interval)
+    elif feed is None:
+        feed = PollingQuoteFeed(portfolio.tickers(), engine=quote_engine, interval=interval)
+
+    valuation = LiveValuation(portfolio.holdings, portfolio.ledger)
+    buffer = TickBuffer()
+    deadline = time.monotonic() + duration if duration is not None else None
+    try:
+        for ticks in feed.stream():
+            buffer.extend(ticks)
+            valuation.apply(ticks)
+            if display is not None:
+                display.refresh(valuation, buffer)
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+    finally:
+        valuation.commit()
+        if display is not None:
+            display.refresh(valuation, buffer, force=True)
+    return valuation.snapshot(top=top)
+
+
+def summary(portfolio):
+    """Total value and weights per ticker, asset class and sector."""
+    return portfolio.portfolio_summary() or {}
+
+
+def holdings(portfolio, sort=None, descending=False, sector=None, asset_class=None, prefix=None, top=None,
+             group_by=None, page=None, page_size=50):
+    """Holdings rows as dicts: lots, or totals per `group_by`, filtered, sorted and cut to `top` plus "Other".
+
+    With `page` only that page of `page_size` rows is returned. For very
+    large books prefer views.table_view.HoldingsTable's streaming writers.
+    """
+    from views.table_view import HoldingsTable
+
+    table = HoldingsTable(portfolio.holdings, sort=sort, descending=descending, sector=sector,
+                          asset_class=asset_class, prefix=prefix, top=top, group_by=group_by)
+    if page is None:
+        return table.records()
+    return table.records((page - 1) * page_size, page * page_size)
+
+
+def pnl(portfolio):
+    """Realized and unrealized P&L per ticker from the transaction ledger, plus a "total" entry."""
+    return portfolio.pnl()
+
+
+def risk(portfolio, risk_free_rate=0.03, benchmark="SPY", period="1y", covariance="sample"):
+    """Risk metrics of the portfolio (overall and per rolling window), or {} without price history."""
+    return portfolio.calculate_portfolio_risk_metrics(risk_free_rate=risk_free_rate, period=period,
+                                                      benchmark=benchmark, covariance=covariance) or {}
+
+
+def monte_carlo(portfolio, num_simulations=1000, days=252, model="single", seed=None, workers=1, period="1y",
+                covariance="sample"):
+    """Monte Carlo summary (expected value, percentiles, VaR, CVaR) without paths."""
+    return portfolio.monte_carlo_simulation(num_simulations=num_simulations, days=days, model=model,
+                                            seed=seed, workers=workers, period=period, covariance=covariance) or {}
+
+
+def optimize(portfolio, objective="min_volatility", risk_free_rate=0.03, period="1y", covariance="sample"):
+    """Optimal {ticker: weight} for the given objective."""
+    return portfolio.optimize_portfolio(objective=objective, risk_free_rate=risk_free_rate, period=period,
+                                        covariance=covariance) or {}
+
+
+def backtest(portfolio, objectives=("min_volatility", "max_sharpe", "equal_weight"), period="5y", window=252,
+             rebalance_every=21, cost_bps=10.0, risk_free_rate=0.03, workers=1, covariance="sample"):
+    """Backtest statistics per rebalancing objective, without the equity curves."""
+    results = portfolio.backtest(objectives=objectives, period=period, window=window,
+                                 rebalance_every=rebalance_every, cost_bps=cost_bps,
+                                 risk_free_rate=risk_free_rate, workers=workers, covariance=covariance) or {}
+    return {objective: result["stats"] for objective, result in results.items()}
+
+
+def stress(portfolio, scenarios=None, historical=None, num_simulations=0, days=21, stress=1.0, confidence=0.95,
+           seed=None, workers=1, period="1y", covariance="sample", benchmark="SPY", rate_proxy="^TNX"):
+    """P&L per stress scenario with breakdowns by asset, sector and asset class, plus a simulated tail summary."""
+    return portfolio.stress_test(scenarios=scenarios, historical=historical, num_simulations=num_simulations,
+                                 days=days, stress=stress, confidence=confidence, seed=seed, workers=workers,
+                                 period=period, covariance=covariance, benchmark=benchmark,
+                                 rate_proxy=rate_proxy) or {}
+
+
+def charts(portfolio, output_dir=None, num_simulations=1000, seed=0, image_format="png", period="6mo"):
+    """Render the standard charts headless to files; returns {chart: path}.
+
+    The Monte Carlo fan uses a fixed `seed` by default, so unchanged data
+    reuses the existing image instead of drawing a new one.
+    """
+    from services.price_fetcher import fetch_historical_prices_many
+    from views.graph_view import GraphView
+
+    GraphView.configure(headless=True, output_dir=output_dir, image_format=image_format)
+    paths = {}
+
+    price_data = fetch_historical_prices_many(portfolio.tickers(), period=period, adjustment="adjusted")
+    current_prices = {asset.ticker: asset.current_price for asset in portfolio.assets}
+    if any(prices is not None and not prices.empty for prices in price_data.values()):
+        paths["asset_prices"] = GraphView.plot_asset_prices(price_data, current_prices)
+
+    portfolio_value = portfolio.value_history(period=period)
+    if not portfolio_value.empty:
+        paths["portfolio_performance"] = GraphView.plot_portfolio_performance(portfolio_value)
+
+    result = portfolio.monte_carlo_simulation(num_simulations=num_simulations, seed=seed, keep_paths=True)
+    if result is not None:
+        paths["monte_carlo"] = GraphView.plot_monte_carlo(result["paths"])
+    return paths
+
+
+COMMANDS = {
+    "update": update_prices,
+    "watch": watch,
+    "summary": summary,
+    "holdings": holdings,
+    "pnl": pnl,
+    "risk": risk,
+    "montecarlo": monte_carlo,
+    "optimize": optimize,
+    "backtest": backtest,
+    "stress": stress,
+    "charts": charts,
+}
+
+
+def run(command, portfolio, **options):
+    """Run one named command on a portfolio."""
+    if command not in COMMANDS:
+        raise ValueError(f"Unknown command: {command}")
+    return COMMANDS[command](portfolio, **options)
+
+
+def run_many(command, paths, save=False, **options):
+    """Run one command on every portfolio file; returns {path: result}.
+
+    A portfolio that cannot be loaded, or a command rejecting its input, gets
+    {"error": message} instead of a result, as in batch mode.
+    """
+    results = {}
+    for path in paths:
+        try:
+            portfolio = load_portfolio(path)
+            results[path] = run(command, portfolio, **options)
+        except (OSError, ValueError) as e:
+            results[path] = {"error": f"{type(e).__name__}: {e}"}
+            continue
+        if save:
+            save_portfolio(portfolio, path)
+    return results
@@ -1,24 +1,24 @@
+from controllers import portfolio_api
 from models.asset import Asset
 from models.portfolio import Portfolio
-from services.price_fetcher import fetch_current_price
-from views.cli_view import CLIView
+from models.scenarios import STANDARD_SCENARIOS
+from services.price_fetcher import fetch_current_price, fetch_ticker_info, get_metadata_cache
+from services.quote_engine import QuoteEngine
+from views.cli_view import CLIView, LiveDisplay
 from views.graph_view import GraphView
-import pandas as pd
-from services.price_fetcher import fetch_historical_prices
-import yfinance as yf
+from services.price_fetcher import fetch_historical_prices_many
 
 class PortfolioController:
-    def __init__(self, portfolio):
+    def __init__(self, portfolio, quote_engine=None):
         self.portfolio = portfolio
-
-    import yfinance as yf
+        self.quote_engine = quote_engine or QuoteEngine()
 
     def add_asset(self):
         """Automatically determine sector and asset class based on the ticker."""
         ticker = input("Enter ticker: ").upper()
 
-        # Fetch stock data from Yahoo Finance
-        stock_info = yf.Ticker(ticker).info
+        # Fetch stock data from Yahoo Finance (served from the metadata cache when fresh)
+        stock_info = fetch_ticker_info(ticker)
 
         # Retrieve sector and asset class from Yahoo Finance data
         sector = stock_info.get("sector", "Unknown")
@@ -27,38 +27,182 @@ class PortfolioController:
         quantity = int(input("Enter quantity: "))
         purchase_price = float(input("Enter purchase price: "))
 
-        asset = Asset(ticker, sector, asset_class, quantity, purchase_price)
-        asset.update_price(fetch_current_price(ticker))
-        self.portfolio.add_asset(asset)
+        # Portfolio.add_asset fetches the current price
+        self.portfolio.add_asset(Asset(ticker, sector, asset_class, quantity, purchase_price))
         print(f"Successfully added {ticker} to portfolio with sector '{sector}' and asset class '{asset_class}'.")
 
+    def add_assets(self, entries):
+        """Add many (ticker, quantity, purchase_price) entries with one batched metadata lookup."""
+        entries = [(ticker.upper(), quantity, purchase_price) for ticker, quantity, purchase_price in entries]
+        metadata = get_metadata_cache().prefetch(ticker for ticker, _, _ in entries)
+        quotes = self.quote_engine.fetch_quotes(ticker for ticker, _, _ in entries)
+
+        for ticker, quantity, purchase_price in entries:
+            info = metadata.get(ticker, {})
+            asset = Asset(ticker, info.get("sector", "Unknown"), info.get("quoteType", "Stock").capitalize(),
+                          quantity, purchase_price)
+            if quotes.get(ticker) is not None:
+                asset.update_price(quotes[ticker])
+            self.portfolio.holdings.add(asset)
+            if quantity > 0:
+                self.portfolio.ledger.buy(ticker, quantity, purchase_price)
+
+        self.portfolio.invalidate_cache()
+        print(f" Added {len(entries)} assets to the portfolio.")
+
+    def _select_lot(self, ticker, action):
+        """Ask which lot to use when a ticker has several; returns its index or None."""
+        matching_assets = self.portfolio.holdings.lots(ticker)
+
+        if not matching_assets:
+            print(f" No assets found with ticker {ticker}.")
+            return None
+
+        if len(matching_assets) == 1:
+            return 0
+
+        print(f" Multiple assets found for {ticker}. Select which to {action}:")
+        for i, asset in enumerate(matching_assets):
+            print(f"[{i + 1}] Quantity: {asset.quantity}, Purchase Price: ${asset.purchase_price:.2f}, Transaction Value: ${asset.transaction_value():,.2f}")
+
+        choice = input(f"Enter the number of the asset to {action}: ")
+        if not choice.isdigit() or not (1 <= int(choice) <= len(matching_assets)):
+            print(" Invalid selection.")
+            return None
+        return int(choice) - 1
+
     def edit_asset(self):
         """Allow the user to edit an asset's quantity or purchase price."""
         ticker = input("Enter ticker of asset to edit: ").upper()
-        self.portfolio.edit_asset(ticker)
+        lot = self._select_lot(ticker, "edit")
+        if lot is None:
+            return
+
+        # Ask the user for new values **after selecting the correct asset**
+        new_quantity = input("Enter new quantity (press Enter to skip): ")
+        new_purchase_price = input("Enter new purchase price (press Enter to skip): ")
+
+        try:
+            asset = self.portfolio.edit_asset(
+                ticker,
+                new_quantity=int(new_quantity) if new_quantity else None,
+                new_purchase_price=float(new_purchase_price) if new_purchase_price else None,
+                lot=lot,
+            )
+        except ValueError as e:
+            print(f" Invalid input: {e}")
+            return
+
+        print(f" Updated {ticker}: Quantity = {asset.quantity}, Purchase Price = ${asset.purchase_price:.2f}, Transaction Value = ${asset.transaction_value():,.2f}")
 
     def remove_asset(self):
         """Allow the user to remove an asset from the portfolio."""
         ticker = input("Enter ticker of asset to remove: ").upper()
-        self.portfolio.remove_asset(ticker)
+        lot = self._select_lot(ticker, "remove")
+        if lot is None:
+            return
+
+        self.portfolio.remove_asset(ticker, lot=lot)
+        print(f" Removed {ticker} from the portfolio.")
+
+    def sell_asset(self):
+        """Record a sale of shares of a ticker and show its realized P&L."""
+        ticker = input("Enter ticker to sell: ").upper()
+        lots = self.portfolio.holdings.lots(ticker)
+        if not lots:
+            print(f" No assets found with ticker {ticker}.")
+            return
+
+        try:
+            quantity = float(input("Enter quantity to sell: "))
+            price = input(f"Enter sale price (press Enter for ${lots[0].current_price:.2f}): ")
+            fees = input("Enter fees (press Enter for none): ")
+            realized = self.portfolio.sell(ticker, quantity, float(price) if price else lots[0].current_price,
+                                          fees=float(fees) if fees else 0.0)
+        except ValueError as e:
+            print(f" Invalid sale: {e}")
+            return
+
+        print(f" Sold {quantity:g} {ticker}. Realized P&L: ${realized:,.2f}")
+
+    def display_pnl(self):
+        """Show realized and unrealized P&L per ticker."""
+        CLIView.display_pnl(self.portfolio.pnl())
         
     def update_prices(self):
         """Fetch and update the latest available prices for all assets."""
         print("\n Updating asset prices...\n")
 
-        for asset in self.portfolio.assets:
-            new_price = fetch_current_price(asset.ticker)
+        for asset, old_price, new_price in self.quote_engine.refresh(self.portfolio.assets):
             if new_price is not None:
-                print(f" {asset.ticker}: {asset.current_price} → {new_price} ✅")
-                asset.update_price(new_price)
+                print(f" {asset.ticker}: {old_price} → {new_price} ✅")
             else:
                 print(f"Failed to fetch price for {asset.ticker}")
 
         print("Prices updated.\n")
 
-    def display_portfolio(self):
-        """Show portfolio summary"""
-        CLIView.display_portfolio(self.portfolio)
+    def watch_prices(self):
+        """Stream live quotes and redraw value, weights and P&L until Ctrl+C."""
+        if not self.portfolio.assets:
+            print(" No assets in portfolio.")
+            return
+
+        interval = input("Seconds between quote polls (default 5): ").strip()
+        print(" Watching live prices, press Ctrl+C to stop.\n")
+        try:
+            portfolio_api.watch(self.portfolio, duration=None, interval=float(interval or 5),
+                                quote_engine=self.quote_engine, display=LiveDisplay())
+        except KeyboardInterrupt:
+            pass
+        print("\n Stopped watching. Latest prices saved to the portfolio.")
+
+    def display_portfolio(self, page_size=50):
+        """Show the holdings a page at a time, with sorting, filters, grouping and top-N from a prompt."""
+        options, page = {}, 1
+        while True:
+            try:
+                table = CLIView.display_portfolio(self.portfolio, page=page, page_size=page_size, **options)
+            except ValueError as e:
+                print(f" {e}")
+                options, page = {}, 1
+                continue
+            if table is None or (len(table) <= page_size and not options):
+                return
+
+            command = input(" [Enter] next, p previous, s <column> [desc], f sector|class|prefix=<value>, "
+                            "g ticker|sector|asset_class, t <N>, c clear, q quit: ").strip()
+            name, _, argument = command.partition(" ")
+            pages = max(1, -(-len(table) // page_size))
+            if not command:
+                if page >= pages:
+                    return
+                page += 1
+            elif name == "p":
+                page = max(1, page - 1)
+            elif name == "q":
+                return
+            elif name == "s" and argument:
+                column, _, order = argument.partition(" ")
+                options.update(sort=column, descending=order.strip() == "desc")
+                page = 1
+            elif name == "f" and "=" in argument:
+                field, _, value = argument.partition("=")
+                field = {"class": "asset_class"}.get(field.strip(), field.strip())
+                if field not in ("sector", "asset_class", "prefix"):
+                    print(" Filter on sector, class or prefix.")
+                    continue
+                options[field] = value.strip() or None
+                page = 1
+            elif name == "g":
+                options["group_by"] = argument or None
+                page = 1
+            elif name == "t":
+                options["top"] = int(argument) if argument.isdigit() else None
+                page = 1
+            elif name == "c":
+                options, page = {}, 1
+            else:
+                print(" Unknown command.")
         
 
     def display_portfolio_summary(self):
@@ -77,39 +221,33 @@ class PortfolioController:
         )
 
 
-    def display_portfolio_performance_graph(self):
+    def display_portfolio_performance_graph(self, period="6mo"):
         """Show portfolio performance graph"""
-        historical_data = {}
-        for asset in self.portfolio.assets:
-            history = fetch_historical_prices(asset.ticker)
-            if history is not None and not history.empty:
-                historical_data[asset.ticker] = history
+        portfolio_value = self.portfolio.value_history(period=period)
 
-        if not historical_data:
+        if portfolio_value.empty:
             print(" No historical data available.")
             return
 
-        portfolio_value = pd.DataFrame(historical_data).sum(axis=1)
         GraphView.plot_portfolio_performance(portfolio_value)
-        
+
     def display_asset_graph(self, tickers):
         """Toon een grafiek met de historische en huidige prijs van de opgegeven tickers."""
         price_data = {}
         current_prices = {}
 
-        for ticker in tickers:
-            history = fetch_historical_prices(ticker)
+        for ticker, history in fetch_historical_prices_many(tickers, adjustment="adjusted").items():
             if history is not None and not history.empty:
                 price_data[ticker] = history
             else:
                 print(f" No historical data available for {ticker}.")
-        
+
             current_prices[ticker] = fetch_current_price(ticker)
-            
-            if price_data:
-                GraphView.plot_asset_prices(price_data, current_prices)
-            else:
-                print(" No valid historical price data available.")
+
+        if price_data:
+            GraphView.plot_asset_prices(price_data, current_prices)
+        else:
+            print(" No valid historical price data available.")
 
     def display_risk_metrics(self):
         """Show portfolio Sharpe & Sortino ratio."""
@@ -119,14 +257,59 @@ class PortfolioController:
             print(f" Portfolio Risk Analysis:")
             print(f" Sharpe Ratio: {risk_metrics['sharpe_ratio']:.3f}")
             print(f" Sortino Ratio: {risk_metrics['sortino_ratio']:.3f}")
-            print(f" Portfolio Volatility: {risk_metrics['volatility']:.3%}")
+            print(f" Portfolio Volatility (annualized): {risk_metrics['volatility']:.3%}")
+            print(f" Max Drawdown: {risk_metrics['max_drawdown']:.2%}")
+            print(f" 1-day VaR (95%): {risk_metrics['var']:.2%}")
+            if risk_metrics["beta"] is not None:
+                print(f" Beta: {risk_metrics['beta']:.3f}")
+            if risk_metrics["ex_ante"] is not None:
+                print(f" Ex-ante Volatility (sample covariance): {risk_metrics['ex_ante']['volatility']:.3%}")
+            CLIView.display_risk_windows(risk_metrics["windows"])
         else:
             print(" Not enough data to calculate risk metrics.")
 
     def run_monte_carlo(self):
         """Run Monte Carlo simulation on the portfolio."""
-        self.portfolio.monte_carlo_simulation()
+        result = self.portfolio.monte_carlo_simulation(keep_paths=True)
+        if result is None:
+            print(" No historical data available.")
+            return
+
+        GraphView.plot_monte_carlo(result.pop("paths"))
+        CLIView.display_monte_carlo(result)
+
+    def backtest_strategies(self):
+        """Backtest rebalancing to min-volatility, max-Sharpe and equal weights over past prices."""
+        period = input("Backtest period, e.g. 5y or 10y (default 5y): ").strip() or "5y"
+        rebalance = input("Trading days between rebalances (default 21): ").strip()
+        results = self.portfolio.backtest(period=period, rebalance_every=int(rebalance or 21))
+        if results is None:
+            print(" Not enough historical data to backtest.")
+            return
+
+        CLIView.display_backtest({objective: result["stats"] for objective, result in results.items()})
+        GraphView.plot_backtest({objective: result["equity"] for objective, result in results.items()})
+
+    def stress_test(self):
+        """Revalue the holdings under standard shocks, historical crashes, an optional sector drop and simulations."""
+        scenarios = dict(STANDARD_SCENARIOS)
+        sector = input("Sector to shock (press Enter to skip): ").strip()
+        if sector:
+            drop = input("Sector return, e.g. -0.25 (default -0.20): ").strip()
+            scenarios[f"{sector}_shock"] = {"sectors": {sector: float(drop or -0.20)}}
+        simulations = input("Simulated stress scenarios (default 10000): ").strip()
+
+        result = self.portfolio.stress_test(scenarios=scenarios, num_simulations=int(simulations or 10_000))
+        if result is None:
+            print(" No assets in portfolio.")
+            return
+        CLIView.display_stress(result)
 
     def optimize_portfolio(self):
         """Find the optimal portfolio allocation."""
-        self.portfolio.optimize_portfolio()
+        weights = self.portfolio.optimize_portfolio()
+        if weights is None:
+            print(" No historical data available.")
+            return
+
+        CLIView.display_allocation(weights)
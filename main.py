@@ -1,8 +1,16 @@
+import os
+import sys
 from controllers.portfolio_controller import PortfolioController
 from models.portfolio import Portfolio
+from services import metrics
+from services.portfolio_store import DEFAULT_PORTFOLIO_PATH, load_portfolio, save_portfolio, save_snapshot
 
 def main():
-    portfolio = Portfolio()  # ✅ Create a Portfolio instance
+    if os.path.exists(DEFAULT_PORTFOLIO_PATH):
+        portfolio = load_portfolio(DEFAULT_PORTFOLIO_PATH)  # ✅ Restore the saved holdings and last prices
+        print(f" Loaded {len(portfolio.assets)} assets from {DEFAULT_PORTFOLIO_PATH}.")
+    else:
+        portfolio = Portfolio()  # ✅ Create a Portfolio instance
     controller = PortfolioController(portfolio)  # ✅ Pass it to PortfolioController
 
     while True:
@@ -17,21 +25,30 @@ def main():
         print("9. Risk Analysis (Sharpe & Sortino Ratio)")
         print("10. Monte Carlo Portfolio Simulation")
         print("11. Optimize Portfolio Allocation")
-        print("12. Exit")
+        print("12. Sell Asset")
+        print("13. Show Realized & Unrealized P&L")
+        print("14. Watch Live Prices")
+        print("15. Backtest Rebalancing Strategies")
+        print("16. Stress Test Scenarios")
+        print("17. Exit")
 
         choice = input("Choose an option: ")
 
         if choice == "1":
             controller.add_asset()
+            save_portfolio(portfolio)
 
         elif choice == "2":
             controller.edit_asset()
+            save_portfolio(portfolio)
 
         elif choice == "3":
             controller.remove_asset()
+            save_portfolio(portfolio)
 
         elif choice == "4":
             controller.update_prices()
+            save_portfolio(portfolio)
             print("Prices updated.")
 
         elif choice == "5":
@@ -57,12 +74,37 @@ def main():
             controller.optimize_portfolio() 
 
         elif choice == "12":
+            controller.sell_asset()
+            save_portfolio(portfolio)
+
+        elif choice == "13":
+            controller.display_pnl()
+
+        elif choice == "14":
+            controller.watch_prices()
+            save_portfolio(portfolio)
+
+        elif choice == "15":
+            controller.backtest_strategies()
+
+        elif choice == "16":
+            controller.stress_test()
+
+        elif choice == "17":
+            save_portfolio(portfolio)
+            save_snapshot(portfolio)
+            if metrics.enabled():
+                print(f" Metrics written to {metrics.write_json(metrics.env_path(), command='menu')}.")
             break
 
         else:
             print("Invalid choice.")
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Subcommands run non-interactively (see cli.py)
+        from cli import run
+        sys.exit(run(sys.argv[1:]))
     main()
 
 
@@ -1,11 +1,74 @@
 class Asset:
+    """One lot of a ticker.
+
+    A standalone Asset keeps its numbers in its own slots. Once added to a
+    Holdings book its quantity and prices live in the book's NumPy columns,
+    and the attributes below read and write those columns directly.
+    """
+
+    __slots__ = ("ticker", "_sector", "_asset_class", "_quantity", "_purchase_price", "_current_price",
+                 "_book", "_row")
+
     def __init__(self, ticker, sector, asset_class, quantity, purchase_price):
+        self._book = None
+        self._row = None
         self.ticker = ticker
-        self.sector = sector
-        self.asset_class = asset_class
-        self.quantity = quantity
-        self.purchase_price = purchase_price
-        self.current_price = purchase_price  # Default to purchase price if not updated
+        self._sector = sector
+        self._asset_class = asset_class
+        self._quantity = quantity
+        self._purchase_price = purchase_price
+        self._current_price = purchase_price  # Default to purchase price if not updated
+
+    def _get(self, column):
+        if self._book is None:
+            return getattr(self, "_" + column)
+        return self._book.get_value(column, self._row)
+
+    def _set(self, column, value):
+        if self._book is None:
+            setattr(self, "_" + column, value)
+        else:
+            self._book.set_value(column, self._row, value)
+
+    @property
+    def quantity(self):
+        return self._get("quantity")
+
+    @quantity.setter
+    def quantity(self, value):
+        self._set("quantity", value)
+
+    @property
+    def purchase_price(self):
+        return self._get("purchase_price")
+
+    @purchase_price.setter
+    def purchase_price(self, value):
+        self._set("purchase_price", value)
+
+    @property
+    def current_price(self):
+        return self._get("current_price")
+
+    @current_price.setter
+    def current_price(self, value):
+        self._set("current_price", value)
+
+    @property
+    def sector(self):
+        return self._get("sector")
+
+    @sector.setter
+    def sector(self, value):
+        self._set("sector", value)
+
+    @property
+    def asset_class(self):
+        return self._get("asset_class")
+
+    @asset_class.setter
+    def asset_class(self, value):
+        self._set("asset_class", value)
 
     def update_price(self, new_price):
         """Update the current market price of the asset."""
@@ -18,4 +81,3 @@ class Asset:
     def transaction_value(self):
         """Calculate the original investment value."""
         return self.quantity * self.purchase_price
-  
\ No newline at end of file
@@ -0,0 +1,177 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from models.covariance import CovarianceModel
+from models.optimizer import TRADING_DAYS, PortfolioOptimizer
+from models.risk import _max_drawdown, _window_metrics
+from services import metrics
+
+OBJECTIVES = ("min_volatility", "max_sharpe", "risk_parity", "equal_weight")
+RESYNC_INTERVAL = 50  # Refit the covariance from the window every this many rebalances to bound drift
+
+
+def _target_weights(objective, optimizer, x0):
+    if objective == "equal_weight":
+        return np.full(optimizer.num_assets, 1.0 / optimizer.num_assets)
+    solvers = {
+        "min_volatility": optimizer.min_variance,
+        "max_sharpe": optimizer.max_sharpe,
+        "risk_parity": optimizer.risk_parity,
+    }
+    return solvers[objective](x0=x0)["weights"]
+
+
+def _solve_chunk(task):
+    """Target weights at a run of consecutive rebalance points; module level so it can run in a worker process.
+
+    `rows` holds the returns from the first estimation window up to the last
+    point, and `points` are positions in `rows`. Each point re-optimizes on
+    the `window` rows before it, warm-started from the previous solution.
+    """
+    rows, points, window, objectives, risk_free_rate, allow_short, estimator = task
+    weights = {objective: np.empty((len(points), rows.shape[1])) for objective in objectives}
+    model = None
+    for k, point in enumerate(points):
+        if model is None or k % RESYNC_INTERVAL == 0:
+            model = CovarianceModel.fit(rows[point - window:point], estimator)
+        else:
+            previous = points[k - 1]
+            model.update(rows[previous:point], rows[previous - window:point - window])
+
+        optimizer = PortfolioOptimizer(model.mean(), model, risk_free_rate=risk_free_rate, allow_short=allow_short)
+        for objective in objectives:
+            x0 = weights[objective][k - 1] if k else None
+            weights[objective][k] = _target_weights(objective, optimizer, x0)
+    return weights
+
+
+class Backtester:
+    """Walk-forward backtest of periodically rebalanced optimized portfolios.
+
+    Every `rebalance_every` days the optimizer is re-run on the previous
+    `window` days of returns (no look-ahead) and the portfolio is traded back
+    to its target weights, paying `cost_bps` basis points on the traded
+    value. Between rebalances the weights drift with prices, and the equity
+    curve of each holding period is one vectorized cumulative product.
+
+    Rebalance points are split into contiguous chunks solved in parallel
+    when `workers` > 1; inside a chunk the window's `covariance` estimate
+    (see models.covariance) is updated incrementally from one point to the
+    next.
+    """
+
+    def __init__(self, returns, window=252, rebalance_every=21, cost_bps=10.0, risk_free_rate=0.03,
+                 allow_short=False, workers=1, covariance="sample"):
+        if rebalance_every < 1:
+            raise ValueError("rebalance_every must be at least 1 day")
+        if window < 2:
+            raise ValueError("window must be at least 2 days")
+        self.returns = returns
+        self.window = window
+        self.rebalance_every = rebalance_every
+        self.cost_rate = cost_bps / 10_000
+        self.risk_free_rate = risk_free_rate
+        self.allow_short = allow_short
+        self.workers = workers
+        self.covariance = covariance
+
+    def rebalance_points(self):
+        """Row positions of the rebalance days: every `rebalance_every` days after the first full window."""
+        return np.arange(self.window, len(self.returns.values), self.rebalance_every)
+
+    def target_weights(self, objectives):
+        """{objective: (rebalance points x tickers) target weights}."""
+        values = self.returns.values
+        points = self.rebalance_points()
+        chunks = np.array_split(points, max(1, min(self.workers * 4, len(points))) if self.workers > 1 else 1)
+        tasks = []
+        for chunk in chunks:
+            if len(chunk):
+                first = chunk[0] - self.window
+                tasks.append((values[first:chunk[-1]], chunk - first, self.window, tuple(objectives),
+                              self.risk_free_rate, self.allow_short, self.covariance))
+
+        with metrics.timer("backtest.solve"):
+            if self.workers > 1 and len(tasks) > 1:
+                with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                    results = list(executor.map(_solve_chunk, tasks))
+            else:
+                results = [_solve_chunk(task) for task in tasks]
+        metrics.count("backtest.solve.rebalances", len(points) * len(objectives))
+        return {objective: np.vstack([result[objective] for result in results]) for objective in objectives}
+
+    def simulate(self, weights, initial_value=1.0):
+        """Equity curve, turnover and costs of holding `weights` (one row per rebalance point)."""
+        values = self.returns.values
+        points = self.rebalance_points()
+        bounds = np.append(points, len(values))
+        equity = np.empty(len(values) - points[0] + 1)
+        equity[0] = value = initial_value
+        held = np.zeros(values.shape[1])
+        turnover = np.empty(len(points))
+        costs = 0.0
+
+        for k, target in enumerate(weights):
+            start, end = bounds[k], bounds[k + 1]
+            turnover[k] = np.abs(target - held).sum()
+            cost = value * self.cost_rate * turnover[k]
+            costs += cost
+            value -= cost
+
+            growth = np.cumprod(1.0 + values[start:end], axis=0)
+            equity[start - points[0] + 1:end - points[0] + 1] = value * (growth @ target)
+            drifted = growth[-1] * target
+            held = drifted / drifted.sum()
+            value = equity[end - points[0]]
+        return equity, turnover, costs
+
+    def statistics(self, equity, turnover, costs):
+        """Annualized return, volatility, Sharpe, Sortino and drawdown of an equity curve."""
+        daily = equity[1:] / equity[:-1] - 1.0
+        risk_free_daily = self.risk_free_rate / TRADING_DAYS
+        shortfall = np.minimum(daily - risk_free_daily, 0.0)
+        stats = _window_metrics(len(daily), daily.sum(), daily @ daily, shortfall @ shortfall, risk_free_daily) or {}
+        stats.pop("beta", None)
+        years = len(daily) / TRADING_DAYS
+        total_return = equity[-1] / equity[0] - 1.0
+        stats.update({
+            "total_return": float(total_return),
+            "cagr": float((1.0 + total_return) ** (1.0 / years) - 1.0) if years and total_return > -1 else 0.0,
+            "max_drawdown": _max_drawdown(daily),
+            "rebalances": len(turnover),
+            "average_turnover": float(turnover[1:].mean()) if len(turnover) > 1 else 0.0,
+            "costs": float(costs),
+            "final_value": float(equity[-1]),
+        })
+        return stats
+
+    def run(self, objectives=("min_volatility",), initial_value=1.0):
+        """Backtest each objective; returns {objective: result dict}.
+
+        A result holds the "equity" curve (a Series starting at
+        `initial_value` on the close before the first rebalance), the
+        "rebalance_dates", the target "weights" per rebalance and "stats".
+        """
+        import pandas as pd
+
+        unknown = [objective for objective in objectives if objective not in OBJECTIVES]
+        if unknown:
+            raise ValueError(f"Unknown objective: {', '.join(unknown)}")
+        points = self.rebalance_points()
+        if not len(points):
+            raise ValueError(f"Need more than {self.window} days of returns, got {len(self.returns.values)}.")
+
+        dates = self.returns.dates[points[0] - 1:]
+        results = {}
+        for objective, weights in self.target_weights(objectives).items():
+            with metrics.timer("backtest.simulate"):
+                equity, turnover, costs = self.simulate(weights, initial_value)
+            results[objective] = {
+                "equity": pd.Series(equity, index=dates, name=objective),
+                "rebalance_dates": self.returns.dates[points],
+                "weights": weights,
+                "tickers": self.returns.tickers,
+                "stats": self.statistics(equity, turnover, costs),
+            }
+        return results
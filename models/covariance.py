@@ -0,0 +1,259 @@
+import numpy as np
+
+from services import metrics
+
+ESTIMATORS = ("sample", "ewma", "ledoit_wolf", "factor")
+
+
+def cholesky_root(cov):
+    """Lower triangular L with L L' = cov, clipping negative eigenvalues if cov is not positive definite."""
+    cov = np.atleast_2d(cov)
+    try:
+        return np.linalg.cholesky(cov)
+    except np.linalg.LinAlgError:
+        eigenvalues, eigenvectors = np.linalg.eigh(cov)
+        return eigenvectors * np.sqrt(np.clip(eigenvalues, 0.0, None))
+
+
+def _top_eigen(matrix, count, extra=0, start=None, iterations=8, tolerance=1e-8):
+    """The `count + extra` largest eigenpairs of a symmetric matrix, in descending order.
+
+    With `start` (the basis returned for an earlier, similar matrix) a few
+    rounds of subspace iteration replace the full O(n^3) decomposition; if
+    the leading `count` pairs have not converged it falls back to the full one.
+    """
+    if start is not None and start.shape == (len(matrix), count + extra):
+        basis = start
+        for _ in range(iterations):
+            basis, _ = np.linalg.qr(matrix @ basis)
+        eigenvalues, rotation = np.linalg.eigh(basis.T @ matrix @ basis)
+        order = np.argsort(eigenvalues)[::-1]
+        eigenvalues, eigenvectors = eigenvalues[order], basis @ rotation[:, order]
+        residual = matrix @ eigenvectors[:, :count] - eigenvectors[:, :count] * eigenvalues[:count]
+        if np.linalg.norm(residual) <= tolerance * max(abs(eigenvalues[0]), 1e-300):
+            return eigenvalues, eigenvectors
+        metrics.count("covariance.eigen_fallbacks")
+
+    eigenvalues, eigenvectors = np.linalg.eigh(matrix)
+    order = np.argsort(eigenvalues)[::-1][:count + extra]
+    return eigenvalues[order], eigenvectors[:, order]
+
+
+class CovarianceModel:
+    """Covariance of daily returns with its decompositions cached until the data changes.
+
+    Estimators:
+      - "sample":      unbiased sample covariance
+      - "ewma":        exponentially weighted, each day weighted `decay` times the next (RiskMetrics 0.94)
+      - "ledoit_wolf": sample covariance shrunk towards a scaled identity by the Ledoit-Wolf
+                       intensity, well conditioned even with more assets than days
+      - "factor":      `factors` principal components plus a diagonal of specific variances
+
+    The model keeps decayed sums of the returns and their cross products
+    (plus the fourth-moment sums Ledoit-Wolf needs) rather than the returns,
+    so `update` folds in new days and drops old ones in O(days moved x
+    assets^2). The matrix, Cholesky factor and eigendecomposition are built on
+    first use and reused until the next update; the factor estimator
+    warm-starts its eigenvectors from the previous basis.
+    """
+
+    def __init__(self, estimator="sample", decay=0.94, factors=5):
+        if estimator not in ESTIMATORS:
+            raise ValueError(f"Unknown covariance estimator: {estimator}")
+        self.estimator = estimator
+        self.decay = decay if estimator == "ewma" else 1.0
+        self.factors = factors
+        self.count = 0
+        self.size = None
+        self._cache = {}
+        self._basis = None
+
+    @classmethod
+    def fit(cls, returns, estimator="sample", **options):
+        """Estimate from a (days x assets) returns array."""
+        model = cls(estimator, **options)
+        model._reset(np.atleast_2d(np.asarray(returns, dtype=np.float64)))
+        return model
+
+    def _reset(self, rows):
+        days, self.size = rows.shape
+        ages = self.decay ** np.arange(days - 1, -1, -1, dtype=np.float64)
+        self.count = days
+        self.weight = float(ages.sum())
+        self.total = ages @ rows
+        self.cross = (rows * ages[:, None]).T @ rows
+        if self.estimator == "ledoit_wolf":
+            squared_norms = np.einsum("ij,ij->i", rows, rows)
+            self.norms = float(squared_norms.sum())
+            self.norms_squared = float(squared_norms @ squared_norms)
+            self.norms_rows = squared_norms @ rows
+        self._cache.clear()
+
+    def copy(self):
+        model = CovarianceModel.__new__(CovarianceModel)
+        model.__dict__.update(self.__dict__)
+        for name in ("total", "cross", "norms_rows"):
+            if hasattr(self, name):
+                setattr(model, name, getattr(self, name).copy())
+        model._cache = dict(self._cache)
+        return model
+
+    def update(self, added=None, removed=None):
+        """Add new days at the end and remove the oldest days; returns self.
+
+        `removed` must be the oldest rows the model still holds, in order.
+        """
+        with metrics.timer("covariance.update"):
+            if removed is not None and len(removed):
+                removed = np.atleast_2d(removed)
+                ages = self.decay ** np.arange(self.count - 1, self.count - 1 - len(removed), -1, dtype=np.float64)
+                self._accumulate(removed, ages, -1.0)
+                self.count -= len(removed)
+            if added is not None and len(added):
+                added = np.atleast_2d(added)
+                ages = self.decay ** np.arange(len(added) - 1, -1, -1, dtype=np.float64)
+                if self.decay != 1.0:
+                    shift = self.decay ** len(added)
+                    self.weight *= shift
+                    self.total *= shift
+                    self.cross *= shift
+                self._accumulate(added, ages, 1.0)
+                self.count += len(added)
+        self._cache.clear()
+        return self
+
+    def _accumulate(self, rows, ages, sign):
+        ages = sign * ages
+        self.weight += float(ages.sum())
+        self.total += ages @ rows
+        self.cross += (rows * ages[:, None]).T @ rows
+        if self.estimator == "ledoit_wolf":
+            squared_norms = np.einsum("ij,ij->i", rows, rows)
+            self.norms += sign * float(squared_norms.sum())
+            self.norms_squared += sign * float(squared_norms @ squared_norms)
+            self.norms_rows += sign * (squared_norms @ rows)
+
+    # ------------------------------------------------------------- estimates
+
+    def mean(self):
+        """(Weighted) mean daily return per asset."""
+        return self.total / self.weight
+
+    def _sample(self, biased=False):
+        mean = self.mean()
+        if self.decay != 1.0:
+            return self.cross / self.weight - np.outer(mean, mean)
+        scatter = self.cross - self.count * np.outer(mean, mean)
+        return scatter / (self.count if biased else max(self.count - 1, 1))
+
+    def _ledoit_wolf(self):
+        """Shrink the biased sample covariance towards mu*I (Ledoit & Wolf, 2004)."""
+        n, mean = self.count, self.mean()
+        sample = self._sample(biased=True)
+        target = np.trace(sample) / self.size
+        # Sum over days of ||x - mean||^4, expanded so it only needs the running sums
+        a, b, c = self.norms, self.total @ mean, mean @ mean
+        fourth = (self.norms_squared - 4 * self.norms_rows @ mean + 4 * mean @ self.cross @ mean
+                  + 2 * c * a - 4 * c * b + n * c * c)
+        distance = np.sum((sample - target * np.eye(self.size)) ** 2)
+        spread = max((fourth / n - np.sum(sample ** 2)) / n, 0.0)
+        shrinkage = min(spread, distance) / distance if distance > 0 else 1.0
+        self._cache["shrinkage"] = float(shrinkage)
+        shrunk = (1.0 - shrinkage) * sample
+        shrunk[np.diag_indices(self.size)] += shrinkage * target
+        return shrunk
+
+    def factor_model(self):
+        """(loadings, specific variances): assets x factors loadings B and a vector D with cov = B B' + diag(D)."""
+        if "factor_model" not in self._cache:
+            sample = self._sample()
+            count = min(self.factors, self.size)
+            # A few extra directions make the warm-started iteration converge faster
+            eigenvalues, eigenvectors = _top_eigen(sample, count, min(5, self.size - count), self._basis)
+            self._basis = eigenvectors
+            loadings = eigenvectors[:, :count] * np.sqrt(np.clip(eigenvalues[:count], 0.0, None))
+            specific = np.clip(np.diag(sample) - np.einsum("ij,ij->i", loadings, loadings), 1e-12, None)
+            self._cache["factor_model"] = (loadings, specific)
+        return self._cache["factor_model"]
+
+    def matrix(self):
+        """The covariance matrix (assets x assets)."""
+        if "matrix" not in self._cache:
+            with metrics.timer(f"covariance.{self.estimator}"):
+                if self.estimator == "ledoit_wolf":
+                    matrix = self._ledoit_wolf()
+                elif self.estimator == "factor":
+                    loadings, specific = self.factor_model()
+                    matrix = loadings @ loadings.T
+                    matrix[np.diag_indices(self.size)] += specific
+                else:
+                    matrix = self._sample()
+            self._cache["matrix"] = np.atleast_2d(matrix)
+        return self._cache["matrix"]
+
+    def shrinkage(self):
+        """Ledoit-Wolf shrinkage intensity in [0, 1], or None for other estimators."""
+        if self.estimator != "ledoit_wolf":
+            return None
+        self.matrix()
+        return self._cache["shrinkage"]
+
+    # -------------------------------------------------------- decompositions
+
+    def cholesky(self):
+        """Cached lower triangular root of the matrix (eigenvalue-clipped if it is singular)."""
+        if "cholesky" not in self._cache:
+            metrics.count("covariance.decompositions")
+            self._cache["cholesky"] = cholesky_root(self.matrix())
+        return self._cache["cholesky"]
+
+    def eigh(self):
+        """Cached (eigenvalues, eigenvectors) of the matrix, ascending like numpy.linalg.eigh."""
+        if "eigh" not in self._cache:
+            metrics.count("covariance.decompositions")
+            self._cache["eigh"] = np.linalg.eigh(self.matrix())
+        return self._cache["eigh"]
+
+    def root(self):
+        """(loadings, specific volatilities) for simulating returns as loadings @ z + specific * e.
+
+        Dense estimators return their Cholesky factor and None; the factor
+        estimator returns its assets x factors loadings and the square root of
+        the specific variances, so draws cost O(assets x factors).
+        """
+        if self.estimator == "factor":
+            loadings, specific = self.factor_model()
+            return loadings, np.sqrt(specific)
+        return self.cholesky(), None
+
+    # ------------------------------------------------------------ operations
+
+    def dot(self, vector):
+        """cov @ vector, in O(assets x factors) for the factor estimator."""
+        if self.estimator == "factor" and "matrix" not in self._cache:
+            loadings, specific = self.factor_model()
+            return loadings @ (loadings.T @ vector) + specific * vector
+        return self.matrix() @ vector
+
+    def variance(self, weights):
+        """Daily variance of a portfolio with the given weights."""
+        weights = np.asarray(weights, dtype=np.float64)
+        return float(max(weights @ self.dot(weights), 0.0))
+
+    def solve(self, vector):
+        """cov^-1 @ vector using the cached decomposition (pseudo-inverse if the matrix is singular)."""
+        vector = np.asarray(vector, dtype=np.float64)
+        if self.estimator == "factor":
+            # Woodbury identity: only a factors x factors system is solved
+            loadings, specific = self.factor_model()
+            scaled = loadings / specific[:, None]
+            inner = np.eye(loadings.shape[1]) + loadings.T @ scaled
+            return vector / specific - scaled @ np.linalg.solve(inner, scaled.T @ vector)
+
+        if "inverse_root" not in self._cache:
+            eigenvalues, eigenvectors = self.eigh()
+            cutoff = eigenvalues.max(initial=0.0) * self.size * np.finfo(float).eps
+            kept = eigenvalues > cutoff
+            self._cache["inverse_root"] = eigenvectors[:, kept] / np.sqrt(eigenvalues[kept])
+        inverse_root = self._cache["inverse_root"]
+        return inverse_root @ (inverse_root.T @ vector)
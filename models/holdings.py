@@ -0,0 +1,247 @@
+import numpy as np
+from models.asset import Asset
+
+NUMERIC_COLUMNS = ("quantity", "purchase_price", "current_price")
+CODED_COLUMNS = ("ticker", "sector", "asset_class")
+
+
+class CodeTable:
+    """Maps labels (tickers, sectors, asset classes) to small integer codes."""
+
+    def __init__(self, labels=()):
+        self.labels = []
+        self.codes = {}
+        for label in labels:
+            self.code(label)
+
+    def code(self, label):
+        """Return the code for a label, assigning a new one if needed."""
+        code = self.codes.get(label)
+        if code is None:
+            code = len(self.labels)
+            self.codes[label] = code
+            self.labels.append(label)
+        return code
+
+    def __len__(self):
+        return len(self.labels)
+
+
+class Holdings:
+    """Columnar store of portfolio lots.
+
+    Quantities and prices are float64 NumPy columns and tickers, sectors and
+    asset classes are integer codes, so valuation, weights and group-bys are
+    single vectorized operations. `_lots` maps each ticker to its Asset
+    objects for O(1) lookup; rows keep insertion order.
+    """
+
+    def __init__(self, capacity=16):
+        self.size = 0
+        self.columns = {name: np.zeros(capacity, dtype=np.float64) for name in NUMERIC_COLUMNS}
+        self.columns.update({name: np.zeros(capacity, dtype=np.int32) for name in CODED_COLUMNS})
+        self.tables = {name: CodeTable() for name in CODED_COLUMNS}
+        self._assets = []
+        self._lots = {}
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return iter(list(self._assets))
+
+    @property
+    def assets(self):
+        """The Asset objects in row order (a copy of the list)."""
+        return list(self._assets)
+
+    @classmethod
+    def from_columns(cls, columns, tables):
+        """Rebuild a book from saved columns and code-table labels without copying per row."""
+        book = cls(capacity=0)
+        book.size = len(columns["quantity"])
+        for name in NUMERIC_COLUMNS:
+            book.columns[name] = np.array(columns[name], dtype=np.float64)
+        for name in CODED_COLUMNS:
+            book.columns[name] = np.array(columns[name], dtype=np.int32)
+            book.tables[name] = CodeTable(tables[name])
+
+        ticker_labels = book.tables["ticker"].labels
+        for row, code in enumerate(book.columns["ticker"]):
+            asset = Asset.__new__(Asset)
+            asset.ticker = ticker_labels[code]
+            asset._book, asset._row = book, row
+            book._assets.append(asset)
+            book._lots.setdefault(asset.ticker, []).append(asset)
+        return book
+
+    # ------------------------------------------------------------ cell access
+
+    def get_value(self, column, row):
+        if column in self.tables:
+            return self.tables[column].labels[self.columns[column][row]]
+        value = float(self.columns[column][row])
+        if column == "quantity" and value.is_integer():
+            return int(value)
+        return value
+
+    def set_value(self, column, row, value):
+        if column in self.tables:
+            value = self.tables[column].code(value)
+        self.columns[column][row] = value
+
+    # ------------------------------------------------------------ mutations
+
+    def _grow(self):
+        capacity = max(16, 2 * len(self.columns["quantity"]))
+        for name, column in self.columns.items():
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+
+    def add(self, asset):
+        """Append a lot, moving its values into the columns."""
+        if asset._book is not None:
+            raise ValueError(f"Asset {asset.ticker} already belongs to a portfolio.")
+        if self.size == len(self.columns["quantity"]):
+            self._grow()
+
+        row = self.size
+        self.columns["quantity"][row] = asset.quantity
+        self.columns["purchase_price"][row] = asset.purchase_price
+        self.columns["current_price"][row] = asset.current_price
+        self.columns["ticker"][row] = self.tables["ticker"].code(asset.ticker)
+        self.columns["sector"][row] = self.tables["sector"].code(asset.sector)
+        self.columns["asset_class"][row] = self.tables["asset_class"].code(asset.asset_class)
+
+        asset._book, asset._row = self, row
+        self.size += 1
+        self._assets.append(asset)
+        self._lots.setdefault(asset.ticker, []).append(asset)
+        return asset
+
+    def remove(self, asset):
+        """Remove a lot, detaching it with its current values."""
+        if asset._book is not self:
+            raise ValueError(f"Asset {asset.ticker} is not in this portfolio.")
+
+        row = asset._row
+        values = {name: asset._get(name) for name in NUMERIC_COLUMNS + ("sector", "asset_class")}
+        for column in self.columns.values():
+            column[row:self.size - 1] = column[row + 1:self.size]
+        self.size -= 1
+
+        del self._assets[row]
+        for moved in self._assets[row:]:
+            moved._row -= 1
+
+        lots = self._lots[asset.ticker]
+        lots.remove(asset)
+        if not lots:
+            del self._lots[asset.ticker]
+
+        asset._book, asset._row = None, None
+        for name, value in values.items():
+            setattr(asset, "_" + name, value)
+
+    # ------------------------------------------------------------ queries
+
+    def lots(self, ticker):
+        """All lots of a ticker in insertion order."""
+        return list(self._lots.get(ticker, ()))
+
+    def tickers(self):
+        """Unique tickers held, in order of first appearance."""
+        return list(self._lots)
+
+    def column(self, name):
+        """A view of the live rows of a column."""
+        return self.columns[name][:self.size]
+
+    def values(self):
+        """Current value per lot."""
+        return self.column("quantity") * self.column("current_price")
+
+    def costs(self):
+        """Transaction value per lot."""
+        return self.column("quantity") * self.column("purchase_price")
+
+    def total_value(self):
+        return float(self.values().sum())
+
+    def group_values(self, by, values=None):
+        """Sum values per ticker, sector or asset class as {label: value}."""
+        values = self.values() if values is None else values
+        codes = self.column(by)
+        table = self.tables[by]
+        sums = np.bincount(codes, weights=values, minlength=len(table))
+        counts = np.bincount(codes, minlength=len(table))
+        # Ordered by first appearance among the live rows, like the old dict loops
+        _, first_rows = np.unique(codes, return_index=True)
+        order = codes[np.sort(first_rows)]
+        return {table.labels[code]: float(sums[code]) for code in order if counts[code]}
+
+    def label_ranks(self, name):
+        """Alphabetical rank of every code of a label column, indexed by code."""
+        labels = self.tables[name].labels
+        ranks = np.empty(len(labels), dtype=np.int64)
+        ranks[sorted(range(len(labels)), key=lambda code: str(labels[code]).lower())] = np.arange(len(labels))
+        return ranks
+
+    def sort_key(self, name):
+        """Per-lot values to order rows by; label columns sort alphabetically."""
+        if name in self.tables:
+            return self.label_ranks(name)[self.column(name)]
+        if name == "transaction_value":
+            return self.costs()
+        if name == "current_value":
+            return self.values()
+        if name in NUMERIC_COLUMNS:
+            return self.column(name)
+        raise ValueError(f"Cannot sort holdings by {name}")
+
+    def _label_mask(self, name, match):
+        """Per-lot mask of the rows whose `name` label satisfies `match`, testing each distinct label once."""
+        matching = np.array([bool(match(str(label))) for label in self.tables[name].labels], dtype=bool)
+        return matching[self.column(name)] if len(matching) else np.zeros(self.size, dtype=bool)
+
+    def select(self, sector=None, asset_class=None, prefix=None, sort=None, descending=False):
+        """Row positions of the lots passing every given filter, ordered by `sort` (row order by default).
+
+        `sector` and `asset_class` match whole labels and `prefix` the start
+        of the ticker, all case-insensitively.
+        """
+        mask = np.ones(self.size, dtype=bool)
+        for name, wanted in (("sector", sector), ("asset_class", asset_class)):
+            if wanted is not None:
+                mask &= self._label_mask(name, lambda label, wanted=wanted.lower(): label.lower() == wanted)
+        if prefix:
+            mask &= self._label_mask("ticker", lambda label, prefix=prefix.upper(): label.upper().startswith(prefix))
+        rows = np.flatnonzero(mask)
+        if sort is not None:
+            key = self.sort_key(sort)[rows]
+            rows = rows[np.argsort(-key if descending else key, kind="stable")]
+        return rows
+
+    def aggregate(self, by, rows=None):
+        """Totals per ticker, sector or asset class over `rows` (all lots by default).
+
+        Returns columns {by: codes, "lots", "quantity", "transaction_value",
+        "current_value"} with one entry per group present, in order of first
+        appearance among the rows.
+        """
+        rows = np.arange(self.size) if rows is None else rows
+        codes = self.column(by)[rows]
+        size = len(self.tables[by])
+        _, first = np.unique(codes, return_index=True)
+        present = codes[np.sort(first)]
+        quantity = self.column("quantity")[rows]
+        return {
+            by: present,
+            "lots": np.bincount(codes, minlength=size)[present],
+            "quantity": np.bincount(codes, weights=quantity, minlength=size)[present],
+            "transaction_value": np.bincount(codes, weights=quantity * self.column("purchase_price")[rows],
+                                             minlength=size)[present],
+            "current_value": np.bincount(codes, weights=quantity * self.column("current_price")[rows],
+                                         minlength=size)[present],
+        }
@@ -0,0 +1,360 @@
+import datetime
+from collections import deque
+
+import numpy as np
+
+from models.holdings import CodeTable
+
+BUY, SELL, DIVIDEND, SPLIT, ADJUST = range(5)
+KINDS = ("buy", "sell", "dividend", "split", "adjust")
+COST_METHODS = ("fifo", "average")
+LEDGER_COLUMNS = {
+    "date": np.int64,  # Days since 1970-01-01
+    "ticker": np.int32,
+    "kind": np.int8,
+    "quantity": np.float64,  # Shares traded; shares held for a dividend; the ratio for a split; a lot's new size
+    "price": np.float64,  # Trade price; cash per share for a dividend; a lot's new cost (NaN keeps it)
+    "fees": np.float64,
+    "lot": np.int32,  # Open lot a sell or adjustment applies to; -1 sells oldest first
+}
+
+EPOCH = datetime.date(1970, 1, 1)
+EPSILON = 1e-9
+
+
+def _day(date):
+    """Days since the epoch for a date, an ISO string or None (today)."""
+    if date is None:
+        date = datetime.date.today()
+    elif isinstance(date, str):
+        date = datetime.date.fromisoformat(date)
+    elif isinstance(date, datetime.datetime):
+        date = date.date()
+    return (date - EPOCH).days
+
+
+class Position:
+    """Running cost-basis and P&L state of one ticker."""
+
+    __slots__ = ("quantity", "cost", "realized", "dividends", "fees", "lots")
+
+    def __init__(self):
+        self.quantity = 0.0
+        self.cost = 0.0
+        self.realized = 0.0
+        self.dividends = 0.0
+        self.fees = 0.0
+        self.lots = deque()  # Open lots as [quantity, cost per share, day], oldest first
+
+    def as_dict(self):
+        return {
+            "quantity": self.quantity,
+            "cost_basis": self.cost,
+            "average_cost": self.cost / self.quantity if self.quantity > EPSILON else 0.0,
+            "realized": self.realized,
+            "dividends": self.dividends,
+            "fees": self.fees,
+        }
+
+
+class Ledger:
+    """Append-only, columnar log of buys, sells, dividends, splits and lot adjustments.
+
+    Transactions are stored as NumPy columns (dates as day numbers, tickers
+    and kinds as small integer codes). Every append also updates the running
+    position of its ticker, so quantities, cost basis and realized P&L are
+    always current without replaying history. Loading a saved ledger or
+    switching between FIFO and average-cost accounting rebuilds all positions
+    in a single pass over the columns. Recorded rows are never changed: a
+    mistyped lot is fixed by appending an adjustment with no realized P&L.
+    """
+
+    def __init__(self, method="fifo", capacity=16):
+        if method not in COST_METHODS:
+            raise ValueError(f"Unknown cost basis method: {method}")
+        self.method = method
+        self.size = 0
+        self.columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in LEDGER_COLUMNS.items()}
+        self.tickers = CodeTable()
+        self._positions = []  # Position per ticker code
+        self._track_lots = method == "fifo"
+
+    def __len__(self):
+        return self.size
+
+    @classmethod
+    def from_columns(cls, columns, ticker_labels, method="fifo"):
+        """Rebuild a ledger from saved columns, deriving positions in one pass."""
+        ledger = cls(method, capacity=0)
+        ledger.size = len(columns["kind"])
+        for name, dtype in LEDGER_COLUMNS.items():
+            if name in columns:
+                ledger.columns[name] = np.array(columns[name], dtype=dtype)
+            else:  # Saved before the column existed
+                ledger.columns[name] = np.full(ledger.size, -1, dtype=dtype)
+        ledger.tickers = CodeTable(ticker_labels)
+        ledger.replay()
+        return ledger
+
+    @classmethod
+    def from_holdings(cls, holdings, method="fifo", date=None):
+        """Open a ledger with one buy per existing lot at its purchase price."""
+        ledger = cls(method)
+        for asset in holdings:
+            if asset.quantity > 0:
+                ledger.buy(asset.ticker, asset.quantity, asset.purchase_price, date)
+        return ledger
+
+    # ------------------------------------------------------------ recording
+
+    def _grow(self):
+        capacity = max(16, 2 * len(self.columns["kind"]))
+        for name, column in self.columns.items():
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+
+    def _position(self, code):
+        while len(self._positions) <= code:
+            self._positions.append(Position())
+        return self._positions[code]
+
+    def record(self, kind, ticker, quantity, price=0.0, date=None, fees=0.0, lot=-1):
+        """Append one transaction and update its ticker's position.
+
+        `lot` is the index of the open lot, oldest first, that a sell or an
+        adjustment applies to. Returns the realized P&L of a sell, the
+        net cash of a dividend and 0 otherwise. Invalid transactions raise
+        ValueError and leave the ledger unchanged.
+        """
+        kind = KINDS.index(kind) if isinstance(kind, str) else kind
+        quantity, price, fees, lot = float(quantity), float(price), float(fees), int(lot)
+        if kind in (BUY, SELL, SPLIT) and quantity <= 0:
+            raise ValueError(f"{KINDS[kind].capitalize()} quantity must be positive, got {quantity}.")
+        if kind == ADJUST and quantity < 0:
+            raise ValueError(f"Adjusted quantity cannot be negative, got {quantity}.")
+        held = self.position(ticker)["quantity"]
+        if kind == SELL and quantity > held + EPSILON:
+            raise ValueError(f"Cannot sell {quantity:g} {ticker}: only {held:g} held.")
+        if kind == ADJUST or (kind == SELL and lot >= 0):
+            if not self._track_lots:
+                # Average cost needs no lots until a sell or adjustment names one
+                self._track_lots = True
+                self._rebuild()
+            lots = self._open(ticker)
+            if not 0 <= lot < len(lots):
+                raise ValueError(f"{ticker} has no open lot {lot}.")
+            if kind == SELL and quantity > lots[lot][0] + EPSILON:
+                raise ValueError(f"Cannot sell {quantity:g} {ticker} from lot {lot}: only {lots[lot][0]:g} in it.")
+        else:
+            lot = -1
+        code = self.tickers.code(ticker)
+        position = self._position(code)
+        if kind == DIVIDEND:
+            quantity = position.quantity
+
+        day = _day(date)
+        result = self._apply(position, kind, quantity, price, fees, day, lot)
+
+        if self.size == len(self.columns["kind"]):
+            self._grow()
+        row = self.size
+        for name, value in (("date", day), ("ticker", code), ("kind", kind),
+                            ("quantity", quantity), ("price", price), ("fees", fees), ("lot", lot)):
+            self.columns[name][row] = value
+        self.size += 1
+        return result
+
+    def buy(self, ticker, quantity, price, date=None, fees=0.0):
+        return self.record(BUY, ticker, quantity, price, date, fees)
+
+    def sell(self, ticker, quantity, price, date=None, fees=0.0, lot=None):
+        """Record a sale; returns its realized P&L after fees.
+
+        Shares come from the oldest lots first, or from open lot `lot` only
+        (specific-lot identification).
+        """
+        return self.record(SELL, ticker, quantity, price, date, fees, -1 if lot is None else lot)
+
+    def dividend(self, ticker, per_share, date=None, fees=0.0):
+        """Record a cash dividend on the shares currently held; returns the net cash."""
+        return self.record(DIVIDEND, ticker, 0.0, per_share, date, fees)
+
+    def split(self, ticker, ratio, date=None):
+        """Record a stock split (ratio 2 for 2-for-1, 0.1 for a 1-for-10 reverse split)."""
+        return self.record(SPLIT, ticker, ratio, 0.0, date)
+
+    def adjust(self, ticker, lot, quantity, cost=None, date=None):
+        """Correct open lot `lot` to `quantity` shares at `cost` per share (None keeps its cost).
+
+        The adjustment is appended like any transaction and realizes no P&L.
+        """
+        return self.record(ADJUST, ticker, quantity, np.nan if cost is None else cost, date, lot=lot)
+
+    def _open(self, ticker):
+        code = self.tickers.codes.get(ticker)
+        if code is None or code >= len(self._positions):
+            return ()
+        return self._positions[code].lots
+
+    def _apply(self, position, kind, quantity, price, fees, day, lot=-1):
+        """Update one position for one transaction (the single accounting rule set).
+
+        Average-cost ledgers also track lots once a sell or adjustment names
+        one; only the cost per share of those lots is ignored.
+        """
+        position.fees += fees
+        lots = position.lots
+        if kind == BUY:
+            cost = quantity * price + fees
+            position.quantity += quantity
+            position.cost += cost
+            if self._track_lots:
+                lots.append([quantity, cost / quantity, day])
+            return 0.0
+
+        if kind == SELL:
+            if not self._track_lots:
+                removed = 0.0
+            elif lot >= 0:
+                held = lots[lot]
+                take = min(held[0], quantity)
+                removed = take * held[1]
+                held[0] -= take
+                if held[0] <= EPSILON:
+                    del lots[lot]
+            else:
+                removed, remaining = 0.0, quantity
+                while remaining > EPSILON and lots:
+                    held = lots[0]
+                    take = min(held[0], remaining)
+                    removed += take * held[1]
+                    remaining -= take
+                    held[0] -= take
+                    if held[0] <= EPSILON:
+                        lots.popleft()
+            if self.method == "average":
+                removed = position.cost * quantity / position.quantity
+            position.quantity -= quantity
+            position.cost -= removed
+            if position.quantity <= EPSILON:
+                position.quantity, position.cost = 0.0, 0.0
+            realized = quantity * price - fees - removed
+            position.realized += realized
+            return realized
+
+        if kind == DIVIDEND:
+            cash = quantity * price - fees
+            position.dividends += cash
+            return cash
+
+        if kind == ADJUST:
+            held = lots[lot]
+            # Under average cost every share carries the position's average cost
+            old_cost = held[1] if self.method == "fifo" else position.cost / position.quantity
+            if price != price:  # NaN keeps the lot's cost
+                price = old_cost
+            position.quantity += quantity - held[0]
+            position.cost += quantity * price - held[0] * old_cost
+            if quantity > EPSILON:
+                held[0], held[1] = quantity, price
+            else:
+                del lots[lot]
+            if position.quantity <= EPSILON:
+                position.quantity, position.cost = 0.0, 0.0
+            return 0.0
+
+        # SPLIT: the same cost is spread over `quantity` times as many shares
+        position.quantity *= quantity
+        for held in lots:
+            held[0] *= quantity
+            held[1] /= quantity
+        return 0.0
+
+    def replay(self, method=None):
+        """Recompute every position from the columns in one pass, optionally switching method."""
+        if method is not None:
+            if method not in COST_METHODS:
+                raise ValueError(f"Unknown cost basis method: {method}")
+            self.method = method
+        self._track_lots = self.method == "fifo" or bool((self.column("lot") >= 0).any())
+        self._rebuild()
+
+    def _rebuild(self):
+        """Recompute every position from the columns under the current settings."""
+        self._positions = [Position() for _ in range(len(self.tickers))]
+        n = self.size
+        names = ("ticker", "kind", "quantity", "price", "fees", "date", "lot")
+        rows = zip(*(self.columns[name][:n].tolist() for name in names))
+        positions, apply = self._positions, self._apply
+        for code, kind, quantity, price, fees, day, lot in rows:
+            apply(positions[code], kind, quantity, price, fees, day, lot)
+
+    # -------------------------------------------------------------- queries
+
+    def column(self, name):
+        """A view of the recorded rows of a column."""
+        return self.columns[name][:self.size]
+
+    def position(self, ticker):
+        """Quantity, cost basis, average cost, realized P&L, dividends and fees of one ticker."""
+        code = self.tickers.codes.get(ticker)
+        if code is None or code >= len(self._positions):
+            return Position().as_dict()
+        return self._positions[code].as_dict()
+
+    def positions(self):
+        """{ticker: position dict} for every ticker with transactions."""
+        return {ticker: self.position(ticker) for ticker in self.tickers.labels}
+
+    def open_lots(self, ticker):
+        """Open lots of a ticker as (date, quantity, cost per share), oldest first.
+
+        Under average-cost accounting the position is reported as one lot.
+        """
+        code = self.tickers.codes.get(ticker)
+        if code is None or code >= len(self._positions):
+            return []
+        position = self._positions[code]
+        if self.method == "average":
+            if position.quantity <= EPSILON:
+                return []
+            return [(None, position.quantity, position.cost / position.quantity)]
+        return [(EPOCH + datetime.timedelta(days=day), quantity, cost) for quantity, cost, day in position.lots]
+
+    def pnl(self, prices):
+        """Realized and unrealized P&L per ticker given {ticker: current price}.
+
+        Returns {ticker: dict} plus a "total" entry summing every column.
+        """
+        result = {}
+        for ticker in self.tickers.labels:
+            position = self.position(ticker)
+            price = prices.get(ticker)
+            market_value = position["quantity"] * price if price is not None else position["cost_basis"]
+            position["market_value"] = market_value
+            position["unrealized"] = market_value - position["cost_basis"]
+            position["total"] = position["realized"] + position["unrealized"] + position["dividends"]
+            result[ticker] = position
+
+        fields = ("cost_basis", "market_value", "realized", "unrealized", "dividends", "fees", "total")
+        result["total"] = {field: sum(row[field] for row in result.values()) for field in fields}
+        return result
+
+    def transactions(self, ticker=None):
+        """Recorded transactions as dicts, oldest first, optionally for one ticker."""
+        rows = np.arange(self.size)
+        if ticker is not None:
+            code = self.tickers.codes.get(ticker)
+            if code is None:
+                return []
+            rows = rows[self.column("ticker") == code]
+        return [{
+            "date": EPOCH + datetime.timedelta(days=int(self.columns["date"][row])),
+            "ticker": self.tickers.labels[self.columns["ticker"][row]],
+            "kind": KINDS[self.columns["kind"][row]],
+            "quantity": float(self.columns["quantity"][row]),
+            "price": float(self.columns["price"][row]),
+            "fees": float(self.columns["fees"][row]),
+            "lot": int(self.columns["lot"][row]),
+        } for row in rows]
@@ -0,0 +1,134 @@
+import numpy as np
+
+from services import metrics
+
+GROUPS = ("sector", "asset_class")
+
+
+class LiveValuation:
+    """Portfolio value, weights and P&L kept up to date one tick at a time.
+
+    Built once from the holdings columns; afterwards `update` adjusts the
+    total, the ticker's value, its sector and asset class totals and the
+    unrealized P&L by quantity x price change, so each tick costs O(lots of
+    that ticker) instead of a full `portfolio_summary`. Totals are recomputed
+    from scratch every `resync_every` updates to stop rounding drift.
+    Weights are only divided out when a snapshot is taken.
+    """
+
+    def __init__(self, holdings, ledger=None, resync_every=100000):
+        self.holdings = holdings
+        self.tickers = holdings.tickers()
+        self.index = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self.resync_every = resync_every
+        self.ticks = 0
+
+        table = holdings.tables["ticker"]
+        code_index = np.zeros(len(table), dtype=np.int64)
+        for i, ticker in enumerate(self.tickers):
+            code_index[table.codes[ticker]] = i
+        self._row_ticker = code_index[holdings.column("ticker")]
+        self.quantities = np.bincount(self._row_ticker, weights=holdings.column("quantity"),
+                                      minlength=len(self.tickers))
+        self.prices = np.zeros(len(self.tickers))
+        self.prices[self._row_ticker] = holdings.column("current_price")
+
+        # Per ticker: [(sector code, asset class code, quantity)] of its lots, to move group totals on a tick
+        self._lots = [[] for _ in self.tickers]
+        for i, sector, asset_class, quantity in zip(self._row_ticker.tolist(), holdings.column("sector").tolist(),
+                                                    holdings.column("asset_class").tolist(),
+                                                    holdings.column("quantity").tolist()):
+            self._lots[i].append((sector, asset_class, quantity))
+
+        # Ledger quantities and cost basis drive unrealized P&L; realized P&L and dividends are fixed while watching
+        positions = ledger.positions() if ledger is not None else {}
+        self.ledger_quantities = np.array([positions.get(t, {}).get("quantity", 0.0) for t in self.tickers])
+        self.cost_basis = float(sum(p["cost_basis"] for t, p in positions.items() if t in self.index))
+        self.realized = float(sum(p["realized"] for p in positions.values()))
+        self.dividends = float(sum(p["dividends"] for p in positions.values()))
+
+        self.resync()
+        self.opening_value = self.total_value
+
+    def resync(self):
+        """Recompute every total from the current prices."""
+        self.values = self.quantities * self.prices
+        self.total_value = float(self.values.sum())
+        lot_values = self.holdings.column("quantity") * self.prices[self._row_ticker]
+        self.group_values = {group: np.bincount(self.holdings.column(group), weights=lot_values,
+                                                minlength=len(self.holdings.tables[group]))
+                             for group in GROUPS}
+        self.market_value = float(self.ledger_quantities @ self.prices)
+        self._since_resync = 0
+
+    def update(self, ticker, price):
+        """Apply one tick; returns False for tickers not held or unchanged prices."""
+        i = self.index.get(ticker)
+        if i is None:
+            return False
+        change = price - self.prices[i]
+        if not change:
+            return False
+
+        self.prices[i] = price
+        delta = self.quantities[i] * change
+        self.values[i] += delta
+        self.total_value += delta
+        sectors, asset_classes = self.group_values["sector"], self.group_values["asset_class"]
+        for sector, asset_class, quantity in self._lots[i]:
+            sectors[sector] += quantity * change
+            asset_classes[asset_class] += quantity * change
+        self.market_value += self.ledger_quantities[i] * change
+
+        self.ticks += 1
+        self._since_resync += 1
+        if self._since_resync >= self.resync_every:
+            self.resync()
+        return True
+
+    def apply(self, ticks):
+        """Apply a batch of (ticker, price, timestamp) ticks; returns how many changed a price."""
+        with metrics.timer("stream.apply"):
+            changed = sum(self.update(ticker, price) for ticker, price, _ in ticks)
+        metrics.count("stream.apply.ticks", len(ticks))
+        return changed
+
+    @property
+    def unrealized(self):
+        return self.market_value - self.cost_basis
+
+    def weight(self, ticker):
+        i = self.index.get(ticker)
+        if i is None or not self.total_value:
+            return 0.0
+        return float(self.values[i] / self.total_value)
+
+    def snapshot(self, top=None):
+        """Totals and weights as a JSON-friendly dict; `top` keeps only the largest positions."""
+        total = self.total_value
+        order = np.argsort(-self.values, kind="stable")
+        if top is not None:
+            order = order[:top]
+
+        def group_weights(group):
+            labels = self.holdings.tables[group].labels
+            values = self.group_values[group]
+            return {labels[code]: float(values[code] / total) for code in np.flatnonzero(values) if total}
+
+        return {
+            "total_value": total,
+            "change": total - self.opening_value,
+            "change_pct": (total / self.opening_value - 1) if self.opening_value else 0.0,
+            "unrealized": self.unrealized,
+            "realized": self.realized,
+            "dividends": self.dividends,
+            "ticks": self.ticks,
+            "asset_weights": {self.tickers[i]: float(self.values[i] / total) if total else 0.0 for i in order},
+            "prices": {self.tickers[i]: float(self.prices[i]) for i in order},
+            "sector_weights": group_weights("sector"),
+            "asset_class_weights": group_weights("asset_class"),
+        }
+
+    def commit(self):
+        """Write the latest prices back to the holdings' current price column."""
+        self.holdings.column("current_price")[:] = self.prices[self._row_ticker]
@@ -0,0 +1,121 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from models.covariance import CovarianceModel, cholesky_root
+from services import metrics
+
+
+def _simulate_chunk(task):
+    """Simulate one block of paths; module level so it can run in a worker process."""
+    seed, size, days, initial_value, model, params, keep_paths = task
+    rng = np.random.default_rng(seed)
+
+    if model == "single":
+        mu, sigma = params
+        growth = 1.0 + rng.normal(mu, sigma, size=(size, days))
+        if keep_paths:
+            values = initial_value * np.cumprod(growth, axis=1)
+        else:
+            terminal = initial_value * np.prod(growth, axis=1)
+    else:
+        weights, mean, loadings, specific = params
+        shocks = rng.standard_normal((size, days, loadings.shape[1]))
+        growth = 1.0 + mean + shocks @ loadings.T  # (paths, days, assets)
+        if specific is not None:
+            growth += rng.standard_normal((size, days, len(mean))) * specific
+        if keep_paths:
+            values = initial_value * (np.cumprod(growth, axis=1) @ weights)
+        else:
+            terminal = initial_value * (np.prod(growth, axis=1) @ weights)
+
+    if keep_paths:
+        start = np.full((size, 1), initial_value)
+        paths = np.hstack([start, values])
+        return paths[:, -1].copy(), paths
+    return terminal, None
+
+
+class MonteCarloEngine:
+    """Vectorized Monte Carlo simulation of portfolio value.
+
+    Shocks are drawn in blocks with `numpy.random.Generator`. Each block gets
+    its own child seed from one `SeedSequence`, so results are reproducible
+    for a given seed no matter how many worker processes are used. Only the
+    terminal values are kept unless full paths are requested (e.g. to plot).
+    """
+
+    def __init__(self, seed=None, workers=1, chunk_size=10_000, max_chunk_bytes=64 * 1024 ** 2):
+        self.seed = seed
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.max_chunk_bytes = max_chunk_bytes
+
+    def simulate_single_factor(self, initial_value, mu, sigma, days=252, num_simulations=1000,
+                               keep_paths=False, percentiles=(5, 50, 95), confidence=0.95):
+        """Simulate the portfolio as one asset with normal daily returns."""
+        params = (float(mu), float(sigma))
+        return self._run(initial_value, "single", params, 1, days, num_simulations, keep_paths,
+                         percentiles, confidence)
+
+    def simulate_multivariate(self, initial_value, weights, mean, cov, days=252, num_simulations=1000,
+                              keep_paths=False, percentiles=(5, 50, 95), confidence=0.95):
+        """Simulate each asset with correlated normal daily returns and hold the weights.
+
+        `cov` is a matrix or a CovarianceModel; a factor model draws one shock
+        per factor plus one specific shock per asset instead of a full
+        Cholesky product.
+        """
+        mean = np.asarray(mean, dtype=np.float64)
+        weights = np.asarray(weights, dtype=np.float64)
+        loadings, specific = cov.root() if isinstance(cov, CovarianceModel) else (cholesky_root(cov), None)
+        params = (weights, mean, loadings, specific)
+        return self._run(initial_value, "multivariate", params, len(mean), days, num_simulations, keep_paths,
+                         percentiles, confidence)
+
+    def _chunk_sizes(self, num_simulations, days, num_assets):
+        """Split the paths into blocks that keep the shock array under the memory cap."""
+        per_path = days * max(num_assets, 1) * 8 * 2  # shocks plus growth factors
+        size = max(1, min(self.chunk_size, self.max_chunk_bytes // per_path))
+        full, rest = divmod(num_simulations, size)
+        return [size] * full + ([rest] if rest else [])
+
+    def _run(self, initial_value, model, params, num_assets, days, num_simulations, keep_paths,
+             percentiles, confidence):
+        if num_simulations < 1:
+            raise ValueError(f"Need at least one simulation, got {num_simulations}.")
+        sizes = self._chunk_sizes(num_simulations, days, num_assets)
+        seeds = np.random.SeedSequence(self.seed).spawn(len(sizes))
+        tasks = [(seed, size, days, float(initial_value), model, params, keep_paths)
+                 for seed, size in zip(seeds, sizes)]
+
+        with metrics.timer("monte_carlo.simulate"):
+            if self.workers > 1 and len(tasks) > 1:
+                with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                    results = list(executor.map(_simulate_chunk, tasks))
+            else:
+                results = [_simulate_chunk(task) for task in tasks]
+        metrics.count("monte_carlo.simulate.paths", num_simulations)
+        metrics.count("monte_carlo.simulate.path_days", num_simulations * days)
+
+        terminal = np.concatenate([result[0] for result in results])
+        summary = summarize(terminal, initial_value, percentiles, confidence)
+        summary["days"] = days
+        summary["num_simulations"] = num_simulations
+        if keep_paths:
+            summary["paths"] = np.vstack([result[1] for result in results])
+        return summary
+
+
+def summarize(terminal, initial_value, percentiles=(5, 50, 95), confidence=0.95):
+    """Summarize simulated terminal values with percentiles, VaR and CVaR."""
+    cutoff = np.percentile(terminal, (1 - confidence) * 100)
+    tail = terminal[terminal <= cutoff]
+    return {
+        "initial_value": float(initial_value),
+        "expected_value": float(terminal.mean()),
+        "percentiles": {p: float(v) for p, v in zip(percentiles, np.percentile(terminal, percentiles))},
+        "confidence": confidence,
+        "var": float(initial_value - cutoff),
+        "cvar": float(initial_value - tail.mean()) if tail.size else float(initial_value - cutoff),
+    }
@@ -0,0 +1,171 @@
+import numpy as np
+
+from models.covariance import CovarianceModel
+from services import metrics
+
+TRADING_DAYS = 252
+
+
+class PortfolioOptimizer:
+    """Mean-variance optimizer over precomputed daily mean returns and covariance.
+
+    Mean and covariance are computed once up front and every objective comes
+    with its analytic gradient, so SLSQP never falls back to finite
+    differences. Long-only problems use SLSQP; with `allow_short=True` the
+    fully invested problems have closed-form solutions and skip the solver.
+    `cov` may be a CovarianceModel, whose cached decomposition then serves
+    the closed-form solutions.
+    """
+
+    def __init__(self, mean, cov, tickers=None, risk_free_rate=0.03, allow_short=False, max_iter=500):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.covariance = cov if isinstance(cov, CovarianceModel) else None
+        if self.covariance is not None:
+            cov = self.covariance.matrix()
+        self.cov = np.atleast_2d(np.asarray(cov, dtype=np.float64))
+        self.num_assets = len(self.mean)
+        self.tickers = list(tickers) if tickers is not None else list(range(self.num_assets))
+        self.risk_free_rate = risk_free_rate / TRADING_DAYS  # Daily, like mean and cov
+        self.allow_short = allow_short
+        self.max_iter = max_iter
+        self.iterations = 0  # Total solver iterations, for instrumentation
+        self._ones = np.ones(self.num_assets)
+        self._inverse_cache = {}
+        # Daily variances are ~1e-4, below SLSQP's default tolerance; rescale to order one
+        diagonal = np.diag(self.cov)
+        self._variance_scale = 1.0 / diagonal.mean() if diagonal.size and diagonal.mean() > 0 else 1.0
+
+    @classmethod
+    def from_returns(cls, returns_matrix, covariance="sample", **kwargs):
+        """Build an optimizer from a ReturnsMatrix and one of its covariance estimators."""
+        return cls(returns_matrix.mean(), returns_matrix.covariance(covariance), returns_matrix.tickers, **kwargs)
+
+    # ------------------------------------------------------------ statistics
+
+    def stats(self, weights):
+        """Return a result dict with daily return, volatility and annualized Sharpe."""
+        weights = np.asarray(weights, dtype=np.float64)
+        port_return = float(weights @ self.mean)
+        port_volatility = float(np.sqrt(max(weights @ self.cov @ weights, 0.0)))
+        sharpe = (port_return - self.risk_free_rate) / port_volatility * np.sqrt(TRADING_DAYS) if port_volatility else 0.0
+        return {
+            "weights": weights,
+            "return": port_return,
+            "volatility": port_volatility,
+            "sharpe_ratio": float(sharpe),
+        }
+
+    # ------------------------------------------------------------ objectives
+
+    def _variance(self, weights):
+        cov_w = self.cov @ weights * self._variance_scale
+        return weights @ cov_w, 2.0 * cov_w
+
+    def _negative_sharpe(self, weights):
+        cov_w = self.cov @ weights
+        volatility = np.sqrt(max(weights @ cov_w, 1e-18))
+        excess = weights @ self.mean - self.risk_free_rate
+        value = -excess / volatility
+        gradient = -(self.mean / volatility - excess * cov_w / volatility ** 3)
+        return value, gradient
+
+    def _risk_parity(self, weights):
+        # Minimizing 0.5 w'Σw - mean(log w) gives equal risk contributions after normalizing
+        cov_w = self.cov @ weights * self._variance_scale
+        value = 0.5 * weights @ cov_w - np.log(weights).sum() / self.num_assets
+        gradient = cov_w - 1.0 / (self.num_assets * weights)
+        return value, gradient
+
+    # ----------------------------------------------------------------- solver
+
+    def _budget_constraint(self):
+        return {"type": "eq", "fun": lambda w: w.sum() - 1.0, "jac": lambda w: self._ones}
+
+    def _solve(self, objective, x0, constraints, bounds):
+        import scipy.optimize as sco  # Deferred: scipy.optimize takes ~0.4s to import
+
+        x0 = np.full(self.num_assets, 1.0 / self.num_assets) if x0 is None else np.asarray(x0, dtype=np.float64)
+        with metrics.timer("optimizer.solve"):
+            result = sco.minimize(objective, x0, jac=True, method="SLSQP", bounds=bounds,
+                                  constraints=constraints, options={"maxiter": self.max_iter})
+        self.iterations += int(getattr(result, "nit", 0))
+        metrics.count("optimizer.solve.iterations", int(getattr(result, "nit", 0)))
+        if not result.success:
+            metrics.count("optimizer.failures")
+        return result.x
+
+    def _bounds(self):
+        return None if self.allow_short else [(0.0, 1.0)] * self.num_assets
+
+    def _solve_linear(self, vector):
+        """Return Σ^-1 v, cached per vector role and robust to a singular Σ."""
+        key = vector.tobytes()
+        if key not in self._inverse_cache and self.covariance is not None:
+            self._inverse_cache[key] = self.covariance.solve(vector)
+        if key not in self._inverse_cache:
+            try:
+                self._inverse_cache[key] = np.linalg.solve(self.cov, vector)
+            except np.linalg.LinAlgError:
+                self._inverse_cache[key] = np.linalg.lstsq(self.cov, vector, rcond=None)[0]
+        return self._inverse_cache[key]
+
+    # -------------------------------------------------------------- portfolios
+
+    def min_variance(self, x0=None):
+        """Minimum-variance fully invested portfolio."""
+        if self.allow_short:
+            inv_ones = self._solve_linear(self._ones)
+            return self.stats(inv_ones / inv_ones.sum())
+        weights = self._solve(self._variance, x0, [self._budget_constraint()], self._bounds())
+        return self.stats(weights)
+
+    def target_return(self, target, x0=None):
+        """Minimum-variance portfolio with a given daily expected return."""
+        if self.allow_short:
+            inv_ones = self._solve_linear(self._ones)
+            inv_mean = self._solve_linear(self.mean)
+            a, b, c = self._ones @ inv_ones, self._ones @ inv_mean, self.mean @ inv_mean
+            d = a * c - b * b
+            weights = ((c - b * target) * inv_ones + (a * target - b) * inv_mean) / d
+            return self.stats(weights)
+
+        constraints = [
+            self._budget_constraint(),
+            {"type": "eq", "fun": lambda w: w @ self.mean - target, "jac": lambda w: self.mean},
+        ]
+        weights = self._solve(self._variance, x0, constraints, self._bounds())
+        return self.stats(weights)
+
+    def max_sharpe(self, x0=None):
+        """Tangency portfolio maximizing the Sharpe ratio."""
+        if self.allow_short:
+            inv_excess = self._solve_linear(self.mean - self.risk_free_rate)
+            return self.stats(inv_excess / inv_excess.sum())
+        weights = self._solve(self._negative_sharpe, x0, [self._budget_constraint()], self._bounds())
+        return self.stats(weights)
+
+    def risk_parity(self, x0=None):
+        """Portfolio in which every asset contributes the same share of risk."""
+        bounds = [(1e-10, None)] * self.num_assets
+        weights = self._solve(self._risk_parity, x0, [], bounds)
+        return self.stats(weights / weights.sum())
+
+    def efficient_frontier(self, num_points=20):
+        """Solve the frontier from the minimum-variance point to the highest attainable return.
+
+        Each point is warm-started from the previous solution, which is close to
+        the next optimum and keeps the SLSQP iteration count low.
+        """
+        min_var = self.min_variance()
+        low = min_var["return"]
+        high = self.mean.max() if not self.allow_short else low + 2 * (self.mean.max() - low)
+        if num_points < 2 or high <= low:
+            return [min_var]
+
+        frontier = [min_var]
+        weights = min_var["weights"]
+        for target in np.linspace(low, high, num_points)[1:]:
+            point = self.target_return(target, x0=weights)
+            frontier.append(point)
+            weights = point["weights"]
+        return frontier
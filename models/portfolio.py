@@ -1,260 +1,471 @@
 import numpy as np
-import yfinance as yf
-from collections import Counter
-from tabulate import tabulate
-import matplotlib.pyplot as plt
-import scipy.optimize as sco
-from services.price_fetcher import fetch_historical_prices
+import datetime
+from services import metrics
+from services.price_fetcher import (fetch_current_price, fetch_historical_prices, fetch_historical_prices_many,
+                                    get_price_store)
+from models.backtest import Backtester
+from models.holdings import Holdings
+from models.ledger import Ledger
+from models.returns_matrix import ReturnsMatrix
+from models.monte_carlo import MonteCarloEngine
+from models.optimizer import PortfolioOptimizer
+from models.risk import RollingRiskEngine, DEFAULT_WINDOWS, TRADING_DAYS
+from models.scenarios import STANDARD_SCENARIOS, ScenarioEngine, historical_windows, sensitivities
+from models.valuation import portfolio_value_series
 
 
 class Portfolio:
-    def __init__(self):
-        self.assets = []
+    def __init__(self, holdings=None, ledger=None):
+        self.holdings = holdings if holdings is not None else Holdings()
+        # Holdings without a trade history start the ledger with one buy per lot
+        self.ledger = ledger if ledger is not None else Ledger.from_holdings(self.holdings)
+        self._returns_cache = {}
+        self._risk_engines = {}
+
+    @property
+    def assets(self):
+        """The lots in the portfolio, in the order they were added."""
+        return self.holdings.assets
+
+    def invalidate_cache(self):
+        """Drop cached analytics inputs (called when holdings change)."""
+        self._returns_cache.clear()
+        self._risk_engines.clear()
+
+    def tickers(self):
+        """Unique tickers held, in order of first appearance."""
+        return self.holdings.tickers()
+
+    def returns_matrix(self, period="1y", policy="drop"):
+        """Return the shared date-aligned returns matrix for the current holdings.
+
+        The matrix is built once per price snapshot and reused by every
+        analytic; it is rebuilt when the held tickers, the price store
+        contents or the calendar day change.
+        """
+        tickers = tuple(self.tickers())
+        key = (tickers, period, policy)
+        snapshot = (get_price_store().version, datetime.date.today())
+
+        cached = self._returns_cache.get(key)
+        if cached is not None and cached[0] == snapshot:
+            metrics.count("returns_matrix.cache_hits")
+            return cached[1]
+
+        metrics.count("returns_matrix.cache_misses")
+        price_data = fetch_historical_prices_many(tickers, period=period)
+        with metrics.timer("returns_matrix.build"):
+            matrix = ReturnsMatrix.from_prices(price_data, policy=policy)
+        if cached is not None:
+            matrix.carry_over(cached[1])  # New days update the covariance estimates instead of refitting
+        # Fetching may itself have written to the store, so read the version afterwards
+        snapshot = (get_price_store().version, datetime.date.today())
+        self._returns_cache[key] = (snapshot, matrix)
+        return matrix
 
     def add_asset(self, asset):
         """Add a new asset to the portfolio, automatically fetching its current value"""
-        try:
-            stock = yf.Ticker(asset.ticker)
-            price_history = stock.history(period="1d").get("Close")
-            
-            if price_history is not None and not price_history.empty:
-                latest_price = price_history.iloc[-1]
-                asset.update_price(latest_price)
-            else:
-                latest_price = asset.purchase_price  # Default to purchase price
-                print(f" No recent market data for {asset.ticker}. Using purchase price.")
-
-        except Exception as e:
-            latest_price = asset.purchase_price  # Default to purchase price if error occurs
-            print(f" Error fetching price for {asset.ticker}: {e}")
+        latest_price = fetch_current_price(asset.ticker)
+        if latest_price is not None:
+            asset.update_price(latest_price)
+        else:
+            latest_price = asset.purchase_price  # Default to purchase price
+            print(f" No recent market data for {asset.ticker}. Using purchase price.")
 
-        self.assets.append(asset)
+        self.holdings.add(asset)
+        if asset.quantity > 0:
+            self.ledger.buy(asset.ticker, asset.quantity, asset.purchase_price)
+        self.invalidate_cache()
         print(f" Successfully added {asset.ticker} with price ${latest_price:.2f}\n")
 
-    def display_portfolio(self):
-        """Display the portfolio with transaction value before current value"""
-        if not self.assets:
-            print(" No assets in portfolio.")
-            return
-
-        print("\n Portfolio Overview:")
-
-        # Debugging: Print transaction values directly
-        for asset in self.assets:
-            print(f"Debug: {asset.ticker} - Transaction Value: ${asset.transaction_value():,.2f}")
-            
-            headers = ["Ticker", "Sector", "Asset Class", "Quantity", "Purchase Price", "Transaction Value", "Current Value"]
-    
-        data = [[
-            asset.ticker, 
-            asset.sector, 
-            asset.asset_class, 
-            str(asset.quantity),  # Ensure it's a string
-            f"${asset.purchase_price:,.2f}",  
-            f"${asset.transaction_value():,.2f}",  # Ensure it's formatted properly
-            f"${asset.current_value():,.2f}"
-            ] for asset in self.assets]
-
-        print(tabulate(data, headers=headers, tablefmt="grid"))
-
-
-    def edit_asset(self, ticker, new_quantity=None, new_purchase_price=None):
-        """Edit an existing asset's quantity or purchase price, handling duplicates."""
-        matching_assets = [asset for asset in self.assets if asset.ticker == ticker]
-    
-        if not matching_assets:
-            print(f" No assets found with ticker {ticker}.")
-            return
-
-        # If multiple assets exist, ask the user which one to edit
-        if len(matching_assets) > 1:
-            print(f" Multiple assets found for {ticker}. Select which to edit:")
-            for i, asset in enumerate(matching_assets):
-                print(f"[{i + 1}] Quantity: {asset.quantity}, Purchase Price: ${asset.purchase_price:.2f}, Transaction Value: ${asset.transaction_value():,.2f}")
-        
-            try:
-                choice = input("Enter the number of the asset to edit: ")
-                if not choice.isdigit() or not (1 <= int(choice) <= len(matching_assets)):
-                    print(" Invalid selection.")
-                    return
-            except ValueError:
-                print ("Invalid input")
-                return
-            
-            asset_to_edit = matching_assets[int(choice) - 1]
-        else:
-            asset_to_edit = matching_assets[0]
-
-        # Ask the user for new values **after selecting the correct asset**
-        new_quantity = input("Enter new quantity (press Enter to skip): ")
-        new_purchase_price = input("Enter new purchase price (press Enter to skip): ")
-
-        if new_quantity:
-            asset_to_edit.quantity = int(new_quantity)
-        if new_purchase_price:
-            asset_to_edit.purchase_price = float(new_purchase_price)
-
-        print(f" Updated {ticker}: Quantity = {asset_to_edit.quantity}, Purchase Price = ${asset_to_edit.purchase_price:.2f}, Transaction Value = ${asset_to_edit.transaction_value():,.2f}")
-    
-    def remove_asset(self, ticker):
-        """Remove an asset from the portfolio, handling duplicates."""
-        matching_assets = [asset for asset in self.assets if asset.ticker == ticker]
-    
-        if not matching_assets:
-            print(f" No assets found with ticker {ticker}.")
-            return
-
-        # If multiple assets exist, ask the user which one to remove
-        if len(matching_assets) > 1:
-            print(f" Multiple assets found for {ticker}. Select which to remove:")
-            for i, asset in enumerate(matching_assets):
-                print(f"[{i + 1}] Quantity: {asset.quantity}, Purchase Price: ${asset.purchase_price:.2f}, Transaction Value: ${asset.transaction_value():,.2f}")
-
-            choice = input("Enter the number of the asset to remove: ")
-            if not choice.isdigit() or not (1 <= int(choice) <= len(matching_assets)):
-                print(" Invalid selection.")
-                return
-            asset_to_remove = matching_assets[int(choice) - 1]
-            self.assets.remove(asset_to_remove)
-        else:
-            self.assets.remove(matching_assets[0])
+    def display_portfolio(self, page=1, page_size=50, **options):
+        """Display one page of the holdings table (see views.table_view.HoldingsTable for the options)."""
+        from views.cli_view import CLIView
+
+        CLIView.display_portfolio(self, page=page, page_size=page_size, **options)
 
-        print(f" Removed {ticker} from the portfolio.")
+    def edit_asset(self, ticker, new_quantity=None, new_purchase_price=None, lot=0):
+        """Edit the quantity and/or purchase price of one lot of a ticker.
+
+        `lot` is the position of the lot among the ticker's lots in the order
+        they were added. The edit is a correction, not a trade: the ledger
+        records an adjustment of the same lot with no realized P&L, so its
+        lots and cost basis stay in step with the holdings. Filling an empty
+        lot is recorded as a buy and moves the lot last. Returns the edited
+        asset, or None if there is no such lot.
+        """
+        matching_assets = self.holdings.lots(ticker)
+        if not 0 <= lot < len(matching_assets):
+            return None
+
+        asset_to_edit = matching_assets[lot]
+        quantity = asset_to_edit.quantity if new_quantity is None else new_quantity
+        price = asset_to_edit.purchase_price if new_purchase_price is None else new_purchase_price
+        if asset_to_edit.quantity > 0:
+            cost = None if price == asset_to_edit.purchase_price else price
+            self.ledger.adjust(ticker, self._open_lot(matching_assets, lot), quantity, cost)
+        elif quantity > 0:
+            # An empty lot has no ledger lot; like any purchase it becomes the newest one
+            self.ledger.buy(ticker, quantity, price)
+            self.holdings.remove(asset_to_edit)
+            self.holdings.add(asset_to_edit)
+        asset_to_edit.quantity = quantity
+        asset_to_edit.purchase_price = price
+        return asset_to_edit
+
+    def remove_asset(self, ticker, lot=0):
+        """Remove one lot of a ticker, recorded as a sale of that lot at its current price.
+
+        Returns the removed asset, or None if there is no such lot.
+        """
+        matching_assets = self.holdings.lots(ticker)
+        if not 0 <= lot < len(matching_assets):
+            return None
+
+        asset_to_remove = matching_assets[lot]
+        if asset_to_remove.quantity > 0:
+            self.ledger.sell(ticker, asset_to_remove.quantity, asset_to_remove.current_price,
+                             lot=self._open_lot(matching_assets, lot))
+        self.holdings.remove(asset_to_remove)
+        self.invalidate_cache()
+        return asset_to_remove
+
+    @staticmethod
+    def _open_lot(lots, lot):
+        """Index of a holdings lot among the ledger's open lots, which skip empty lots."""
+        return sum(1 for asset in lots[:lot] if asset.quantity > 0)
+
+    # ------------------------------------------------------------ trades
+
+    def sell(self, ticker, quantity, price, date=None, fees=0.0):
+        """Sell shares of a ticker, reducing its oldest lots first. Returns the realized P&L.
+
+        Raises ValueError when more shares are sold than are held.
+        """
+        realized = self.ledger.sell(ticker, quantity, price, date, fees)
+        remaining = quantity
+        for asset in self.holdings.lots(ticker):
+            if remaining <= 0:
+                break
+            taken = min(asset.quantity, remaining)
+            remaining -= taken
+            if taken >= asset.quantity:
+                self.holdings.remove(asset)
+            else:
+                asset.quantity = asset.quantity - taken
+        self.invalidate_cache()
+        return realized
+
+    def record_dividend(self, ticker, per_share, date=None, fees=0.0):
+        """Record a cash dividend on the shares held; returns the net cash received."""
+        return self.ledger.dividend(ticker, per_share, date, fees)
+
+    def record_split(self, ticker, ratio, date=None):
+        """Apply a stock split to the ledger and to every lot of the ticker."""
+        self.ledger.split(ticker, ratio, date)
+        for asset in self.holdings.lots(ticker):
+            asset.quantity = asset.quantity * ratio
+            asset.purchase_price = asset.purchase_price / ratio
+            asset.current_price = asset.current_price / ratio
+        self.invalidate_cache()
+
+    def pnl(self):
+        """Realized and unrealized P&L per ticker from the ledger, valued at current prices."""
+        prices = {asset.ticker: asset.current_price for asset in self.assets}
+        return self.ledger.pnl(prices)
 
     def portfolio_summary(self):
         """Calculate total portfolio value and weights per asset, asset class, and sector."""
-        if not self.assets:
+        if not len(self.holdings):
             return None  # No data available
 
-        total_value = sum(asset.current_value() for asset in self.assets)
-
-        # 1️⃣ Calculate **asset weights**, grouping multiple assets with the same ticker
-        asset_values = {}
-        for asset in self.assets:
-            asset_values[asset.ticker] = asset_values.get(asset.ticker, 0) + asset.current_value()
-        asset_weights = {ticker: value / total_value for ticker, value in asset_values.items()}
-
-        # 2️⃣ Calculate **asset class weights**
-        asset_class_values = {}
-        for asset in self.assets:
-            asset_class_values[asset.asset_class] = asset_class_values.get(asset.asset_class, 0) + asset.current_value()
-        asset_class_weights = {k: v / total_value for k, v in asset_class_values.items()}
+        values = self.holdings.values()
+        total_value = float(values.sum())
 
-        # 3️⃣ Calculate **sector weights**, grouping multiple assets in the same sector
-        sector_values = {}
-        for asset in self.assets:
-            sector_values[asset.sector] = sector_values.get(asset.sector, 0) + asset.current_value()
-        sector_weights = {k: v / total_value for k, v in sector_values.items()}
+        # Each grouping is one bincount over the integer codes of the holdings columns
+        def weights(by):
+            return {k: v / total_value for k, v in self.holdings.group_values(by, values).items()}
 
         return {
             "total_value": total_value,
-            "asset_weights": asset_weights,
-            "asset_class_weights": asset_class_weights,
-            "sector_weights": sector_weights
+            "asset_weights": weights("ticker"),
+            "asset_class_weights": weights("asset_class"),
+            "sector_weights": weights("sector")
         }
 
-    def calculate_portfolio_risk_metrics(self, risk_free_rate=0.03):
-        """Calculate Sharpe & Sortino ratio for the portfolio."""
-        historical_data = {}
-
-        for asset in self.assets:
-            history = fetch_historical_prices(asset.ticker, period="1y")
-            if history is not None and not history.empty:
-                historical_data[asset.ticker] = history.pct_change().dropna()  # Calculate daily returns
-
-        if not historical_data:
-            print(" No historical data available.")
+    def value_history(self, period="6mo"):
+        """Daily value of the current holdings over a lookback period (quantity x split-adjusted close)."""
+        price_data = fetch_historical_prices_many(self.tickers(), period=period, adjustment="adjusted")
+        with metrics.timer("valuation.value_history"):
+            return portfolio_value_series(price_data, self.holdings)
+
+    def value_weights(self, tickers):
+        """Current value weight of each given ticker, renormalized over those tickers."""
+        ticker_values = self.holdings.group_values("ticker")
+        values = np.array([ticker_values.get(ticker, 0.0) for ticker in tickers])
+        if values.sum() <= 0:
+            return np.full(len(tickers), 1 / len(tickers))
+        return values / values.sum()
+
+    def portfolio_returns(self, period="1y"):
+        """Daily returns of the current positions held over the period, weighted by value.
+
+        Returns (returns array, dates), or None without price history.
+        """
+        matrix = self.returns_matrix(period=period)
+        if matrix.empty:
             return None
+        return matrix.values @ self.value_weights(matrix.tickers), matrix.dates
 
-        portfolio_returns = np.mean(list(historical_data.values()), axis=0)
-        portfolio_volatility = np.std(portfolio_returns)
-        
-        sharpe_ratio = (np.mean(portfolio_returns) - risk_free_rate) / portfolio_volatility
+    def _benchmark_returns(self, benchmark, dates, period):
+        """Benchmark daily returns on the given dates, or None if any are missing."""
+        if benchmark is None:
+            return None
+        prices = fetch_historical_prices(benchmark, period=period)
+        if prices is None or prices.empty:
+            return None
+        returns = prices.pct_change().reindex(dates)
+        return None if returns.isna().any() else returns.to_numpy()
 
-        # Sortino Ratio: Only considers downside volatility
-        downside_volatility = np.std([r for r in portfolio_returns if r < 0])
-        sortino_ratio = (np.mean(portfolio_returns) - risk_free_rate) / downside_volatility
+    def risk_engine(self, risk_free_rate=0.03, period="1y", benchmark="SPY", windows=DEFAULT_WINDOWS):
+        """Return a RollingRiskEngine fed with the portfolio's daily returns.
 
+        The engine is kept between calls: when the weights are unchanged and
+        new daily closes arrive, only the new days are pushed into it.
+        """
+        series = self.portfolio_returns(period=period)
+        if series is None:
+            return None
+        returns, dates = series
+        market = self._benchmark_returns(benchmark, dates, period)
+
+        key = (period, benchmark, risk_free_rate, tuple(windows))
+        weights = self.value_weights(self.returns_matrix(period=period).tickers).tobytes()
+        cached = self._risk_engines.get(key)
+        if cached is not None:
+            cached_weights, last_date, engine = cached
+            new_rows = dates > last_date
+            if cached_weights == weights and last_date in dates and (market is not None) == engine._has_market:
+                if new_rows.any():
+                    engine.extend(returns[new_rows], None if market is None else market[new_rows])
+                metrics.count("risk_engine.incremental_days", int(new_rows.sum()))
+                self._risk_engines[key] = (weights, dates[-1], engine)
+                return engine
+
+        engine = RollingRiskEngine(windows=windows, risk_free_rate=risk_free_rate)
+        with metrics.timer("risk_engine.rebuild"):
+            engine.extend(returns, market)
+        metrics.count("risk_engine.rebuild.days", len(returns))
+        self._risk_engines[key] = (weights, dates[-1], engine)
+        return engine
+
+    def ex_ante_risk(self, period="1y", covariance="sample"):
+        """Forward-looking annualized volatility of the current weights and each ticker's share of it.
+
+        Uses the covariance estimator's model of the returns matrix, so
+        repeated calls reuse its cached estimate.
+        """
+        matrix = self.returns_matrix(period=period)
+        if matrix.empty:
+            return None
+        model = matrix.covariance(covariance)
+        weights = self.value_weights(matrix.tickers)
+        variance = model.variance(weights)
+        contributions = weights * model.dot(weights) / variance if variance else np.zeros(len(weights))
         return {
-            "sharpe_ratio": sharpe_ratio,
-            "sortino_ratio": sortino_ratio,
-            "volatility": portfolio_volatility
+            "volatility": float(np.sqrt(variance * TRADING_DAYS)),
+            "risk_contributions": {ticker: float(c) for ticker, c in zip(matrix.tickers, contributions)},
         }
 
-    def monte_carlo_simulation(self, num_simulations=1000, days=252):
-        """Simulate future portfolio value using Monte Carlo."""
-        historical_data = {}
-
-        for asset in self.assets:
-            history = fetch_historical_prices(asset.ticker, period="1y")
-            if history is not None and not history.empty:
-                historical_data[asset.ticker] = history.pct_change().dropna()  # Daily returns
-
-        if not historical_data:
-            print(" No historical data available.")
+    def calculate_portfolio_risk_metrics(self, risk_free_rate=0.03, period="1y", benchmark="SPY",
+                                         windows=DEFAULT_WINDOWS, covariance="sample"):
+        """Calculate annualized Sharpe, Sortino, volatility, drawdown, beta and VaR.
+
+        Returns are the value-weighted daily returns of the current positions.
+        The top-level figures use the longest window; "windows" holds the
+        metrics of every rolling window and "ex_ante" the volatility the
+        covariance estimator predicts for the current weights.
+        """
+        engine = self.risk_engine(risk_free_rate=risk_free_rate, period=period, benchmark=benchmark,
+                                  windows=windows)
+        if engine is None:
+            return None  # No historical data available
+
+        per_window = engine.metrics()
+        longest = per_window[engine.windows[-1]]
+        if longest is None:
             return None
 
-        portfolio_returns = np.mean(list(historical_data.values()), axis=0)
-        portfolio_volatility = np.std(portfolio_returns)
-        initial_value = sum(asset.current_value() for asset in self.assets)
-
-        simulations = []
-        for _ in range(num_simulations):
-            simulated_values = [initial_value]
-            for _ in range(days):
-                daily_return = np.random.normal(np.mean(portfolio_returns), portfolio_volatility)
-                simulated_values.append(simulated_values[-1] * (1 + daily_return))
-
-            simulations.append(simulated_values)
-
-        simulations = np.array(simulations)
-
-        plt.figure(figsize=(10, 5))
-        plt.plot(simulations.T, alpha=0.1, color="blue")
-        plt.title(f"Monte Carlo Portfolio Projection ({num_simulations} Simulations)")
-        plt.xlabel("Days")
-        plt.ylabel("Portfolio Value")
-        plt.show()
-
-        print(f" Expected portfolio value in {days} days: ${np.mean(simulations[:, -1]):,.2f}")
-        print(f" 5th percentile: ${np.percentile(simulations[:, -1], 5):,.2f}")
-        print(f" 95th percentile: ${np.percentile(simulations[:, -1], 95):,.2f}")
-
-    def optimize_portfolio(self):
-        """Find the optimal portfolio allocation based on the efficient frontier."""
-        historical_data = {}
-
-        for asset in self.assets:
-            history = fetch_historical_prices(asset.ticker, period="1y")
-            if history is not None and not history.empty:
-                historical_data[asset.ticker] = history.pct_change().dropna()
+        return {
+            "sharpe_ratio": longest["sharpe_ratio"],
+            "sortino_ratio": longest["sortino_ratio"],
+            "volatility": longest["volatility"],
+            "max_drawdown": longest["max_drawdown"],
+            "beta": longest["beta"],
+            "var": longest["var"],
+            "windows": per_window,
+            "ex_ante": self.ex_ante_risk(period=period, covariance=covariance),
+        }
 
-        if not historical_data:
-            print(" No historical data available.")
+    def rolling_risk(self, risk_free_rate=0.03, period="1y", benchmark="SPY", windows=DEFAULT_WINDOWS):
+        """Full rolling metric series as {window: DataFrame}."""
+        series = self.portfolio_returns(period=period)
+        if series is None:
             return None
-
-        returns = np.array(list(historical_data.values()))
-        num_assets = len(self.assets)
-
-        def portfolio_stats(weights):
-            """Calculate portfolio return and volatility."""
-            weights = np.array(weights)
-            port_return = np.sum(weights * np.mean(returns, axis=1))
-            port_volatility = np.sqrt(np.dot(weights.T, np.dot(np.cov(returns), weights)))
-            return port_return, port_volatility
-
-        def min_volatility(weights):
-            """Objective function to minimize volatility."""
-            return portfolio_stats(weights)[1]
-
-        constraints = {"type": "eq", "fun": lambda w: np.sum(w) - 1}
-        bounds = [(0, 1) for _ in range(num_assets)]
-        initial_guess = [1 / num_assets] * num_assets
-
-        optimized = sco.minimize(min_volatility, initial_guess, bounds=bounds, constraints=constraints)
-    
-        optimal_weights = optimized.x
-        for i, asset in enumerate(self.assets):
-            print(f"🔹 {asset.ticker}: {optimal_weights[i] * 100:.2f}% allocation")
-
-        return optimal_weights
+        returns, dates = series
+        market = self._benchmark_returns(benchmark, dates, period)
+        engine = RollingRiskEngine(windows=windows, risk_free_rate=risk_free_rate)
+        return engine.rolling_series(returns, market, dates)
+
+    def monte_carlo_simulation(self, num_simulations=1000, days=252, model="single", seed=None,
+                               workers=1, keep_paths=False, period="1y", covariance="sample"):
+        """Simulate future portfolio value using Monte Carlo.
+
+        model="single" draws one normal return per day for the whole portfolio,
+        with the mean and volatility of its value-weighted daily returns;
+        model="multivariate" draws correlated per-asset returns and holds the
+        current value weights, drawing correlations from the `covariance`
+        estimator. Returns the summary dict from MonteCarloEngine,
+        including every simulated path under "paths" when keep_paths is set.
+        """
+        returns = self.returns_matrix(period=period)
+
+        if returns.empty:
+            return None  # No historical data available
+
+        initial_value = self.holdings.total_value()
+        engine = MonteCarloEngine(seed=seed, workers=workers)
+
+        if model == "multivariate":
+            weights = self.value_weights(returns.tickers)
+            result = engine.simulate_multivariate(initial_value, weights, returns.mean(),
+                                                  returns.covariance(covariance),
+                                                  days=days, num_simulations=num_simulations, keep_paths=keep_paths)
+        else:
+            portfolio_returns, _ = self.portfolio_returns(period)
+            result = engine.simulate_single_factor(initial_value, np.mean(portfolio_returns),
+                                                   np.std(portfolio_returns), days=days,
+                                                   num_simulations=num_simulations, keep_paths=keep_paths)
+        return result
+
+    def optimize_portfolio(self, objective="min_volatility", risk_free_rate=0.03, period="1y", covariance="sample"):
+        """Find the optimal portfolio allocation based on the efficient frontier.
+
+        objective is one of "min_volatility", "max_sharpe" or "risk_parity";
+        covariance is one of the estimators in models.covariance. Returns
+        {ticker: weight}.
+        """
+        matrix = self.returns_matrix(period=period)
+
+        if matrix.empty:
+            return None  # No historical data available
+
+        optimizer = PortfolioOptimizer.from_returns(matrix, covariance=covariance, risk_free_rate=risk_free_rate)
+        solvers = {
+            "min_volatility": optimizer.min_variance,
+            "max_sharpe": optimizer.max_sharpe,
+            "risk_parity": optimizer.risk_parity,
+        }
+        if objective not in solvers:
+            raise ValueError(f"Unknown objective: {objective}")
+
+        optimal_weights = solvers[objective]()["weights"]
+        return {ticker: float(weight) for ticker, weight in zip(matrix.tickers, optimal_weights)}
+
+    def backtest(self, objectives=("min_volatility", "max_sharpe", "equal_weight"), period="5y", window=252,
+                 rebalance_every=21, cost_bps=10.0, risk_free_rate=0.03, workers=1, covariance="sample"):
+        """Walk-forward backtest of rebalancing the held tickers to each objective's weights.
+
+        Starts from the current portfolio value; returns {objective: result}
+        as described in Backtester.run, or None without enough history.
+        """
+        matrix = self.returns_matrix(period=period)
+        if len(matrix.values) <= window:
+            return None  # Not enough historical data
+
+        backtester = Backtester(matrix, window=window, rebalance_every=rebalance_every, cost_bps=cost_bps,
+                                risk_free_rate=risk_free_rate, workers=workers, covariance=covariance)
+        return backtester.run(objectives, initial_value=self.holdings.total_value())
+
+    def _factor_changes(self, ticker, dates, period, differences=False):
+        """Daily returns (or price differences) of a factor ticker on the given dates, NaN where missing."""
+        prices = fetch_historical_prices(ticker, period=period)
+        if prices is None or prices.empty:
+            return None
+        changes = prices.diff() if differences else prices.pct_change()
+        return changes.reindex(dates).to_numpy(dtype=np.float64)
+
+    def _sensitivities(self, engine, matrix, factor, default):
+        """Per-ticker slope on a factor series, in the engine's ticker order; `default` without history."""
+        betas = np.full(len(engine.tickers), default, dtype=np.float64)
+        if factor is not None and not matrix.empty:
+            betas[[engine.index[ticker] for ticker in matrix.tickers]] = sensitivities(matrix.values, factor)
+        return betas
+
+    def stress_test(self, scenarios=None, historical=None, num_simulations=0, days=21, stress=1.0,
+                    confidence=0.95, seed=None, workers=1, period="1y", covariance="sample", benchmark="SPY",
+                    rate_proxy="^TNX"):
+        """Revalue the holdings under shock scenarios, historical replays and simulated stressed moves.
+
+        `scenarios` maps names to shock specs (see ScenarioEngine.shocks,
+        default STANDARD_SCENARIOS). `historical` lists HISTORICAL_SCENARIOS
+        names or "START:END" date ranges (default all the named ones).
+        Market shocks move each ticker by its beta to `benchmark` (1 without
+        history) and rate shocks by its sensitivity to daily changes of the
+        `rate_proxy` yield (0 without history), both estimated on the cached
+        `period` returns matrix. Replays fill tickers that did not trade then
+        from the `covariance` estimate, and `num_simulations` `days`-day moves
+        are drawn from it with volatility times `stress`.
+
+        Returns {"value", "scenarios": {name: P&L, return and breakdowns per
+        asset, sector and asset class}, "simulated": summary or None}, or
+        None for an empty portfolio.
+        """
+        from services.price_store import covering_period
+
+        if not len(self.holdings):
+            return None
+        engine = ScenarioEngine(self.holdings, workers=workers)
+        matrix = self.returns_matrix(period=period)
+        model = None if matrix.empty else matrix.covariance(covariance)
+        scenarios = STANDARD_SCENARIOS if scenarios is None else scenarios
+        windows = historical_windows(historical)
+        report = {}
+
+        if scenarios:
+            specs = list(scenarios.values())
+            market = rates = None
+            if any(spec.get("market") for spec in specs):
+                factor = self._factor_changes(benchmark, matrix.dates, period) if not matrix.empty else None
+                market = self._sensitivities(engine, matrix, factor, 1.0)
+            if any(spec.get("rates") for spec in specs):
+                factor = (self._factor_changes(rate_proxy, matrix.dates, period, differences=True)
+                          if not matrix.empty else None)
+                rates = self._sensitivities(engine, matrix, factor, 0.0)
+            report.update(engine.report(list(scenarios), engine.evaluate(*engine.shocks(specs, market, rates))))
+
+        if windows:
+            # Fetch once over the shortest stored period that reaches back before the earliest window
+            earliest = min(datetime.date.fromisoformat(start) for start, _ in windows.values())
+            price_data = fetch_historical_prices_many(engine.tickers, period=covering_period(earliest))
+
+            shocks, filled = engine.historical_shocks(price_data, list(windows.values()),
+                                                      None if model is None else model.matrix(), matrix.tickers)
+            replays = engine.report(list(windows), engine.evaluate(shocks))
+            for name, tickers in zip(windows, filled):
+                replays[name]["filled"] = tickers
+            report.update(replays)
+
+        simulated = None
+        if num_simulations and model is not None:
+            loadings, specific = model.root()
+            simulated = engine.simulate(matrix.mean(), loadings, specific, matrix.tickers, num_simulations, days,
+                                        stress, confidence, seed)
+        return {"value": engine.value, "scenarios": report, "simulated": simulated}
+
+    def efficient_frontier(self, num_points=20, risk_free_rate=0.03, period="1y"):
+        """Return the long-only efficient frontier as a list of result dicts."""
+        matrix = self.returns_matrix(period=period)
+        if matrix.empty:
+            return None
+        return PortfolioOptimizer.from_returns(matrix, risk_free_rate=risk_free_rate).efficient_frontier(num_points)
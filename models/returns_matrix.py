@@ -0,0 +1,109 @@
+import numpy as np
+
+from models.covariance import CovarianceModel
+
+MISSING_POLICIES = ("drop", "ffill", "zero")
+
+
+class ReturnsMatrix:
+    """Date-aligned daily returns for a set of tickers in one float64 buffer.
+
+    `values` has shape (days, tickers) and is C-contiguous, so analytics can
+    slice columns or feed the whole buffer to NumPy without copying.
+
+    Missing data policy:
+      - "drop":  keep only dates on which every ticker traded
+      - "ffill": forward fill prices over gaps (missing days return 0)
+      - "zero":  treat a missing return as 0 without filling prices
+    """
+
+    def __init__(self, values, tickers, dates, policy="drop"):
+        import pandas as pd
+
+        self.values = np.ascontiguousarray(values, dtype=np.float64)
+        self.tickers = list(tickers)
+        self.dates = pd.DatetimeIndex(dates)
+        self.policy = policy
+        self._positions = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self._covariances = {}
+
+    @classmethod
+    def from_prices(cls, price_data, policy="drop"):
+        """Build the matrix from {ticker: price Series} using a missing-data policy."""
+        import pandas as pd
+
+        if policy not in MISSING_POLICIES:
+            raise ValueError(f"Unknown missing data policy: {policy}")
+
+        series = {ticker: prices for ticker, prices in price_data.items() if prices is not None and not prices.empty}
+        if not series:
+            return cls(np.empty((0, 0)), [], [], policy)
+
+        prices = pd.DataFrame(series).sort_index()
+        if policy == "drop":
+            returns = prices.dropna().pct_change().iloc[1:]
+        elif policy == "ffill":
+            returns = prices.ffill().pct_change(fill_method=None).iloc[1:]
+            returns = returns.dropna(how="any")  # Only leading rows before a ticker listed
+        else:
+            returns = prices.pct_change(fill_method=None).iloc[1:].fillna(0.0)
+
+        return cls(returns.to_numpy(), list(prices.columns), returns.index, policy)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def empty(self):
+        return self.values.size == 0
+
+    def column(self, ticker):
+        """Return the returns of one ticker as a 1-D view."""
+        return self.values[:, self._positions[ticker]]
+
+    def index_of(self, ticker):
+        """Column position of a ticker, or None."""
+        return self._positions.get(ticker)
+
+    def mean(self):
+        """Mean daily return per ticker."""
+        return self.values.mean(axis=0)
+
+    def cov(self):
+        """Sample covariance of daily returns (tickers x tickers)."""
+        return self.covariance("sample").matrix()
+
+    def covariance(self, estimator="sample", **options):
+        """The CovarianceModel of these returns for an estimator, built once per matrix."""
+        key = (estimator, tuple(sorted(options.items())))
+        model = self._covariances.get(key)
+        if model is None:
+            model = self._covariances[key] = CovarianceModel.fit(self.values, estimator, **options)
+        return model
+
+    def carry_over(self, previous):
+        """Reuse the covariance models of an earlier matrix that this one slides forward.
+
+        When the tickers are the same and this matrix is the earlier one with
+        some of its oldest days dropped and new days appended, each model is
+        updated with just those days instead of being refit.
+        """
+        if previous.tickers != self.tickers or previous.policy != self.policy or not previous._covariances:
+            return
+        dropped = int(previous.dates.searchsorted(self.dates[0])) if len(self.dates) else len(previous.dates)
+        overlap = len(previous.dates) - dropped
+        if (overlap < 2 or overlap > len(self.dates) or not self.dates[:overlap].equals(previous.dates[dropped:])
+                or not np.array_equal(self.values[:overlap], previous.values[dropped:])):
+            return
+        if not dropped and overlap == len(self.dates):
+            self._covariances.update(previous._covariances)  # Same days: keep the cached decompositions too
+            return
+        for key, model in previous._covariances.items():
+            self._covariances[key] = model.copy().update(self.values[overlap:], previous.values[:dropped])
+
+    def to_frame(self):
+        """Return the matrix as a DataFrame (copies the buffer)."""
+        import pandas as pd
+
+        return pd.DataFrame(self.values, index=self.dates, columns=self.tickers)
@@ -0,0 +1,186 @@
+import numpy as np
+
+TRADING_DAYS = 252
+DEFAULT_WINDOWS = (30, 90, 252)
+
+
+def _window_metrics(n, s1, s2, d2, risk_free_daily, market=None):
+    """Annualized metrics from running sums over n daily returns.
+
+    s1/s2 are the sum and sum of squares of returns, d2 the sum of squared
+    shortfalls below the risk-free rate, market an optional (sum m, sum m^2,
+    sum r*m) tuple for beta.
+    """
+    if n < 2:
+        return None
+
+    mean = s1 / n
+    variance = max((s2 - s1 * s1 / n) / (n - 1), 0.0)
+    volatility = np.sqrt(variance * TRADING_DAYS)
+    downside = np.sqrt(d2 / n * TRADING_DAYS)
+    excess = (mean - risk_free_daily) * TRADING_DAYS
+
+    beta = None
+    if market is not None:
+        m1, m2, rm = market
+        market_variance = m2 - m1 * m1 / n
+        if market_variance > 0:
+            beta = (rm - s1 * m1 / n) / market_variance
+
+    return {
+        "observations": int(n),
+        "annual_return": float(mean * TRADING_DAYS),
+        "volatility": float(volatility),
+        "sharpe_ratio": float(excess / volatility) if volatility else 0.0,
+        "sortino_ratio": float(excess / downside) if downside else 0.0,
+        "beta": None if beta is None else float(beta),
+    }
+
+
+def _max_drawdown(returns):
+    """Largest peak-to-trough loss of cumulative wealth over the given returns."""
+    wealth = np.concatenate(([1.0], np.cumprod(1.0 + returns)))
+    return float(np.max(1.0 - wealth / np.maximum.accumulate(wealth)))
+
+
+def _historical_var(returns, confidence):
+    """One-day historical Value at Risk as a positive fraction of value."""
+    return float(-np.quantile(returns, 1.0 - confidence))
+
+
+class RollingRiskEngine:
+    """Rolling risk metrics over several windows of daily portfolio returns.
+
+    New daily returns are pushed with `update`, which adjusts running sums for
+    every window in O(1) per window: the new value is added and the value that
+    falls out of each window is subtracted. Drawdown and VaR, which need the
+    ordered window, are computed from one ring buffer when `metrics` is called.
+    `rolling_series` computes every metric for every day of a history in a
+    vectorized pass.
+    """
+
+    RESYNC_INTERVAL = 10_000  # Recompute sums from the buffer to bound floating point drift
+
+    def __init__(self, windows=DEFAULT_WINDOWS, risk_free_rate=0.03, confidence=0.95):
+        self.windows = tuple(sorted(windows))
+        self.risk_free_daily = risk_free_rate / TRADING_DAYS
+        self.confidence = confidence
+        self.capacity = self.windows[-1]
+        self.count = 0
+        self._returns = np.zeros(self.capacity)
+        self._market = np.zeros(self.capacity)
+        self._has_market = True
+        # Per window: [sum r, sum r^2, sum downside^2, sum m, sum m^2, sum r*m]
+        self._sums = {window: np.zeros(6) for window in self.windows}
+
+    def _terms(self, r, m):
+        shortfall = min(r - self.risk_free_daily, 0.0)
+        return np.array([r, r * r, shortfall * shortfall, m, m * m, r * m])
+
+    def update(self, portfolio_return, market_return=None):
+        """Push one daily return (and optionally the benchmark return of the same day)."""
+        if market_return is None:
+            self._has_market = False
+            market_return = 0.0
+
+        position = self.count % self.capacity
+        terms = self._terms(portfolio_return, market_return)
+        for window in self.windows:
+            if self.count >= window:
+                old = (self.count - window) % self.capacity
+                terms_out = self._terms(self._returns[old], self._market[old])
+                self._sums[window] += terms - terms_out
+            else:
+                self._sums[window] += terms
+
+        self._returns[position] = portfolio_return
+        self._market[position] = market_return
+        self.count += 1
+        if self.count % self.RESYNC_INTERVAL == 0:
+            self._resync()
+
+    def extend(self, portfolio_returns, market_returns=None):
+        """Push many daily returns in order."""
+        for i, r in enumerate(portfolio_returns):
+            self.update(float(r), None if market_returns is None else float(market_returns[i]))
+
+    def _window(self, buffer, window):
+        """The last `window` values of a ring buffer in chronological order."""
+        n = min(window, self.count)
+        indices = (self.count - n + np.arange(n)) % self.capacity
+        return buffer[indices]
+
+    def _resync(self):
+        for window in self.windows:
+            r = self._window(self._returns, window)
+            m = self._window(self._market, window)
+            shortfall = np.minimum(r - self.risk_free_daily, 0.0)
+            self._sums[window] = np.array([r.sum(), r @ r, shortfall @ shortfall, m.sum(), m @ m, r @ m])
+
+    def metrics(self):
+        """Current metrics per window: {window: dict or None if under two observations}."""
+        result = {}
+        for window in self.windows:
+            n = min(window, self.count)
+            s = self._sums[window]
+            metrics = _window_metrics(n, s[0], s[1], s[2], self.risk_free_daily,
+                                      market=tuple(s[3:]) if self._has_market else None)
+            if metrics is not None:
+                returns = self._window(self._returns, window)
+                metrics["max_drawdown"] = _max_drawdown(returns)
+                metrics["var"] = _historical_var(returns, self.confidence)
+            result[window] = metrics
+        return result
+
+    def rolling_series(self, portfolio_returns, market_returns=None, dates=None):
+        """Every metric for every window and day of a return history.
+
+        Returns {window: DataFrame} with one row per day on which the window
+        is full. Sums come from cumulative sums, drawdown and VaR from sliding
+        window views, so the whole history is processed without Python loops
+        over days.
+        """
+        import pandas as pd
+        from numpy.lib.stride_tricks import sliding_window_view
+
+        r = np.asarray(portfolio_returns, dtype=np.float64)
+        shortfall = np.minimum(r - self.risk_free_daily, 0.0)
+        columns = [r, r * r, shortfall * shortfall]
+        if market_returns is not None:
+            m = np.asarray(market_returns, dtype=np.float64)
+            columns += [m, m * m, r * m]
+        cumulative = np.vstack([np.zeros(len(columns)), np.cumsum(np.column_stack(columns), axis=0)])
+        index = pd.DatetimeIndex(dates) if dates is not None else pd.RangeIndex(len(r))
+
+        series = {}
+        for window in self.windows:
+            if len(r) < window:
+                continue
+            sums = cumulative[window:] - cumulative[:-window]
+            s1, s2, d2 = sums[:, 0], sums[:, 1], sums[:, 2]
+            n = window
+
+            mean = s1 / n
+            volatility = np.sqrt(np.maximum((s2 - s1 * s1 / n) / (n - 1), 0.0) * TRADING_DAYS)
+            downside = np.sqrt(d2 / n * TRADING_DAYS)
+            excess = (mean - self.risk_free_daily) * TRADING_DAYS
+            with np.errstate(divide="ignore", invalid="ignore"):
+                frame = {
+                    "annual_return": mean * TRADING_DAYS,
+                    "volatility": volatility,
+                    "sharpe_ratio": np.where(volatility > 0, excess / volatility, 0.0),
+                    "sortino_ratio": np.where(downside > 0, excess / downside, 0.0),
+                }
+                if market_returns is not None:
+                    m1, m2, rm = sums[:, 3], sums[:, 4], sums[:, 5]
+                    market_variance = m2 - m1 * m1 / n
+                    frame["beta"] = np.where(market_variance > 0, (rm - s1 * m1 / n) / market_variance, np.nan)
+
+            windows = sliding_window_view(r, window)
+            wealth = np.cumprod(1.0 + windows, axis=1)
+            peaks = np.maximum(np.maximum.accumulate(wealth, axis=1), 1.0)
+            frame["max_drawdown"] = np.max(1.0 - wealth / peaks, axis=1)
+            frame["var"] = -np.quantile(windows, 1.0 - self.confidence, axis=1)
+
+            series[window] = pd.DataFrame(frame, index=index[window - 1:])
+        return series
@@ -0,0 +1,295 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from services import metrics
+
+# Peak-to-trough windows replayed with each ticker's own closes
+HISTORICAL_SCENARIOS = {
+    "2008_financial_crisis": ("2008-09-12", "2009-03-09"),
+    "2018_q4_selloff": ("2018-09-20", "2018-12-24"),
+    "2020_covid_crash": ("2020-02-19", "2020-03-23"),
+    "2022_rate_hikes": ("2022-01-03", "2022-10-12"),
+}
+# Moves of the market (as a benchmark return, scaled by each ticker's beta) and of rates (in percentage points)
+STANDARD_SCENARIOS = {
+    "market_down_10": {"market": -0.10},
+    "market_down_20": {"market": -0.20},
+    "rates_up_100bp": {"rates": 1.0},
+    "rates_down_100bp": {"rates": -1.0},
+}
+SHOCK_KEYS = ("market", "rates", "sectors", "asset_classes", "tickers")
+
+
+def historical_windows(historical=None):
+    """{name: (start, end) ISO dates} for HISTORICAL_SCENARIOS names or "START:END" ranges (default all names)."""
+    windows = {}
+    for name in HISTORICAL_SCENARIOS if historical is None else historical:
+        window = HISTORICAL_SCENARIOS.get(name) or tuple(name.split(":"))
+        if len(window) != 2:
+            raise ValueError(f"Unknown historical scenario: {name} (use a name or START:END)")
+        windows[name] = window
+    return windows
+
+
+def sensitivities(returns, factor):
+    """Regression slope of every column of a (days x tickers) returns array on one factor series.
+
+    Days where the factor is missing (NaN) are left out.
+    """
+    kept = np.isfinite(factor)
+    returns, factor = returns[kept], factor[kept]
+    if len(factor) < 2:
+        return np.zeros(returns.shape[1])
+    factor = factor - factor.mean()
+    spread = factor @ factor
+    return (factor @ (returns - returns.mean(axis=0))) / spread if spread else np.zeros(returns.shape[1])
+
+
+def conditional_shocks(cov, shocks, known):
+    """Fill the unknown entries of a shock vector with their expectation given the known ones.
+
+    Under a joint normal model with covariance `cov`, the expected move of
+    the unknown assets is cov[u, k] @ inv(cov[k, k]) @ shocks[k].
+    """
+    shocks = np.array(shocks, dtype=np.float64)
+    unknown = ~known
+    if known.any() and unknown.any():
+        shocks[unknown] = cov[np.ix_(unknown, known)] @ np.linalg.lstsq(cov[np.ix_(known, known)], shocks[known],
+                                                                          rcond=None)[0]
+    elif unknown.any():
+        shocks[unknown] = 0.0
+    return shocks
+
+
+def _pnl(exposures, tickers, sectors, asset_classes):
+    """P&L of a block of scenarios: (total, per ticker, per sector, per asset class)."""
+    ticker_values, ticker_sector, ticker_class, class_sector = exposures
+    by_ticker = tickers * ticker_values
+    by_sector = tickers @ ticker_sector
+    by_class = tickers @ ticker_class
+    if sectors is not None:
+        by_ticker += sectors @ ticker_sector.T
+        by_sector += sectors * ticker_sector.sum(axis=0)
+        by_class += sectors @ class_sector.T
+    if asset_classes is not None:
+        by_ticker += asset_classes @ ticker_class.T
+        by_sector += asset_classes @ class_sector
+        by_class += asset_classes * ticker_class.sum(axis=0)
+    return by_ticker.sum(axis=1), by_ticker, by_sector, by_class
+
+
+def _evaluate_chunk(task):
+    """P&L of one block of given scenarios; module level so it can run in a worker process."""
+    exposures, tickers, sectors, asset_classes = task
+    return _pnl(exposures, tickers, sectors, asset_classes)
+
+
+def _simulate_chunk(task):
+    """Draw one block of scenarios and keep its `tail` worst, with their breakdowns."""
+    exposures, seed, size, mean, loadings, specific, positions, scale, tail = task
+    rng = np.random.default_rng(seed)
+    draws = mean + scale * (rng.standard_normal((size, loadings.shape[1])) @ loadings.T)
+    if specific is not None:
+        draws += scale * specific * rng.standard_normal((size, len(mean)))
+    tickers = np.zeros((size, len(exposures[0])))
+    tickers[:, positions] = draws
+
+    total, by_ticker, by_sector, by_class = _pnl(exposures, tickers, None, None)
+    worst = np.argsort(total, kind="stable")[:tail]
+    return total, total[worst], by_ticker[worst], by_sector[worst], by_class[worst]
+
+
+class ScenarioEngine:
+    """Profit and loss of the current holdings under many shock scenarios at once.
+
+    A scenario gives a return per ticker and, optionally, per sector and per
+    asset class; the shock to a lot is the sum of its ticker's, its sector's
+    and its asset class's. Lot values are summed once into ticker x sector
+    and ticker x asset class matrices, so the P&L of a block of scenarios and
+    its breakdowns are a few matrix products however many lots there are.
+    Scenarios are evaluated in blocks of `chunk_size`, in worker processes
+    when `workers` > 1.
+    """
+
+    def __init__(self, holdings, workers=1, chunk_size=2_000):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.tickers = holdings.tickers()
+        self.index = {ticker: i for i, ticker in enumerate(self.tickers)}
+
+        table = holdings.tables["ticker"]
+        code_index = np.zeros(len(table), dtype=np.int64)
+        for i, ticker in enumerate(self.tickers):
+            code_index[table.codes[ticker]] = i
+        rows = code_index[holdings.column("ticker")]
+        values = holdings.values()
+        sectors, asset_classes = holdings.column("sector"), holdings.column("asset_class")
+        self.labels = {group: holdings.tables[group].labels for group in ("sector", "asset_class")}
+        # Codes of labels that no longer have lots stay out of the reports
+        self.present = {group: np.bincount(holdings.column(group), minlength=len(self.labels[group])) > 0
+                        for group in self.labels}
+
+        ticker_sector = np.zeros((len(self.tickers), len(self.labels["sector"])))
+        ticker_class = np.zeros((len(self.tickers), len(self.labels["asset_class"])))
+        class_sector = np.zeros((len(self.labels["asset_class"]), len(self.labels["sector"])))
+        np.add.at(ticker_sector, (rows, sectors), values)
+        np.add.at(ticker_class, (rows, asset_classes), values)
+        np.add.at(class_sector, (asset_classes, sectors), values)
+        self.exposures = (ticker_sector.sum(axis=1), ticker_sector, ticker_class, class_sector)
+        self.value = float(values.sum())
+
+    # ------------------------------------------------------------ scenarios
+
+    def shocks(self, specs, market_betas=None, rate_betas=None):
+        """Stack scenario specs into (tickers, sectors, asset classes) shock matrices.
+
+        A spec is a dict with any of "market" (a benchmark return, applied
+        times each ticker's beta), "rates" (a yield change in percentage
+        points, applied times each ticker's rate sensitivity), and
+        "sectors", "asset_classes" and "tickers" mapping labels to returns.
+        All the moves add up. Labels match case-insensitively; labels that
+        are not held are ignored.
+        """
+        tickers = np.zeros((len(specs), len(self.tickers)))
+        groups = {group: np.zeros((len(specs), len(labels))) for group, labels in self.labels.items()}
+        lookups = {group: {str(label).lower(): code for code, label in enumerate(labels)}
+                   for group, labels in self.labels.items()}
+        ticker_lookup = {ticker.upper(): i for i, ticker in enumerate(self.tickers)}
+
+        for k, spec in enumerate(specs):
+            unknown = set(spec) - set(SHOCK_KEYS) - {"name"}
+            if unknown:
+                raise ValueError(f"Unknown scenario keys: {', '.join(sorted(unknown))}")
+            for key, betas in (("market", market_betas), ("rates", rate_betas)):
+                if spec.get(key):
+                    if betas is None:
+                        raise ValueError(f"No {key} sensitivities available for a {key} shock.")
+                    tickers[k] += spec[key] * betas
+            for ticker, shock in spec.get("tickers", {}).items():
+                if ticker.upper() in ticker_lookup:
+                    tickers[k, ticker_lookup[ticker.upper()]] += shock
+            for group, key in (("sector", "sectors"), ("asset_class", "asset_classes")):
+                for label, shock in spec.get(key, {}).items():
+                    code = lookups[group].get(str(label).lower())
+                    if code is not None:
+                        groups[group][k, code] += shock
+        return tickers, groups["sector"], groups["asset_class"]
+
+    def historical_shocks(self, price_data, windows, cov=None, cov_tickers=()):
+        """Replay (start, end) date windows: each ticker's return from the last close before start to end.
+
+        The closes are aligned once into one matrix, so every window is two
+        row lookups. Tickers without closes before a window are given their
+        expected move conditional on the others under `cov` (ordered like
+        `cov_tickers`), or 0 without one. Returns (windows x tickers shocks,
+        [tickers filled in, per window]).
+        """
+        import pandas as pd
+
+        from models.valuation import aligned_price_matrix
+
+        prices, dates, tickers = aligned_price_matrix(price_data)
+        columns = np.array([self.index[ticker] for ticker in tickers], dtype=np.int64)
+        positions = np.array([self.index[ticker] for ticker in cov_tickers], dtype=np.int64)
+        shocks = np.zeros((len(windows), len(self.tickers)))
+        filled = []
+        for k, (start, end) in enumerate(windows):
+            before = dates.searchsorted(pd.Timestamp(start)) - 1
+            until = dates.searchsorted(pd.Timestamp(end), side="right") - 1
+            known = np.zeros(len(self.tickers), dtype=bool)
+            if before >= 0 and until > before:
+                # Zeros are days before a ticker's first close
+                traded = (prices[before] > 0) & (prices[until] > 0)
+                shocks[k, columns[traded]] = prices[until, traded] / prices[before, traded] - 1.0
+                known[columns[traded]] = True
+
+            missing = ~known
+            if missing.any() and cov is not None and len(positions):
+                conditional = conditional_shocks(cov, shocks[k, positions], known[positions])
+                covered = missing[positions]
+                shocks[k, positions[covered]] = conditional[covered]
+            filled.append([self.tickers[i] for i in np.flatnonzero(missing)])
+        return shocks, filled
+
+    # ------------------------------------------------------------ evaluation
+
+    def evaluate(self, tickers, sectors=None, asset_classes=None):
+        """P&L of every scenario (rows of the shock matrices): (total, per ticker, per sector, per asset class)."""
+        bounds = range(0, len(tickers), self.chunk_size)
+        tasks = [(self.exposures, tickers[i:i + self.chunk_size],
+                  None if sectors is None else sectors[i:i + self.chunk_size],
+                  None if asset_classes is None else asset_classes[i:i + self.chunk_size]) for i in bounds]
+        with metrics.timer("scenarios.evaluate"):
+            results = self._map(_evaluate_chunk, tasks)
+        metrics.count("scenarios.evaluated", len(tickers))
+        if not results:
+            return np.empty(0), np.empty((0, len(self.tickers))), None, None
+        return tuple(np.concatenate(parts) for parts in zip(*results))
+
+    def simulate(self, mean, loadings, specific=None, tickers=None, num_scenarios=10_000, days=21, stress=1.0,
+                 confidence=0.95, seed=None):
+        """Random horizon shocks from a covariance root, summarized by VaR, expected shortfall and its sources.
+
+        Each scenario's return over `days` is drawn as days x `mean` plus
+        sqrt(days) x `stress` times a draw with covariance loadings @
+        loadings' + diag(specific^2) (see CovarianceModel.root), for the
+        `tickers` the model covers. Blocks get child seeds of `seed`, so
+        results do not depend on the number of workers. Only each block's
+        worst scenarios are sent back, which is all the tail needs.
+        """
+        mean = np.asarray(mean, dtype=np.float64) * days
+        positions = np.array([self.index[ticker] for ticker in (tickers or self.tickers)], dtype=np.int64)
+        tail = max(1, int(np.ceil(num_scenarios * (1 - confidence))))
+        sizes = [min(self.chunk_size, num_scenarios - i) for i in range(0, num_scenarios, self.chunk_size)]
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        scale = stress * np.sqrt(days)
+        tasks = [(self.exposures, child, size, mean, loadings, specific, positions, scale, tail)
+                 for child, size in zip(seeds, sizes)]
+
+        with metrics.timer("scenarios.simulate"):
+            results = self._map(_simulate_chunk, tasks)
+        metrics.count("scenarios.simulated", num_scenarios)
+
+        totals, worst_totals, by_ticker, by_sector, by_class = (np.concatenate(parts) for parts in zip(*results))
+        # The overall tail is the worst `tail` of the blocks' own worst scenarios
+        order = np.argsort(worst_totals, kind="stable")[:tail]
+        by_ticker, by_sector, by_class = by_ticker[order], by_sector[order], by_class[order]
+        return {
+            "num_scenarios": num_scenarios,
+            "days": days,
+            "stress": stress,
+            "confidence": confidence,
+            "mean": float(totals.mean()),
+            "worst": float(totals.min()),
+            "var": -float(np.percentile(totals, (1 - confidence) * 100)),
+            "expected_shortfall": -float(worst_totals[order].mean()),
+            # Average P&L of each ticker and group over the tail scenarios; they sum to -expected_shortfall
+            "tail": self._labelled(by_ticker.mean(axis=0), by_sector.mean(axis=0), by_class.mean(axis=0)),
+        }
+
+    def _map(self, function, tasks):
+        if self.workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                return list(executor.map(function, tasks))
+        return [function(task) for task in tasks]
+
+    def _labelled(self, by_ticker, by_sector, by_class):
+        def named(group, values):
+            labels = self.labels[group]
+            return {labels[code]: float(values[code]) for code in np.flatnonzero(self.present[group])}
+
+        return {
+            "assets": {ticker: float(value) for ticker, value in zip(self.tickers, by_ticker)},
+            "sectors": named("sector", by_sector),
+            "asset_classes": named("asset_class", by_class),
+        }
+
+    def report(self, names, results):
+        """{name: P&L, return and breakdowns} for evaluated scenarios."""
+        total, by_ticker, by_sector, by_class = results
+        report = {}
+        for k, name in enumerate(names):
+            report[name] = {"pnl": float(total[k]), "return": float(total[k] / self.value) if self.value else 0.0}
+            report[name].update(self._labelled(by_ticker[k], by_sector[k], by_class[k]))
+        return report
@@ -0,0 +1,38 @@
+import numpy as np
+
+
+def aligned_price_matrix(price_data):
+    """Align {ticker: close Series} on one calendar and forward fill gaps.
+
+    Returns (prices, dates, tickers) where prices is a float64 (days x tickers)
+    array. A ticker's holiday or missing days carry its last close forward;
+    days before its first close are 0 so the position adds no value yet.
+    """
+    import pandas as pd
+
+    series = {ticker: prices for ticker, prices in price_data.items() if prices is not None and not prices.empty}
+    if not series:
+        return np.empty((0, 0)), pd.DatetimeIndex([]), []
+
+    frame = pd.concat(series, axis=1, sort=True).ffill()
+    prices = np.ascontiguousarray(frame.to_numpy(dtype=np.float64))
+    np.nan_to_num(prices, copy=False, nan=0.0)
+    return prices, frame.index, list(frame.columns)
+
+
+def ticker_quantities(holdings, tickers):
+    """Total quantity held per ticker (summed over lots), in the order given."""
+    table = holdings.tables["ticker"]
+    totals = np.bincount(holdings.column("ticker"), weights=holdings.column("quantity"), minlength=len(table))
+    return np.array([totals[table.codes[ticker]] if ticker in table.codes else 0.0 for ticker in tickers])
+
+
+def portfolio_value_series(price_data, holdings):
+    """Daily value of the current holdings: the aligned price matrix times quantities."""
+    import pandas as pd
+
+    prices, dates, tickers = aligned_price_matrix(price_data)
+    if not tickers:
+        return pd.Series(dtype="float64", name="Portfolio Value")
+    values = prices @ ticker_quantities(holdings, tickers)
+    return pd.Series(values, index=dates, name="Portfolio Value")
@@ -0,0 +1,238 @@
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from services import metrics
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average, in bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._turn = threading.Condition()
+        self._next_ticket = 0  # Callers take tokens in ticket order
+        self._serving = 0
+
+    def acquire(self, tokens=1.0, on_wait=None):
+        """Block until `tokens` are available and take them; returns the seconds waited.
+
+        Callers are served first come, first served, so a stream of newer
+        requests cannot starve an older one. `on_wait` is called once, before
+        waiting, when the tokens are not available right away.
+        """
+        waiting_since = None
+        with self._turn:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            while True:
+                delay = None  # Until an earlier caller is served
+                if ticket == self._serving:
+                    now = time.monotonic()
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= tokens:
+                        self._tokens -= tokens
+                        self._serving += 1
+                        self._turn.notify_all()
+                        return 0.0 if waiting_since is None else now - waiting_since
+                    delay = (tokens - self._tokens) / self.rate
+                if waiting_since is None:
+                    waiting_since = time.monotonic()
+                    if on_wait is not None:
+                        on_wait()
+                self._turn.wait(delay)
+
+
+def _copy(result):
+    """Give each caller its own copy of a shared Series or dict."""
+    return result.copy() if hasattr(result, "copy") else result
+
+
+class FetchScheduler:
+    """The single gateway between the app and the market data provider.
+
+    - Coalescing: identical requests (same kind, ticker and range) in flight
+      at the same time share one provider call, and a result is reused for
+      `ttl` seconds, so one user action never asks the provider twice.
+    - Rate limiting: every provider call takes a token from a token bucket.
+      The limit comes from the provider's `rate_limit` attribute
+      ((requests per second, burst)); providers without one, such as the
+      synthetic market, are not throttled.
+    - Batching: history for many tickers over one range is fetched with one
+      `provider.download` call per `batch_size` symbols when the provider
+      supports it.
+    """
+
+    def __init__(self, provider, rate_limit=None, ttl=30.0, batch_size=100):
+        self.provider = provider
+        rate_limit = rate_limit if rate_limit is not None else getattr(provider, "rate_limit", None)
+        self.bucket = TokenBucket(*rate_limit) if rate_limit else None
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self.provider_calls = 0
+        self._lock = threading.Lock()
+        self._inflight = {}  # request key -> Future of the call serving it
+        self._recent = {}  # request key -> (expiry, result)
+        self._local = threading.local()  # Per-thread throttle callbacks
+
+    # ------------------------------------------------------------ plumbing
+
+    def _call(self, name, function, *args, **kwargs):
+        """One rate-limited provider call, timed as fetch.<name>."""
+        if self.bucket is not None:
+            pause, resume = getattr(self._local, "throttle", (None, None))
+            waited = self.bucket.acquire(on_wait=pause)
+            if waited:
+                metrics.count("fetch.throttled_seconds", waited)
+                if resume is not None:
+                    resume()
+        with self._lock:
+            self.provider_calls += 1
+        with metrics.timer(f"fetch.{name}"):
+            return function(*args, **kwargs)
+
+    def _claim(self, key):
+        """("recent", result), ("wait", future) or ("own", future) for a request key."""
+        with self._lock:
+            recent = self._recent.get(key)
+            if recent is not None and recent[0] > time.monotonic():
+                metrics.count("fetch.reused")
+                return "recent", recent[1]
+            future = self._inflight.get(key)
+            if future is not None:
+                metrics.count("fetch.coalesced")
+                return "wait", future
+            future = self._inflight[key] = Future()
+            return "own", future
+
+    def _settle(self, key, future, result=None, error=None):
+        """Publish the result (or error) of an owned request to everyone waiting on it."""
+        with self._lock:
+            del self._inflight[key]
+            if error is None and self.ttl:
+                now = time.monotonic()
+                if len(self._recent) > 4096:
+                    self._recent = {k: v for k, v in self._recent.items() if v[0] > now}
+                self._recent[key] = (now + self.ttl, result)
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    def _coalesced(self, key, compute):
+        state, value = self._claim(key)
+        if state == "recent":
+            return _copy(value)
+        if state == "wait":
+            return _copy(value.result())
+        try:
+            result = compute()
+        except Exception as e:
+            self._settle(key, value, error=e)
+            raise
+        self._settle(key, value, result)
+        return _copy(result)
+
+    @contextmanager
+    def throttled(self, pause, resume):
+        """Report rate-limit waits of this thread's calls made within the block.
+
+        `pause()` is called when a call has to wait for a token and `resume()`
+        once it has one, so a caller can leave the wait out of its timeouts.
+        """
+        previous = getattr(self._local, "throttle", None)
+        self._local.throttle = (pause, resume)
+        try:
+            yield
+        finally:
+            if previous is None:
+                del self._local.throttle
+            else:
+                self._local.throttle = previous
+
+    def clear(self):
+        """Forget recently fetched results."""
+        with self._lock:
+            self._recent.clear()
+
+    # ------------------------------------------------------------- requests
+
+    def info(self, ticker):
+        """Full info dict for a ticker."""
+        return self._coalesced(("info", ticker), lambda: self._call("info", self.provider.info, ticker))
+
+    def history(self, ticker, start=None, end=None, period=None, interval="1d", actions=False):
+        """Closing prices of one ticker, for a start/end range or a period string.
+
+        With `actions` the provider returns a frame with dividends and splits
+        next to the closes.
+        """
+        key = ("history", ticker, str(start), str(end), period, interval, actions)
+
+        def compute():
+            options = {"actions": True} if actions else {}
+            history = self._call("history", self.provider.history, ticker, start=start, end=end,
+                                 period=period, interval=interval, **options)
+            if history is not None:
+                usage = history.memory_usage(index=True)
+                metrics.count("fetch.history.rows", len(history))
+                metrics.count("fetch.history.bytes", int(usage.sum() if hasattr(usage, "sum") else usage))
+            return history
+
+        return self._coalesced(key, compute)
+
+    def history_many(self, tickers, start=None, end=None, actions=False):
+        """Daily closes of many tickers over one range: {ticker: Series (frame with `actions`) or None on failure}.
+
+        Tickers already being fetched by another caller are waited for; the
+        rest go out in `download` batches (or one history call each when the
+        provider cannot batch).
+        """
+        results, waiting, owned = {}, {}, {}
+        for ticker in dict.fromkeys(tickers):
+            key = ("history", ticker, str(start), str(end), None, "1d", actions)
+            state, value = self._claim(key)
+            if state == "recent":
+                results[ticker] = _copy(value)
+            elif state == "wait":
+                waiting[ticker] = value
+            else:
+                owned[ticker] = (key, value)
+
+        download = getattr(self.provider, "download", None)
+        options = {"actions": True} if actions else {}
+        pending = list(owned)
+        for i in range(0, len(pending), self.batch_size if download else 1):
+            batch = pending[i:i + self.batch_size] if download else pending[i:i + 1]
+            try:
+                if download is not None:
+                    histories = self._call("download", download, batch, start=start, end=end, **options)
+                    metrics.count("fetch.download.tickers", len(batch))
+                else:
+                    histories = {batch[0]: self._call("history", self.provider.history, batch[0],
+                                                      start=start, end=end, **options)}
+            except Exception as e:
+                print(f"Error fetching historical prices for {', '.join(batch)}: {e}")
+                histories = {}
+            for ticker in batch:
+                history = histories.get(ticker)
+                key, future = owned[ticker]
+                if history is None:
+                    self._settle(key, future, error=LookupError(f"No history returned for {ticker}"))
+                    results[ticker] = None
+                else:
+                    metrics.count("fetch.history.rows", len(history))
+                    self._settle(key, future, history)
+                    results[ticker] = _copy(history)
+
+        for ticker, future in waiting.items():
+            try:
+                results[ticker] = _copy(future.result())
+            except Exception:
+                results[ticker] = None
+        return {ticker: results[ticker] for ticker in dict.fromkeys(tickers)}
@@ -0,0 +1,132 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from services import metrics
+
+DEFAULT_METADATA_PATH = os.path.join("data", "ticker_metadata.sqlite")
+DEFAULT_TTL = 7 * 24 * 3600  # Sector and quote type rarely change
+INFO_FIELDS = ("sector", "quoteType", "longName", "currency", "exchange", "marketState", "preMarketPrice")
+
+
+class MetadataCache:
+    """Two-tier TTL cache of ticker info: an in-memory LRU in front of SQLite.
+
+    Only the fields in INFO_FIELDS are kept. Callers choose how fresh an entry
+    must be with `max_age`, so static fields like sector can be served for days
+    while market state is refetched after a minute.
+    """
+
+    def __init__(self, path=DEFAULT_METADATA_PATH, fetcher=None, ttl=DEFAULT_TTL, max_entries=2048,
+                 max_workers=8):
+        self.fetcher = fetcher
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_workers = max_workers
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.RLock()
+
+        directory = os.path.dirname(path)
+        if directory and path != ":memory:":
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS info (ticker TEXT PRIMARY KEY, fetched_at REAL NOT NULL, data TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _remember(self, ticker, fetched_at, data):
+        with self._lock:
+            self._memory[ticker] = (fetched_at, data)
+            self._memory.move_to_end(ticker)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _lookup(self, ticker, max_age):
+        """Return cached info no older than max_age from memory, then disk, else None."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(ticker)
+            if entry is not None:
+                self._memory.move_to_end(ticker)
+            else:
+                row = self._conn.execute("SELECT fetched_at, data FROM info WHERE ticker = ?", (ticker,)).fetchone()
+                if row is not None:
+                    entry = (row[0], json.loads(row[1]))
+                    self._remember(ticker, *entry)
+
+        if entry is not None and now - entry[0] <= max_age:
+            return entry[1]
+        return None
+
+    def put(self, ticker, info):
+        """Store the relevant fields of a ticker's info in both tiers."""
+        data = {field: info.get(field) for field in INFO_FIELDS if info.get(field) is not None}
+        fetched_at = time.time()
+        self._remember(ticker, fetched_at, data)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO info (ticker, fetched_at, data) VALUES (?, ?, ?)",
+                               (ticker, fetched_at, json.dumps(data)))
+            self._conn.commit()
+        return data
+
+    def get(self, ticker, max_age=None):
+        """Return info for a ticker, fetching it only if missing or older than max_age seconds."""
+        max_age = self.ttl if max_age is None else max_age
+        data = self._lookup(ticker, max_age)
+        if data is not None:
+            self.hits += 1
+            metrics.count("metadata_cache.hits")
+            return data
+
+        self.misses += 1
+        metrics.count("metadata_cache.misses")
+        if self.fetcher is None:
+            return {}
+        try:
+            info = self.fetcher(ticker)
+        except Exception as e:
+            print(f" Error fetching info for {ticker}: {e}")
+            info = None
+        if not info:
+            return {}
+        return self.put(ticker, info)
+
+    def prefetch(self, tickers, max_age=None):
+        """Load info for many tickers, fetching only stale or missing ones concurrently."""
+        max_age = self.ttl if max_age is None else max_age
+        unique = list(dict.fromkeys(tickers))
+        result = {}
+        missing = []
+        for ticker in unique:
+            data = self._lookup(ticker, max_age)
+            if data is None:
+                missing.append(ticker)
+            else:
+                self.hits += 1
+                metrics.count("metadata_cache.hits")
+                result[ticker] = data
+
+        if missing:
+            workers = max(1, min(self.max_workers, len(missing)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for ticker, data in zip(missing, executor.map(lambda t: self.get(t, max_age), missing)):
+                    result[ticker] = data
+        return result
+
+    def invalidate(self, ticker=None):
+        """Forget one ticker, or everything when no ticker is given."""
+        with self._lock:
+            if ticker is None:
+                self._memory.clear()
+                self._conn.execute("DELETE FROM info")
+            else:
+                self._memory.pop(ticker, None)
+                self._conn.execute("DELETE FROM info WHERE ticker = ?", (ticker,))
+            self._conn.commit()
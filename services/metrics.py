@@ -0,0 +1,139 @@
+"""Lightweight counters and timers for the hot paths.
+
+Collection is off unless PORTFOLIO_METRICS is set (to 1 or to a JSON output
+path) or `enable()` is called, e.g. by the CLI's --metrics flag. While off,
+`count` returns immediately and `timer` is a shared no-op context manager,
+so the hooks can stay in place in production code.
+
+Names are dotted, e.g. "fetch.history" for a timer and "fetch.history.rows"
+for a counter. A counter named "<timer>.<unit>" is also reported as
+"<unit>_per_second" of that timer's total time.
+"""
+import contextlib
+import datetime
+import json
+import os
+import threading
+import time
+
+_enabled = os.environ.get("PORTFOLIO_METRICS", "") not in ("", "0")
+_lock = threading.Lock()
+_counters = {}
+_timers = {}  # name -> [calls, total seconds, max seconds]
+_started = time.perf_counter()
+_NULL_TIMER = contextlib.nullcontext()
+
+
+def enable(flag=True):
+    """Turn collection on or off (collected values are kept)."""
+    global _enabled
+    _enabled = flag
+
+
+def enabled():
+    return _enabled
+
+
+def env_path(default=os.path.join("data", "metrics.json")):
+    """Output path requested through PORTFOLIO_METRICS, or None if it is unset."""
+    value = os.environ.get("PORTFOLIO_METRICS", "")
+    if value in ("", "0"):
+        return None
+    return default if value == "1" else value
+
+
+def reset():
+    """Forget all collected values and restart the run clock."""
+    global _started
+    with _lock:
+        _counters.clear()
+        _timers.clear()
+        _started = time.perf_counter()
+
+
+def count(name, value=1):
+    """Add to a counter."""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        with _lock:
+            stats = _timers.setdefault(self.name, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+        return False
+
+
+def timer(name):
+    """Context manager timing one call of a named operation."""
+    return _Timer(name) if _enabled else _NULL_TIMER
+
+
+def state():
+    """Raw collected values, picklable, for `merge` in another process."""
+    with _lock:
+        return {"counters": dict(_counters), "timers": {name: list(stats) for name, stats in _timers.items()}}
+
+
+def merge(other):
+    """Add values collected elsewhere (e.g. a worker process's `state()`)."""
+    with _lock:
+        for name, value in other["counters"].items():
+            _counters[name] = _counters.get(name, 0) + value
+        for name, (calls, total, longest) in other["timers"].items():
+            stats = _timers.setdefault(name, [0, 0.0, 0.0])
+            stats[0] += calls
+            stats[1] += total
+            stats[2] = max(stats[2], longest)
+
+
+def snapshot():
+    """Collected values as a JSON-friendly dict."""
+    raw = state()
+    counters, timers = raw["counters"], raw["timers"]
+    result = {
+        "wall_seconds": time.perf_counter() - _started,
+        "counters": dict(sorted(counters.items())),
+        "timers": {name: {"calls": calls, "total_seconds": total, "mean_seconds": total / calls,
+                          "max_seconds": longest}
+                   for name, (calls, total, longest) in sorted(timers.items())},
+        "throughput": {},
+    }
+    for name, value in counters.items():
+        timer_name, _, unit = name.rpartition(".")
+        if timer_name in timers and timers[timer_name][1] > 0:
+            result["throughput"][f"{timer_name}.{unit}_per_second"] = value / timers[timer_name][1]
+    return result
+
+
+def write_json(path, **context):
+    """Write the snapshot plus run context (command, arguments, ...) to a JSON file or "-" for stderr."""
+    report = {"recorded_at": datetime.datetime.now().isoformat(timespec="seconds"), **context, **snapshot()}
+    if path == "-":
+        import sys
+
+        json.dump(report, sys.stderr, indent=2, default=str)
+        sys.stderr.write("\n")
+        return path
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    return path
@@ -0,0 +1,152 @@
+import csv
+import datetime
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from models.asset import Asset
+from models.holdings import Holdings, NUMERIC_COLUMNS, CODED_COLUMNS
+from models.ledger import Ledger, LEDGER_COLUMNS
+from models.portfolio import Portfolio
+
+FORMAT_VERSION = 3  # 2 added the transaction ledger, 3 its lot column and adjustments
+DEFAULT_PORTFOLIO_PATH = os.path.join("data", "portfolio.npz")
+SNAPSHOT_DIR = os.path.join("data", "snapshots")
+CSV_FIELDS = ["ticker", "sector", "asset_class", "quantity", "purchase_price", "current_price"]
+
+
+def _atomic_write(path, write, mode="wb"):
+    """Write through a temporary file in the target directory and rename it into place."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.splitext(path)[1])
+    try:
+        with os.fdopen(fd, mode, **({} if "b" in mode else {"newline": ""})) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def save_portfolio(portfolio, path=DEFAULT_PORTFOLIO_PATH):
+    """Save holdings, sector/class metadata, last prices and the transaction ledger as a compressed NumPy archive."""
+    holdings = portfolio.holdings
+    arrays = {name: holdings.column(name) for name in NUMERIC_COLUMNS + CODED_COLUMNS}
+    for name in CODED_COLUMNS:
+        arrays[f"{name}_labels"] = np.array(holdings.tables[name].labels, dtype=str)
+
+    ledger = portfolio.ledger
+    for name in LEDGER_COLUMNS:
+        arrays[f"ledger_{name}"] = ledger.column(name)
+    arrays["ledger_ticker_labels"] = np.array(ledger.tickers.labels, dtype=str)
+
+    arrays["meta"] = np.array(json.dumps({
+        "format_version": FORMAT_VERSION,
+        "saved_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "lots": len(holdings),
+        "transactions": len(ledger),
+        "cost_method": ledger.method,
+    }))
+
+    _atomic_write(path, lambda f: np.savez_compressed(f, **arrays))
+    return path
+
+
+def load_portfolio(path=DEFAULT_PORTFOLIO_PATH):
+    """Load a portfolio saved with save_portfolio; no network calls are made."""
+    with np.load(path, allow_pickle=False) as archive:
+        meta = json.loads(str(archive["meta"]))
+        if meta.get("format_version", 0) > FORMAT_VERSION:
+            raise ValueError(f"{path} was written by a newer version (format {meta['format_version']}).")
+        columns = {name: archive[name] for name in NUMERIC_COLUMNS + CODED_COLUMNS}
+        tables = {name: archive[f"{name}_labels"].tolist() for name in CODED_COLUMNS}
+        ledger = None
+        if "ledger_kind" in archive:
+            ledger = Ledger.from_columns({name: archive[f"ledger_{name}"] for name in LEDGER_COLUMNS
+                                          if f"ledger_{name}" in archive},
+                                         archive["ledger_ticker_labels"].tolist(),
+                                         method=meta.get("cost_method", "fifo"))
+
+    # Files from before the ledger existed get one opening buy per lot
+    return Portfolio(Holdings.from_columns(columns, tables), ledger)
+
+
+# ---------------------------------------------------------------- snapshots
+
+def save_snapshot(portfolio, directory=SNAPSHOT_DIR, keep=20):
+    """Write a timestamped snapshot and prune all but the newest `keep` snapshots."""
+    timestamp = datetime.datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    path = save_portfolio(portfolio, os.path.join(directory, f"portfolio-{timestamp}.npz"))
+
+    snapshots = list_snapshots(directory)
+    for old in snapshots[:-keep] if keep else []:
+        os.remove(old)
+    return path
+
+
+def list_snapshots(directory=SNAPSHOT_DIR):
+    """Snapshot paths from oldest to newest."""
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(name for name in os.listdir(directory) if name.startswith("portfolio-") and name.endswith(".npz"))
+    return [os.path.join(directory, name) for name in names]
+
+
+def restore_snapshot(path, target=DEFAULT_PORTFOLIO_PATH):
+    """Load a snapshot and make it the current portfolio file."""
+    portfolio = load_portfolio(path)
+    save_portfolio(portfolio, target)
+    return portfolio
+
+
+# ------------------------------------------------------------- CSV / JSON
+
+def _rows(portfolio):
+    for asset in portfolio.assets:
+        yield {field: getattr(asset, field) for field in CSV_FIELDS}
+
+
+def _from_rows(rows):
+    holdings = Holdings()
+    for row in rows:
+        asset = Asset(row["ticker"], row["sector"], row["asset_class"],
+                      float(row["quantity"]), float(row["purchase_price"]))
+        if row.get("current_price") not in (None, ""):
+            asset.update_price(float(row["current_price"]))
+        holdings.add(asset)
+    return Portfolio(holdings)
+
+
+def export_csv(portfolio, path):
+    """Write one row per lot to a CSV file."""
+    def write(f):
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(_rows(portfolio))
+
+    _atomic_write(path, write, mode="w")
+    return path
+
+
+def import_csv(path):
+    """Read a portfolio from a CSV file with the export_csv columns."""
+    with open(path, newline="") as f:
+        return _from_rows(csv.DictReader(f))
+
+
+def export_json(portfolio, path):
+    """Write the lots to a JSON list of objects."""
+    _atomic_write(path, lambda f: json.dump(list(_rows(portfolio)), f, indent=2), mode="w")
+    return path
+
+
+def import_json(path):
+    """Read a portfolio from a JSON list of lot objects."""
+    with open(path) as f:
+        return _from_rows(json.load(f))
@@ -1,21 +1,138 @@
-import yfinance as yf
-import pandas as pd
-import datetime
+from services.fetch_scheduler import FetchScheduler
+from services.price_store import PriceStore, DEFAULT_DB_PATH, DEFAULT_JSON_PATH
+from services.metadata_cache import MetadataCache, DEFAULT_METADATA_PATH
+
+QUOTE_INFO_TTL = 60  # Market state and pre-market price go stale quickly
+ACTION_COLUMNS = ["Close", "Dividends", "Stock Splits"]
+
+_price_store = None
+_metadata_cache = None
+
+
+class YahooProvider:
+    """Market data provider backed by Yahoo Finance.
+
+    yfinance is imported on first use so that starting the app (or running a
+    command that only reads saved data) does not pay for importing it.
+    """
+
+    rate_limit = (2.0, 5)  # Requests per second and burst; Yahoo throttles bursts of anonymous calls
+
+    def info(self, ticker):
+        """Full info dict for a ticker."""
+        import yfinance as yf
+
+        return yf.Ticker(ticker).info
+
+    def history(self, ticker, start=None, end=None, period=None, interval="1d", actions=False):
+        """Closing prices as a Series with a timezone-naive DatetimeIndex.
+
+        By default closes are adjusted for splits and dividends. With
+        `actions` a frame of split-adjusted "Close", "Dividends" and
+        "Stock Splits" (ratio, 0 on days without one) is returned instead.
+        """
+        import yfinance as yf
+
+        stock = yf.Ticker(ticker)
+        options = {"interval": interval, "auto_adjust": not actions, "actions": actions}
+        if period is not None:
+            history = stock.history(period=period, **options)
+        else:
+            history = stock.history(start=start, end=end, **options)
+        history.index = history.index.tz_localize(None)
+        if actions:
+            return history.reindex(columns=ACTION_COLUMNS, fill_value=0.0)
+        return history["Close"]
+
+    def download(self, tickers, start=None, end=None, interval="1d", actions=False):
+        """Closing prices of many tickers with one yf.download call: {ticker: Series, or frame with `actions`}."""
+        import pandas as pd
+        import yfinance as yf
+
+        tickers = list(tickers)
+        data = yf.download(tickers, start=start, end=end, interval=interval, auto_adjust=not actions,
+                           actions=actions, group_by="column", progress=False)
+        if data is None or data.empty:
+            return {}
+        columns = {}
+        for name in ACTION_COLUMNS if actions else ("Close",):
+            column = data[name] if name in data else pd.DataFrame(0.0, index=data.index, columns=tickers)
+            if getattr(column, "ndim", 1) == 1:
+                column = column.to_frame(tickers[0])
+            if column.index.tz is not None:
+                column.index = column.index.tz_localize(None)
+            columns[name] = column
+        closes = columns["Close"]
+        if not actions:
+            return {ticker: closes[ticker].dropna().rename("Close") for ticker in tickers if ticker in closes}
+        return {ticker: pd.DataFrame({name: column[ticker] for name, column in columns.items()})
+                .dropna(subset=["Close"]).fillna(0.0)
+                for ticker in tickers if ticker in closes}
+
+
+_provider = YahooProvider()
+_scheduler = FetchScheduler(_provider)
+
+
+def get_provider():
+    """Return the market data provider every fetch goes through."""
+    return _provider
+
+
+def get_scheduler():
+    """Return the scheduler that coalesces, rate limits and batches provider calls."""
+    return _scheduler
+
+
+def set_provider(provider, scheduler=None):
+    """Swap the market data provider (e.g. for an offline synthetic market).
+
+    The shared price store and metadata cache are replaced with in-memory ones
+    so data from different providers never mixes on disk.
+    """
+    global _provider, _scheduler
+    _provider = provider
+    _scheduler = scheduler or FetchScheduler(provider)
+    set_price_store(_new_price_store(":memory:"))
+    set_metadata_cache(MetadataCache(":memory:", fetcher=download_info))
+
+
+def download_info(ticker):
+    """Download the full info dict for a ticker."""
+    return _scheduler.info(ticker)
+
+
+def get_metadata_cache():
+    """Return the shared ticker info cache."""
+    global _metadata_cache
+    if _metadata_cache is None:
+        _metadata_cache = MetadataCache(DEFAULT_METADATA_PATH, fetcher=download_info)
+    return _metadata_cache
+
+
+def set_metadata_cache(cache):
+    """Replace the shared ticker info cache."""
+    global _metadata_cache
+    _metadata_cache = cache
+
+
+def fetch_ticker_info(ticker, max_age=None):
+    """Return cached sector/quote type/market state info for a ticker."""
+    return get_metadata_cache().get(ticker, max_age=max_age)
 
 def fetch_current_price(ticker):
     """Fetch the most recent market price. Use pre-market price only if market is closed."""
     try:
-        stock = yf.Ticker(ticker)
-        stock_info = stock.info
+        stock_info = fetch_ticker_info(ticker, max_age=QUOTE_INFO_TTL)
 
         # Get market state (Regular, Pre, Post, Closed)
         market_state = stock_info.get("marketState", "CLOSED").upper()
 
         # If market is open, get live price
         if market_state in ["REGULAR", "OPEN"]:
-            history = stock.history(period="1d", interval="1m")
+            history = _scheduler.history(ticker, period="1d", interval="1m")
             if not history.empty:
-                latest_price = history["Close"].iloc[-1]
+                latest_price = history.iloc[-1]
                 print(f"Market Open - Using LIVE price for {ticker}: {latest_price}")
                 return latest_price
 
@@ -27,9 +144,9 @@ def fetch_current_price(ticker):
                 return pre_market_price
 
         # If neither live nor pre-market price is available, use last closing price
-        history = stock.history(period="5d")  # Fetch last 5 days to avoid missing data
+        history = _scheduler.history(ticker, period="5d")  # Fetch last 5 days to avoid missing data
         if not history.empty:
-            close_price = history["Close"].dropna().iloc[-1]  # Drop NaN values and get last close
+            close_price = history.dropna().iloc[-1]  # Drop NaN values and get last close
             print(f" No live/pre-market data - Using LAST CLOSE price for {ticker}: {close_price}")
             return close_price
 
@@ -42,12 +159,65 @@ def fetch_current_price(ticker):
 
 
 
-def fetch_historical_prices(ticker, period="6mo"):
-    """Fetch historical prices for a stock over a given period."""
+def download_history(ticker, start, end=None):
+    """Download daily closes with dividends and splits between two dates (end exclusive)."""
     try:
-        stock = yf.Ticker(ticker)
-        history = stock.history(period=period)
-        return history["Close"]  # Returns closing prices
+        return _scheduler.history(ticker, start=start, end=end, actions=True)
+    except Exception as e:
+        print(f"Error fetching historical prices for {ticker}: {e}")
+        return None
+
+
+def download_histories(tickers, start, end=None):
+    """Download daily closes with dividends and splits of many tickers over one range: {ticker: frame or None}."""
+    return _scheduler.history_many(tickers, start=start, end=end, actions=True)
+
+
+def _new_price_store(path):
+    return PriceStore(path, downloader=download_history, batch_downloader=download_histories)
+
+
+def get_price_store():
+    """Return the shared on-disk price store, seeding it from the JSON file on first use."""
+    global _price_store
+    if _price_store is None:
+        _price_store = _new_price_store(DEFAULT_DB_PATH)
+        if not _price_store.tickers():
+            _price_store.import_json(DEFAULT_JSON_PATH)
+    return _price_store
+
+
+def set_price_store(store):
+    """Replace the shared price store (e.g. with an in-memory one)."""
+    global _price_store
+    _price_store = store
+
+
+def fetch_historical_prices(ticker, period="6mo", adjustment="total_return"):
+    """Fetch historical prices for a stock over a given period.
+
+    `adjustment` is "total_return" (splits and reinvested dividends, for
+    returns), "adjusted" (splits only, for price charts) or "raw".
+    """
+    try:
+        history = get_price_store().get_history(ticker, period=period, adjustment=adjustment)
+        return history  # Returns closing prices
     except Exception as e:
         print(f"Error fetching historical prices for {ticker}: {e}")
         return None
+
+
+def fetch_historical_prices_many(tickers, period="6mo", max_workers=8, adjustment="total_return"):
+    """Fetch historical prices for many tickers: {ticker: Series, or None on failure}.
+
+    Tickers already up to date in the store are read from disk in one query;
+    only stale ones go to the network, in batched downloads. `adjustment` is
+    as for `fetch_historical_prices`.
+    """
+    unique = list(dict.fromkeys(tickers))
+    try:
+        return get_price_store().get_histories(unique, period=period, max_workers=max_workers,
+                                               adjustment=adjustment)
+    except Exception as e:
+        print(f"Error fetching historical prices for {', '.join(unique)}: {e}")
+        return {ticker: None for ticker in unique}
@@ -0,0 +1,460 @@
+import datetime
+import json
+import os
+import sqlite3
+import threading
+
+from services import metrics
+
+DEFAULT_DB_PATH = os.path.join("data", "price_history.sqlite")
+DEFAULT_JSON_PATH = os.path.join("data", "historical_prices.json")
+
+# Calendar lengths for the yfinance style period strings used across the app
+PERIOD_DAYS = {
+    "1d": 1, "5d": 5, "1mo": 31, "3mo": 92, "6mo": 183,
+    "1y": 366, "2y": 731, "5y": 1827, "10y": 3653, "20y": 7305,
+}
+EARLIEST_DATE = datetime.date(1900, 1, 1)
+SCHEMA_VERSION = 1
+
+# "raw": closes as traded; "adjusted": back-adjusted for splits; "total_return": also for reinvested dividends
+ADJUSTMENTS = ("raw", "adjusted", "total_return")
+
+
+def period_start(period, today=None):
+    """Translate a period string ("6mo", "1y", "ytd", "max") into a start date."""
+    today = today or datetime.date.today()
+    if period == "max":
+        return EARLIEST_DATE
+    if period == "ytd":
+        return datetime.date(today.year, 1, 1)
+    if period not in PERIOD_DAYS:
+        raise ValueError(f"Unsupported period: {period}")
+    return today - datetime.timedelta(days=PERIOD_DAYS[period])
+
+
+def covering_period(date, today=None):
+    """The shortest period string that reaches back before `date` ("max" if none does)."""
+    for period in sorted(PERIOD_DAYS, key=PERIOD_DAYS.get):
+        if period_start(period, today) < date:
+            return period
+    return "max"
+
+
+def _to_series(rows):
+    """Build a close Series and its adjustment factors from (ISO date, close, split factor, total factor) rows.
+
+    Rows must be sorted by date. Returns (Series, {adjustment: factor array}).
+    """
+    import numpy as np
+    import pandas as pd
+
+    if not rows:
+        empty = np.empty(0)
+        series = pd.Series(dtype="float64", index=pd.DatetimeIndex([], name="Date"), name="Close")
+        return series, {"adjusted": empty, "total_return": empty}
+    dates, closes, split_factors, total_factors = zip(*rows)
+    # Parsing ISO strings through numpy is much faster than the generic pandas parser
+    index = pd.DatetimeIndex(np.array(dates, dtype="datetime64[D]").astype("datetime64[ns]"), name="Date")
+    factors = {"adjusted": np.array(split_factors, dtype=np.float64),
+               "total_return": np.array(total_factors, dtype=np.float64)}
+    return pd.Series(closes, index=index, name="Close", dtype="float64"), factors
+
+
+def _cumulative(event_dates, event_factors, dates):
+    """Product of the event factors dated on or before each date (event dates sorted)."""
+    import numpy as np
+
+    products = np.concatenate(([1.0], np.cumprod(event_factors)))
+    return products[np.searchsorted(event_dates, dates, side="right")]
+
+
+def _later(event_dates, event_factors, dates):
+    """Product of the event factors dated after each date (event dates sorted)."""
+    import numpy as np
+
+    products = np.append(np.cumprod(event_factors[::-1])[::-1], 1.0)
+    return products[np.searchsorted(event_dates, dates, side="right")]
+
+
+class PriceStore:
+    """Local SQLite store of daily closes keyed by ticker and date.
+
+    The store remembers which date range was requested for every ticker, so a
+    second request for the same range is served from disk and a request on a
+    later day only downloads the missing trailing days. Series that have been
+    read are kept in memory until their ticker is written again.
+
+    Closes are stored as traded, next to the ticker's splits and dividends
+    (the actions table). Every row also keeps the product of the split ratios,
+    and of the split ratios and dividend factors, of the events on or before
+    its date; reads divide those by the latest row's to serve split-adjusted
+    or total-return series (`ADJUSTMENTS`) without touching the raw closes.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, downloader=None, batch_downloader=None):
+        self.path = path
+        self.downloader = downloader  # (ticker, start, end) -> Series or None
+        self.batch_downloader = batch_downloader  # (tickers, start, end) -> {ticker: Series or None}
+        self.version = 0  # Bumped every time new rows are written
+        self._lock = threading.RLock()
+        # ticker -> (start, {adjustment: Series of every stored close from start}, factors), dropped on write
+        self._series = {}
+
+        directory = os.path.dirname(path)
+        if directory and path != ":memory:":
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS prices (
+                ticker TEXT NOT NULL,
+                date TEXT NOT NULL,
+                close REAL NOT NULL,
+                split_factor REAL NOT NULL DEFAULT 1.0,
+                total_factor REAL NOT NULL DEFAULT 1.0,
+                PRIMARY KEY (ticker, date)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS actions (
+                ticker TEXT NOT NULL,
+                date TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                value REAL NOT NULL,
+                factor REAL NOT NULL,
+                PRIMARY KEY (ticker, date, kind)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS coverage (
+                ticker TEXT PRIMARY KEY,
+                start TEXT NOT NULL,
+                last_fetch TEXT NOT NULL
+            );
+            """
+        )
+        self._migrate()
+        self._conn.commit()
+
+    def _migrate(self):
+        """Bring a store written by an older version up to SCHEMA_VERSION."""
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(prices)")}
+            for column in ("split_factor", "total_factor"):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE prices ADD COLUMN {column} REAL NOT NULL DEFAULT 1.0")
+            # Older stores kept closes as downloaded, already adjusted and without their events: keep them
+            # for offline reads, but forget the coverage so the next refresh downloads raw closes and actions
+            self._conn.execute("DELETE FROM coverage")
+        self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+    # ---------------------------------------------------------------- reads
+
+    def get_history(self, ticker, period="6mo", refresh=True, adjustment="total_return"):
+        """Return closing prices for a ticker, downloading only what is missing."""
+        start = period_start(period)
+        if refresh and self.downloader is not None:
+            self._refresh(ticker, start)
+        return self.read(ticker, start, adjustment=adjustment)
+
+    def read(self, ticker, start=None, end=None, adjustment="total_return"):
+        """Read stored closes as a Series indexed by date (no network access)."""
+        return self.read_many([ticker], start, end, adjustment)[ticker]
+
+    def read_many(self, tickers, start=None, end=None, adjustment="total_return"):
+        """Read stored closes for many tickers (no network access): {ticker: Series}.
+
+        `adjustment` is one of `ADJUSTMENTS`; adjusted series end at the
+        latest stored raw close and are scaled back from there. Series already
+        read since the ticker was last written are sliced from memory; the
+        rest are loaded with a single query.
+        """
+        import pandas as pd
+
+        if adjustment not in ADJUSTMENTS:
+            raise ValueError(f"Unknown price adjustment: {adjustment}")
+        tickers = list(dict.fromkeys(tickers))
+        start = start or EARLIEST_DATE
+        with self._lock:
+            missing = [ticker for ticker in tickers
+                       if ticker not in self._series or self._series[ticker][0] > start]
+            metrics.count("price_store.memory_hits", len(tickers) - len(missing))
+            if missing:
+                with metrics.timer("price_store.query"):
+                    rows = self._conn.execute(
+                        "SELECT ticker, date, close, split_factor, total_factor FROM prices"
+                        " WHERE ticker IN (SELECT value FROM json_each(?)) AND date >= ? ORDER BY ticker, date",
+                        (json.dumps(missing), start.isoformat()),
+                    ).fetchall()
+                    grouped = {ticker: [] for ticker in missing}
+                    for ticker, *row in rows:
+                        grouped[ticker].append(row)
+                    for ticker, ticker_rows in grouped.items():
+                        closes, factors = _to_series(ticker_rows)
+                        self._series[ticker] = (start, {"raw": closes}, factors)
+                metrics.count("price_store.query.tickers", len(missing))
+                metrics.count("price_store.query.rows", len(rows))
+            cached = {ticker: self._adjusted(ticker, adjustment) for ticker in tickers}
+
+        # Slices are copied so callers may modify what they get back
+        lower = pd.Timestamp(start)
+        upper = pd.Timestamp(end) if end is not None else None
+        return {ticker: series.loc[lower:upper].copy() for ticker, series in cached.items()}
+
+    def _adjusted(self, ticker, adjustment):
+        """The cached series of a ticker with `adjustment` applied, computed once per load."""
+        import numpy as np
+
+        _, views, factors = self._series[ticker]
+        if adjustment not in views:
+            raw, factor = views["raw"], factors[adjustment]
+            if not len(factor) or np.all(factor == factor[-1]):
+                views[adjustment] = raw  # No events in the stored range
+            else:
+                views[adjustment] = raw * (factor / factor[-1])
+        return views[adjustment]
+
+    def get_histories(self, tickers, period="6mo", refresh=True, max_workers=8, adjustment="total_return"):
+        """Closing prices for many tickers: stale ones are refreshed together, then all are read at once.
+
+        With a batch downloader, stale tickers needing the same date range are
+        downloaded in one call; otherwise they are downloaded concurrently.
+        """
+        start = period_start(period)
+        tickers = list(dict.fromkeys(tickers))
+        if refresh and self.downloader is not None:
+            stale = [ticker for ticker in tickers if not self._is_fresh(ticker, start)]
+            metrics.count("price_store.stale", len(stale))
+            with metrics.timer("price_store.refresh"):
+                if len(stale) > 1 and self.batch_downloader is not None:
+                    self._refresh_many(stale, start)
+                elif len(stale) > 1 and max_workers > 1:
+                    from concurrent.futures import ThreadPoolExecutor
+
+                    with ThreadPoolExecutor(max_workers=min(max_workers, len(stale))) as executor:
+                        list(executor.map(lambda ticker: self._refresh(ticker, start), stale))
+                else:
+                    for ticker in stale:
+                        self._refresh(ticker, start)
+        return self.read_many(tickers, start, adjustment=adjustment)
+
+    def tickers(self):
+        """List every ticker with stored prices."""
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT ticker FROM prices ORDER BY ticker").fetchall()
+        return [row[0] for row in rows]
+
+    def last_date(self, ticker):
+        """Return the most recent stored date for a ticker, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(date) FROM prices WHERE ticker = ?", (ticker,)).fetchone()
+        return datetime.date.fromisoformat(row[0]) if row and row[0] else None
+
+    # --------------------------------------------------------------- writes
+
+    def write(self, ticker, prices):
+        """Insert or overwrite closes for a ticker; returns the number of rows written.
+
+        `prices` is either a date-indexed Series of closes as traded, or a
+        provider frame with "Close", "Dividends" and "Stock Splits" columns.
+        As Yahoo reports them, the frame's closes and dividends are adjusted
+        for every split up to today, so they are converted back to traded
+        amounts using all splits known for the ticker. New or revised events
+        rescale the factors of the stored rows from their date on; rows
+        before the event are not touched.
+        """
+        import numpy as np
+        import pandas as pd
+
+        frame = prices.to_frame("Close") if isinstance(prices, pd.Series) else prices
+        frame = frame[frame["Close"].notna()]
+        if frame.empty:
+            return 0
+
+        index = pd.DatetimeIndex(frame.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)  # Keep the exchange-local calendar date
+        days = index.values.astype("datetime64[D]")
+        dates = np.datetime_as_string(days, unit="D").tolist()
+        closes = frame["Close"].to_numpy(dtype=np.float64)
+        ratios = frame["Stock Splits"].to_numpy(dtype=np.float64) if "Stock Splits" in frame else np.zeros(len(days))
+        amounts = frame["Dividends"].to_numpy(dtype=np.float64) if "Dividends" in frame else np.zeros(len(days))
+        split_rows = np.flatnonzero((ratios > 0) & (ratios != 1.0))
+        dividend_rows = np.flatnonzero(amounts > 0)
+
+        with self._lock:
+            stored = self._conn.execute("SELECT date, kind, factor FROM actions WHERE ticker = ?", (ticker,))
+            known = {(date, kind): factor for date, kind, factor in stored}
+
+            if "Stock Splits" in frame:
+                splits = {date: factor for (date, kind), factor in known.items() if kind == "split"}
+                splits.update((dates[i], ratios[i]) for i in split_rows)
+                split_dates = sorted(splits)
+                later = _later(np.array(split_dates, dtype="datetime64[D]"),
+                               np.array([splits[date] for date in split_dates]), days)
+                closes = closes * later
+                amounts = amounts * later
+            events = [(dates[i], "split", ratios[i], ratios[i]) for i in split_rows]
+            # A dividend's factor is the previous close over that close less the dividend (Yahoo's convention);
+            # the first row's previous close is the stored one, or the ex-date close plus the dividend if none
+            previous = np.concatenate(([np.nan], closes[:-1]))
+            if len(dividend_rows) and dividend_rows[0] == 0:
+                stored = self._conn.execute("SELECT close FROM prices WHERE ticker = ? AND date < ?"
+                                            " ORDER BY date DESC LIMIT 1", (ticker, dates[0])).fetchone()
+                previous[0] = stored[0] if stored is not None else closes[0] + amounts[0]
+            events += [(dates[i], "dividend", amounts[i], previous[i] / (previous[i] - amounts[i]))
+                       for i in dividend_rows]
+            # Only new or revised events change any factors
+            events = [event for event in events if abs(event[3] / known.get(event[:2], 1.0) - 1.0) >= 1e-12]
+            self._conn.executemany("INSERT OR REPLACE INTO actions (ticker, date, kind, value, factor)"
+                                   " VALUES (?, ?, ?, ?, ?)", [(ticker, *event) for event in events])
+
+            # Stored rows are rescaled by the changes on or before their date, with one UPDATE per
+            # stretch between consecutive changed dates so every row is touched once
+            changes = {}
+            for date, kind, _, factor in events:
+                split_change, total_change = changes.get(date, (1.0, 1.0))
+                change = factor / known.get((date, kind), 1.0)
+                changes[date] = (split_change * (change if kind == "split" else 1.0), total_change * change)
+            readjusted, split_change, total_change = 0, 1.0, 1.0
+            change_dates = sorted(changes)
+            for date, following in zip(change_dates, change_dates[1:] + ["9999-12-31"]):
+                split_change *= changes[date][0]
+                total_change *= changes[date][1]
+                cursor = self._conn.execute(
+                    "UPDATE prices SET split_factor = split_factor * ?, total_factor = total_factor * ?"
+                    " WHERE ticker = ? AND date >= ? AND date < ?",
+                    (split_change, total_change, ticker, date, following))
+                readjusted += cursor.rowcount
+
+            # Written rows (replacing any rescaled above) take their factors from every event known now
+            for date, kind, value, factor in events:
+                known[(date, kind)] = factor
+            event_keys = sorted(known)
+            event_dates = np.array([date for date, _ in event_keys], dtype="datetime64[D]")
+            event_factors = np.array([known[key] for key in event_keys], dtype=np.float64)
+            is_split = np.array([kind == "split" for _, kind in event_keys], dtype=bool)
+            split_factors = _cumulative(event_dates[is_split], event_factors[is_split], days)
+            total_factors = _cumulative(event_dates, event_factors, days)
+            rows = [(ticker, *row) for row in zip(dates, closes.tolist(), split_factors.tolist(),
+                                                   total_factors.tolist())]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO prices (ticker, date, close, split_factor, total_factor)"
+                " VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+            self.version += 1
+            self._series.pop(ticker, None)
+        metrics.count("price_store.rows_written", len(rows))
+        if events:
+            metrics.count("price_store.actions_applied", len(events))
+            metrics.count("price_store.rows_readjusted", readjusted)
+        return len(rows)
+
+    def _is_fresh(self, ticker, start):
+        """True when the stored range covers `start` and was fetched today."""
+        with self._lock:
+            row = self._conn.execute("SELECT start, last_fetch FROM coverage WHERE ticker = ?", (ticker,)).fetchone()
+        return (row is not None and datetime.date.fromisoformat(row[0]) <= start
+                and datetime.date.fromisoformat(row[1]) >= datetime.date.today())
+
+    def _plan(self, ticker, start):
+        """The (start, end) ranges to download so the ticker is covered from `start` to today.
+
+        Returns (ranges, covered_start) where covered_start is the start of the
+        stored range once those downloads succeed.
+        """
+        today = datetime.date.today()
+        with self._lock:
+            row = self._conn.execute("SELECT start, last_fetch FROM coverage WHERE ticker = ?", (ticker,)).fetchone()
+
+        if row is None:
+            ranges = [(start, None)]
+            covered_start = start
+        else:
+            covered_start = datetime.date.fromisoformat(row[0])
+            last_fetch = datetime.date.fromisoformat(row[1])
+            ranges = []
+            if last_fetch < today:
+                # Re-read from the last stored day so a partial intraday bar gets replaced
+                ranges.append((self.last_date(ticker) or covered_start, None))
+            if start < covered_start:
+                # After the tail, so splits since the last fetch are known when the head is converted
+                ranges.append((start, covered_start))
+                covered_start = start
+        return ranges, covered_start
+
+    def _refresh(self, ticker, start):
+        """Download the head and/or tail of the requested range that is not stored yet."""
+        ranges, covered_start = self._plan(ticker, start)
+        if not ranges:
+            return
+
+        for range_start, range_end in ranges:
+            history = self.downloader(ticker, range_start, range_end)
+            if history is None:
+                return  # Leave coverage untouched so the next call retries
+            self.write(ticker, history)
+        self._mark_covered(ticker, covered_start)
+
+    def _refresh_many(self, tickers, start):
+        """Refresh many tickers with one batch download per distinct date range."""
+        plans = {ticker: self._plan(ticker, start) for ticker in tickers}
+        groups = {}
+        for ticker, (ranges, _) in plans.items():
+            for date_range in ranges:
+                groups.setdefault(date_range, []).append(ticker)
+
+        failed = set()
+        # Tails first, as in `_plan`
+        for (range_start, range_end), group in sorted(groups.items(), key=lambda item: item[0][1] is not None):
+            histories = self.batch_downloader(group, range_start, range_end)
+            for ticker in group:
+                history = histories.get(ticker)
+                if history is None:
+                    failed.add(ticker)  # Leave coverage untouched so the next call retries
+                else:
+                    self.write(ticker, history)
+
+        for ticker, (ranges, covered_start) in plans.items():
+            if ranges and ticker not in failed:
+                self._mark_covered(ticker, covered_start)
+
+    def _mark_covered(self, ticker, covered_start):
+        today = datetime.date.today()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO coverage (ticker, start, last_fetch) VALUES (?, ?, ?)",
+                (ticker, covered_start.isoformat(), today.isoformat()),
+            )
+            self._conn.commit()
+
+    # ------------------------------------------------------- JSON interop
+
+    def import_json(self, path=DEFAULT_JSON_PATH):
+        """Load prices from a {ticker: {date: close}} JSON file, taken as closes without corporate actions."""
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return 0
+
+        import pandas as pd
+
+        with open(path) as f:
+            data = json.load(f)
+
+        count = 0
+        for ticker, series in data.items():
+            count += self.write(ticker, pd.Series(series, dtype="float64"))
+        return count
+
+    def export_json(self, path=DEFAULT_JSON_PATH, tickers=None):
+        """Write stored total-return prices to a {ticker: {date: close}} JSON file."""
+        data = {}
+        for ticker in tickers or self.tickers():
+            series = self.read(ticker, adjustment="total_return")
+            data[ticker] = {date.date().isoformat(): close for date, close in series.items()}
+
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+        return path
@@ -0,0 +1,171 @@
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+
+from services import metrics
+from services.price_fetcher import fetch_current_price, get_scheduler
+
+
+class QuoteSource:
+    """Interface for anything that can return the latest price of one ticker."""
+
+    def fetch_quote(self, ticker):
+        """Return the latest price for a ticker, or None if unavailable."""
+        raise NotImplementedError
+
+    def throttled(self, pause, resume):
+        """Context reporting rate-limit waits of fetches on this thread (see FetchScheduler.throttled).
+
+        Sources without a rate limit never wait.
+        """
+        return nullcontext()
+
+
+class YahooQuoteSource(QuoteSource):
+    """Quote source backed by Yahoo Finance through the price fetcher."""
+
+    def fetch_quote(self, ticker):
+        return fetch_current_price(ticker)
+
+    def throttled(self, pause, resume):
+        return get_scheduler().throttled(pause, resume)
+
+
+class FakeQuoteSource(QuoteSource):
+    """Offline quote source serving fixed prices, with optional latency and failures."""
+
+    def __init__(self, prices, latency=0.0, failure_rate=0.0, seed=None):
+        self.prices = dict(prices)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    def fetch_quote(self, ticker):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            raise ConnectionError(f"Simulated failure for {ticker}")
+        return self.prices.get(ticker)
+
+
+class QuoteEngine:
+    """Fetch quotes for many tickers at once with a bounded thread pool.
+
+    Tickers are deduplicated and each request is retried with exponential
+    backoff. Every attempt gets `timeout` seconds from when it starts, not
+    counting time spent waiting for the source's rate limit; a ticker whose
+    attempt runs over is given up (None, no more retries), so one hung
+    request cannot stall a refresh of the entire portfolio.
+    """
+
+    def __init__(self, source=None, max_workers=8, timeout=15.0, retries=2, backoff=0.5):
+        self.source = source or YahooQuoteSource()
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+    def _fetch_with_retry(self, ticker, attempts=None, abandoned=()):
+        """Fetch one quote, retrying failures and empty results with backoff.
+
+        The start time of the running attempt is kept in `attempts[ticker]`,
+        shifted forward by any rate-limit wait and absent during one; once the
+        ticker is in `abandoned` no further attempt is made.
+        """
+        attempts = {} if attempts is None else attempts
+        elapsed = [0.0]  # Attempt time before the current rate-limit wait
+
+        def pause():
+            start = attempts.pop(ticker, None)
+            if start is not None:
+                elapsed[0] = time.monotonic() - start
+
+        def resume():
+            attempts[ticker] = time.monotonic() - elapsed[0]
+
+        for attempt in range(self.retries + 1):
+            if ticker in abandoned:
+                return None
+            attempts[ticker] = time.monotonic()
+            try:
+                with metrics.timer("quotes.request"), self.source.throttled(pause, resume):
+                    price = self.source.fetch_quote(ticker)
+                if price is not None:
+                    return float(price)
+            except Exception as e:
+                if attempt == self.retries:
+                    print(f" Error fetching price for {ticker}: {e}")
+            finally:
+                attempts.pop(ticker, None)
+            if attempt < self.retries:
+                metrics.count("quotes.retries")
+                time.sleep(self.backoff * (2 ** attempt))
+        metrics.count("quotes.failures")
+        return None
+
+    def fetch_quotes(self, tickers):
+        """Return {ticker: price or None} for the unique tickers given."""
+        unique = list(dict.fromkeys(tickers))
+        if not unique:
+            return {}
+
+        workers = max(1, min(self.max_workers, len(unique)))
+        executor = ThreadPoolExecutor(max_workers=workers)
+        attempts, abandoned, late = {}, set(), set()
+        try:
+            with metrics.timer("quotes.batch"):
+                futures = {executor.submit(self._fetch_with_retry, ticker, attempts, abandoned): ticker
+                           for ticker in unique}
+                pending = set(futures)
+                while pending:
+                    if not self.timeout:
+                        wait(pending)
+                        break
+                    # Sleep until the oldest running attempt is due, or something finishes
+                    starts = [attempts.get(futures[future]) for future in pending]
+                    starts = [start for start in starts if start is not None]
+                    delay = min(starts) + self.timeout - time.monotonic() if starts else self.timeout
+                    _, pending = wait(pending, timeout=max(delay, 0.0), return_when=FIRST_COMPLETED)
+
+                    now = time.monotonic()
+                    for future in list(pending):
+                        start = attempts.get(futures[future])
+                        if start is not None and now - start >= self.timeout:
+                            late.add(future)
+                            abandoned.add(futures[future])
+                            pending.discard(future)
+                    if sum(not future.done() for future in late) >= workers:
+                        # Every worker is stuck on a hung request, so queued tickers would never start
+                        late.update(pending)
+                        abandoned.update(futures[future] for future in pending)
+                        pending = set()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        metrics.count("quotes.batch.tickers", len(unique))
+
+        quotes = {}
+        for future, ticker in futures.items():
+            quotes[ticker] = None if future in late else future.result()
+            if future in late:
+                metrics.count("quotes.timeouts")
+                print(f" Timed out fetching price for {ticker}")
+        return quotes
+
+    def refresh(self, assets):
+        """Fetch quotes for a list of assets and apply them in a single pass.
+
+        Returns a list of (asset, old_price, new_price) where new_price is None
+        for tickers that could not be fetched.
+        """
+        quotes = self.fetch_quotes(asset.ticker for asset in assets)
+        changes = []
+        for asset in assets:
+            new_price = quotes.get(asset.ticker)
+            old_price = asset.current_price
+            if new_price is not None:
+                asset.update_price(new_price)
+            changes.append((asset, old_price, new_price))
+        return changes
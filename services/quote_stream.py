@@ -0,0 +1,129 @@
+"""Streaming quote feeds for the live watch mode.
+
+A feed yields batches of (ticker, price, timestamp) ticks. `PollingQuoteFeed`
+polls a QuoteEngine and only passes on prices that changed since the last
+poll; `ReplayQuoteFeed` pushes stored closes bar by bar, standing in for a
+websocket-style push feed when working offline. Ticks are kept in a
+fixed-size `TickBuffer` so memory stays flat however long the watch runs.
+"""
+import time
+
+import numpy as np
+
+from services import metrics
+from services.quote_engine import QuoteEngine
+
+
+class TickBuffer:
+    """Ring buffer of the most recent ticks in preallocated NumPy columns."""
+
+    def __init__(self, capacity=65536):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.prices = np.zeros(capacity, dtype=np.float64)
+        self.codes = np.zeros(capacity, dtype=np.int32)
+        self.tickers = []
+        self._codes = {}
+        self.total = 0  # Ticks ever appended, including overwritten ones
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def code(self, ticker):
+        code = self._codes.get(ticker)
+        if code is None:
+            code = self._codes[ticker] = len(self.tickers)
+            self.tickers.append(ticker)
+        return code
+
+    def append(self, ticker, price, timestamp):
+        slot = self.total % self.capacity
+        self.times[slot] = timestamp
+        self.prices[slot] = price
+        self.codes[slot] = self.code(ticker)
+        self.total += 1
+
+    def extend(self, ticks):
+        for ticker, price, timestamp in ticks:
+            self.append(ticker, price, timestamp)
+
+    def recent(self, count=None):
+        """The last `count` ticks (all kept ticks by default), oldest first, as (ticker, price, timestamp)."""
+        count = len(self) if count is None else min(count, len(self))
+        slots = np.arange(self.total - count, self.total) % self.capacity
+        return [(self.tickers[code], float(price), float(timestamp))
+                for code, price, timestamp in zip(self.codes[slots], self.prices[slots], self.times[slots])]
+
+    def rate(self, seconds=60.0):
+        """Ticks per second over the last `seconds` of tick timestamps."""
+        if not len(self):
+            return 0.0
+        latest = self.times[(self.total - 1) % self.capacity]
+        kept = self.times[:len(self)]
+        return float(np.count_nonzero(kept > latest - seconds)) / seconds
+
+
+class QuoteFeed:
+    """Interface for a source of live ticks."""
+
+    def stream(self):
+        """Yield lists of (ticker, price, timestamp) ticks until the feed ends."""
+        raise NotImplementedError
+
+
+class PollingQuoteFeed(QuoteFeed):
+    """Polls quotes for a set of tickers every `interval` seconds and yields only the changes."""
+
+    def __init__(self, tickers, engine=None, interval=5.0, clock=time.time, sleep=time.sleep):
+        self.tickers = list(dict.fromkeys(tickers))
+        self.engine = engine or QuoteEngine()
+        self.interval = interval
+        self.clock = clock
+        self.sleep = sleep
+        self.last = {}
+
+    def poll(self):
+        """One round of quotes; returns the ticks whose price differs from the previous round."""
+        quotes = self.engine.fetch_quotes(self.tickers)
+        now = self.clock()
+        ticks = []
+        for ticker, price in quotes.items():
+            if price is not None and self.last.get(ticker) != price:
+                self.last[ticker] = price
+                ticks.append((ticker, price, now))
+        metrics.count("stream.polls")
+        metrics.count("stream.unchanged", len(quotes) - len(ticks))
+        return ticks
+
+    def stream(self):
+        while True:
+            started = self.clock()
+            yield self.poll()
+            self.sleep(max(0.0, self.interval - (self.clock() - started)))
+
+
+class ReplayQuoteFeed(QuoteFeed):
+    """Replays {ticker: close Series} one bar at a time, yielding the closes that changed.
+
+    `interval` is the pause between bars in seconds (0 replays as fast as the
+    consumer reads). Tick timestamps are the bar dates, so a replay of daily
+    closes behaves like a day-by-day live session.
+    """
+
+    def __init__(self, price_data, interval=0.0, sleep=time.sleep):
+        from models.valuation import aligned_price_matrix
+
+        self.prices, dates, self.tickers = aligned_price_matrix(price_data)
+        self.times = dates.asi8 / 1e9 if len(dates) else np.empty(0)
+        self.interval = interval
+        self.sleep = sleep
+
+    def stream(self):
+        previous = np.zeros(len(self.tickers))
+        for row, timestamp in zip(self.prices, self.times):
+            # Zeros are days before a ticker's first close
+            changed = np.flatnonzero((row != previous) & (row > 0))
+            previous = row
+            yield [(self.tickers[i], float(row[i]), float(timestamp)) for i in changed]
+            if self.interval:
+                self.sleep(self.interval)
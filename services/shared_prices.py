@@ -0,0 +1,111 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from services.price_store import period_start
+
+
+def _attach(name):
+    """Open an existing shared memory block without taking ownership of it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 registers every attach with the resource tracker. Pool
+        # workers share the creator's tracker, where the name is already
+        # registered, so this is harmless as long as only the creator unlinks.
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedPriceMatrix:
+    """Daily closes of many tickers on one calendar, held in shared memory.
+
+    The creating process fetches every series once and copies them into a
+    (days x tickers) float64 block, with NaN where a ticker has no close.
+    Worker processes attach to the block by name without copying it and use
+    the matrix as a read-only price store (`set_price_store`), so analytics
+    running in the workers never touch the network or the SQLite store.
+    The matrix holds the series from `start` on with one price adjustment
+    (total return by default); reads reaching back before `start` or asking
+    for another adjustment raise ValueError rather than return less data
+    than the regular store would.
+    """
+
+    version = 0  # Never written, so analytics caches keyed on it stay valid
+
+    def __init__(self, block, tickers, dates, owner=False, adjustment="total_return", start=None):
+        self._block = block
+        self.adjustment = adjustment
+        self.start = start
+        self.tickers = list(tickers)
+        self.dates = np.asarray(dates, dtype="datetime64[ns]")
+        self.owner = owner
+        self.values = np.ndarray((len(self.dates), len(self.tickers)), dtype=np.float64, buffer=block.buf)
+        self._columns = {ticker: i for i, ticker in enumerate(self.tickers)}
+
+    @classmethod
+    def create(cls, price_data, adjustment="total_return", start=None):
+        """Copy {ticker: close Series} with the given adjustment, loaded from `start`, into a new shared block."""
+        import pandas as pd
+
+        series = {ticker: prices for ticker, prices in price_data.items() if prices is not None and not prices.empty}
+        if series:
+            frame = pd.concat(series, axis=1, sort=True)
+            values, tickers, dates = frame.to_numpy(dtype=np.float64), list(frame.columns), frame.index.to_numpy()
+        else:
+            values, tickers, dates = np.empty((0, 0)), [], np.array([], dtype="datetime64[ns]")
+
+        block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        matrix = cls(block, tickers, dates, owner=True, adjustment=adjustment, start=start)
+        matrix.values[:] = values
+        return matrix
+
+    @classmethod
+    def attach(cls, name, tickers, dates, adjustment="total_return", start=None):
+        """Map a block created by another process (see `handle`)."""
+        return cls(_attach(name), tickers, dates, adjustment=adjustment, start=start)
+
+    def handle(self):
+        """Picklable (name, tickers, dates, adjustment, start) arguments for `attach`."""
+        return self._block.name, self.tickers, self.dates, self.adjustment, self.start
+
+    def close(self):
+        """Unmap the block; the creating process also frees it."""
+        self.values = None
+        self._block.close()
+        if self.owner:
+            self._block.unlink()
+
+    # ------------------------------------------------- price store interface
+
+    def read_many(self, tickers, start=None, end=None, adjustment="total_return"):
+        """Stored closes per ticker as {ticker: Series}; unknown tickers are empty."""
+        import pandas as pd
+
+        if adjustment != self.adjustment:
+            raise ValueError(f"Shared prices hold {self.adjustment} closes, not {adjustment}")
+        if self.start is not None and (start is None or start < self.start):
+            raise ValueError(f"Shared prices start on {self.start}, not {start or 'the first stored day'}")
+        first = 0 if start is None else np.searchsorted(self.dates, np.datetime64(start, "ns"))
+        last = len(self.dates) if end is None else np.searchsorted(self.dates, np.datetime64(end, "ns"), "right")
+        dates = self.dates[first:last]
+
+        result = {}
+        for ticker in dict.fromkeys(tickers):
+            column = self._columns.get(ticker)
+            if column is None:
+                result[ticker] = pd.Series(dtype="float64", index=pd.DatetimeIndex([], name="Date"), name="Close")
+                continue
+            closes = self.values[first:last, column]
+            present = ~np.isnan(closes)
+            result[ticker] = pd.Series(closes[present], index=pd.DatetimeIndex(dates[present], name="Date"),
+                                       name="Close")
+        return result
+
+    def read(self, ticker, start=None, end=None, adjustment="total_return"):
+        return self.read_many([ticker], start, end, adjustment)[ticker]
+
+    def get_history(self, ticker, period="6mo", refresh=True, adjustment="total_return"):
+        return self.read(ticker, period_start(period), adjustment=adjustment)
+
+    def get_histories(self, tickers, period="6mo", refresh=True, max_workers=8, adjustment="total_return"):
+        return self.read_many(tickers, period_start(period), adjustment=adjustment)
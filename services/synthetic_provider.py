@@ -0,0 +1,130 @@
+import datetime
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from services.price_store import period_start
+
+DIVIDEND_INTERVAL = 63  # Business days between the quarterly ex-dividend dates
+
+SECTORS = ["Technology", "Healthcare", "Financial Services", "Energy", "Industrials",
+           "Consumer Cyclical", "Consumer Defensive", "Utilities", "Real Estate",
+           "Basic Materials", "Communication Services"]
+
+
+class SyntheticMarketProvider:
+    """Deterministic offline market: correlated geometric Brownian motion per ticker.
+
+    Every ticker follows r = beta * market + idiosyncratic noise on a fixed
+    business-day calendar, with its own seed derived from the ticker name.
+    The same ticker and date always give the same price, regardless of which
+    range is requested or in which order, so results are reproducible.
+
+    Some tickers pay quarterly dividends and some split 2:1 once. Plain
+    history is the total-return series, adjusted like Yahoo's default; with
+    `actions=True` the traded price (split-adjusted up to today) comes with
+    the dividends and splits, which compound back to exactly that series.
+    """
+
+    def __init__(self, seed=0, origin=datetime.date(2000, 1, 3), end=None, market_drift=0.0003,
+                 market_volatility=0.01, idiosyncratic_volatility=0.015, latency=0.0):
+        self.seed = seed
+        self.end = end or datetime.date.today()
+        self.calendar = pd.bdate_range(origin, self.end)
+        self.idiosyncratic_volatility = idiosyncratic_volatility
+        self.latency = latency
+        self.calls = 0
+
+        rng = np.random.default_rng([seed, 0])
+        self._market = rng.normal(market_drift, market_volatility, len(self.calendar))
+        self._cache = {}
+        self._events = {}  # ticker -> (quarterly dividend yield, first ex-date position, split position or None)
+
+    def _ticker_seed(self, ticker):
+        return [self.seed, zlib.crc32(ticker.encode())]
+
+    def series(self, ticker):
+        """Full synthetic close series for a ticker over the whole calendar."""
+        if ticker not in self._cache:
+            rng = np.random.default_rng(self._ticker_seed(ticker))
+            beta = rng.uniform(0.5, 1.5)
+            start_price = rng.uniform(10, 500)
+            noise = rng.normal(0.0, self.idiosyncratic_volatility, len(self.calendar))
+            log_returns = np.log1p(beta * self._market + noise)
+            prices = start_price * np.exp(np.cumsum(log_returns))
+            self._cache[ticker] = pd.Series(prices, index=self.calendar, name="Close")
+
+            # Corporate actions, drawn after the prices so those stay as they were
+            dividend_yield = rng.choice([0.0, rng.uniform(0.002, 0.012)])
+            first_ex_date = int(rng.integers(DIVIDEND_INTERVAL))
+            split_day = int(rng.integers(len(self.calendar))) if rng.uniform() < 0.3 else None
+            self._events[ticker] = (dividend_yield, first_ex_date, split_day)
+        return self._cache[ticker]
+
+    def actions(self, ticker):
+        """Traded closes (split-adjusted), dividends and split ratios over the whole calendar, as a frame."""
+        prices = self.series(ticker)
+        dividend_yield, first_ex_date, split_day = self._events[ticker]
+        days = len(self.calendar)
+        ex_dates = np.arange(first_ex_date, days, DIVIDEND_INTERVAL)
+
+        # Each dividend drops the price by its amount, so the traded price lags the total return
+        retained = np.ones(days)
+        retained[ex_dates] = 1.0 - dividend_yield
+        retained = np.cumprod(retained)
+        traded = prices.to_numpy() * retained / retained[-1]
+        dividends = np.zeros(days)  # Each pays `dividend_yield` of the previous close
+        previous = np.concatenate(([traded[0]], traded[:-1]))
+        dividends[ex_dates] = previous[ex_dates] * dividend_yield
+        splits = np.zeros(days)
+        if split_day is not None:
+            splits[split_day] = 2.0
+        return pd.DataFrame({"Close": traded, "Dividends": dividends, "Stock Splits": splits}, index=self.calendar)
+
+    def _wait(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def history(self, ticker, start=None, end=None, period=None, interval="1d", actions=False):
+        """Closing prices between start and end (exclusive), or over a period string."""
+        self._wait()
+        return self._closes(ticker, start, end, period, actions)
+
+    def download(self, tickers, start=None, end=None, interval="1d", actions=False):
+        """Closing prices of many tickers in one request, as {ticker: Series, or frame with `actions`}."""
+        self._wait()
+        return {ticker: self._closes(ticker, start, end, actions=actions) for ticker in tickers}
+
+    def _closes(self, ticker, start=None, end=None, period=None, actions=False):
+        prices = self.actions(ticker) if actions else self.series(ticker)
+        if period is not None:
+            start = period_start(period, today=self.end)
+        if start is not None:
+            prices = prices[prices.index >= pd.Timestamp(start)]
+        if end is not None:
+            prices = prices[prices.index < pd.Timestamp(end)]
+        return prices.copy()
+
+    def info(self, ticker):
+        """Static metadata; the market is always closed so quotes use the last close."""
+        self._wait()
+        rng = np.random.default_rng(self._ticker_seed(ticker))
+        return {
+            "sector": SECTORS[int(rng.integers(len(SECTORS)))],
+            "quoteType": "EQUITY",
+            "longName": f"Synthetic {ticker}",
+            "currency": "USD",
+            "marketState": "CLOSED",
+        }
+
+    def quote(self, ticker):
+        """Latest synthetic close."""
+        self._wait()
+        return float(self.series(ticker).iloc[-1])
+
+    def tickers(self, count, prefix="SYN"):
+        """Generate `count` ticker names."""
+        return [f"{prefix}{i:04d}" for i in range(count)]
@@ -1,22 +1,23 @@
+import sys
+import time
+
 from tabulate import tabulate
 
+from services import metrics
+from views.table_view import HoldingsTable
+
 class CLIView:
     @staticmethod
-    def display_portfolio(portfolio):
-        """Display the portfolio including transaction value but not the raw current price."""
+    def display_portfolio(portfolio, page=1, page_size=50, **options):
+        """Display one page of the holdings, formatting only the rows shown; `options` go to HoldingsTable."""
         if not portfolio.assets:
             print(" No assets in portfolio.")
-            return
+            return None
 
+        table = HoldingsTable(portfolio.holdings, **options)
         print("\n Portfolio Overview:\n")
-        headers = ["Ticker", "Sector", "Asset Class", "Quantity", "Purchase Price", "Transaction Value", "Current Value"]
-
-        data = [[
-            asset.ticker, asset.sector, asset.asset_class, asset.quantity,
-            f"${asset.purchase_price:,.2f}", f"${asset.transaction_value():,.2f}", f"${asset.current_value():,.2f}"
-        ] for asset in portfolio.assets]
-
-        print(tabulate(data, headers=headers, tablefmt="grid"))
+        print(table.render(page, page_size))
+        return table
 
 
     @staticmethod
@@ -44,3 +45,117 @@ class CLIView:
         else:
             print("No sector weight data available.")
 
+    @staticmethod
+    def display_monte_carlo(result):
+        """Display the summary of a Monte Carlo simulation."""
+        print(f" Expected portfolio value in {result['days']} days: ${result['expected_value']:,.2f}")
+        print(f" 5th percentile: ${result['percentiles'][5]:,.2f}")
+        print(f" 95th percentile: ${result['percentiles'][95]:,.2f}")
+        print(f" Value at Risk ({result['confidence']:.0%}): ${result['var']:,.2f}")
+        print(f" Conditional VaR ({result['confidence']:.0%}): ${result['cvar']:,.2f}")
+
+    @staticmethod
+    def display_allocation(weights):
+        """Display optimized weights per ticker."""
+        for ticker, weight in weights.items():
+            print(f"🔹 {ticker}: {weight * 100:.2f}% allocation")
+
+    @staticmethod
+    def display_risk_windows(windows):
+        """Display rolling risk metrics, one row per window length."""
+        rows = [[
+            f"{window}d", f"{m['sharpe_ratio']:.2f}", f"{m['sortino_ratio']:.2f}", f"{m['volatility']:.2%}",
+            f"{m['max_drawdown']:.2%}", f"{m['var']:.2%}", "-" if m["beta"] is None else f"{m['beta']:.2f}"
+        ] for window, m in windows.items() if m is not None]
+        if rows:
+            print(tabulate(rows, headers=["Window", "Sharpe", "Sortino", "Volatility", "Max Drawdown", "VaR 95%", "Beta"], tablefmt="grid"))
+
+    @staticmethod
+    def display_pnl(pnl):
+        """Display cost basis, market value and realized/unrealized P&L per ticker."""
+        if len(pnl) <= 1:
+            print(" No transactions recorded.")
+            return
+
+        fields = ["cost_basis", "market_value", "realized", "unrealized", "dividends", "total"]
+        rows = [[ticker, f"{row['quantity']:g}"] + [f"${row[field]:,.2f}" for field in fields]
+                for ticker, row in pnl.items() if ticker != "total"]
+        rows.append(["Total", ""] + [f"${pnl['total'][field]:,.2f}" for field in fields])
+        print(tabulate(rows, headers=["Ticker", "Quantity", "Cost Basis", "Market Value", "Realized", "Unrealized", "Dividends", "Total P&L"], tablefmt="grid"))
+
+    @staticmethod
+    def display_backtest(stats):
+        """Display backtest statistics, one row per strategy."""
+        rows = [[
+            name.replace("_", " ").title(), f"${s['final_value']:,.2f}", f"{s['cagr']:.2%}", f"{s['volatility']:.2%}",
+            f"{s['sharpe_ratio']:.2f}", f"{s['max_drawdown']:.2%}", f"{s['average_turnover']:.1%}", f"${s['costs']:,.2f}"
+        ] for name, s in stats.items()]
+        print(tabulate(rows, headers=["Strategy", "Final Value", "CAGR", "Volatility", "Sharpe", "Max Drawdown", "Turnover", "Costs"], tablefmt="grid"))
+
+    @staticmethod
+    def display_stress(result, top=5):
+        """Display the P&L of each stress scenario and, if simulated, the tail risk and its largest sources."""
+        rows = []
+        for name, scenario in result["scenarios"].items():
+            worst = min(scenario["sectors"].items(), key=lambda item: item[1], default=("-", 0.0))
+            rows.append([name.replace("_", " "), f"${scenario['pnl']:,.2f}", f"{scenario['return']:.2%}",
+                         f"{worst[0]} (${worst[1]:,.2f})", len(scenario.get("filled", ()))])
+        print(f"\n Stress Scenarios (portfolio value ${result['value']:,.2f}):\n")
+        print(tabulate(rows, headers=["Scenario", "P&L", "Return", "Worst Sector", "Proxied Tickers"], tablefmt="grid"))
+
+        simulated = result["simulated"]
+        if simulated:
+            print(f"\n {simulated['num_scenarios']:,} simulated {simulated['days']}-day scenarios "
+                  f"(volatility x{simulated['stress']:g}):")
+            print(f" Value at Risk ({simulated['confidence']:.0%}): ${simulated['var']:,.2f}")
+            print(f" Expected Shortfall: ${simulated['expected_shortfall']:,.2f}")
+            print(f" Worst scenario: ${simulated['worst']:,.2f}")
+            tail = sorted(simulated["tail"]["assets"].items(), key=lambda item: item[1])[:top]
+            print(" Largest tail losses: " + ", ".join(f"{ticker} ${pnl:,.2f}" for ticker, pnl in tail))
+
+    @staticmethod
+    def display_live(snapshot, recent_ticks=(), stream=None, clear=False):
+        """Display one frame of the live watch: totals, the largest positions and the latest ticks."""
+        stream = stream or sys.stdout
+        lines = []
+        if clear:
+            lines.append("\033[H\033[J")  # Cursor home and clear screen
+        lines.append(f" Live Portfolio Value: ${snapshot['total_value']:,.2f}  "
+                     f"({snapshot['change']:+,.2f} / {snapshot['change_pct']:+.2%})  "
+                     f"Unrealized P&L: ${snapshot['unrealized']:,.2f}  Ticks: {snapshot['ticks']}\n")
+        rows = [[ticker, f"${snapshot['prices'][ticker]:,.2f}", f"{weight:.2%}"]
+                for ticker, weight in snapshot["asset_weights"].items()]
+        lines.append(tabulate(rows, headers=["Ticker", "Price", "Weight"], tablefmt="grid"))
+        if snapshot["sector_weights"]:
+            lines.append("\n Sectors: " + ", ".join(f"{k} {v:.1%}" for k, v in snapshot["sector_weights"].items()))
+        if recent_ticks:
+            lines.append(" Last ticks: " + ", ".join(f"{ticker} {price:,.2f}" for ticker, price, _ in recent_ticks))
+        stream.write("\n".join(lines) + "\n")
+        stream.flush()
+
+
+class LiveDisplay:
+    """Redraws the live watch at most once every `min_interval` seconds, and only after new ticks."""
+
+    def __init__(self, min_interval=0.5, top=10, stream=None, clock=time.monotonic):
+        self.min_interval = min_interval
+        self.top = top
+        self.stream = stream or sys.stdout
+        self.clear = self.stream.isatty()
+        self.clock = clock
+        self._drawn_at = None
+        self._drawn_ticks = None
+
+    def refresh(self, valuation, buffer=None, force=False):
+        """Draw a frame if one is due; returns True when it drew."""
+        now = self.clock()
+        if not force:
+            if valuation.ticks == self._drawn_ticks:
+                return False
+            if self._drawn_at is not None and now - self._drawn_at < self.min_interval:
+                return False
+        with metrics.timer("stream.render"):
+            CLIView.display_live(valuation.snapshot(top=self.top), buffer.recent(5) if buffer is not None else (),
+                                 stream=self.stream, clear=self.clear)
+        self._drawn_at, self._drawn_ticks = now, valuation.ticks
+        return True
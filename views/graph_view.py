@@ -1,35 +1,219 @@
-import matplotlib.pyplot as plt
-import pandas as pd
+import hashlib
+import os
+import re
 
+import numpy as np
+
+from services import metrics
+
+MONTE_CARLO_BANDS = ((5, 95), (25, 75))
+
+
+# matplotlib and pandas are imported inside each method: pyplot alone takes
+# about half a second to import and most sessions never draw a chart.
 class GraphView:
+    """Draws charts on screen, or headless to PNG/SVG files.
+
+    In headless mode (`configure(headless=True)` or PORTFOLIO_HEADLESS=1) the
+    Agg backend is used without pyplot, one Figure per chart kind is reused,
+    and each chart is written to `output_dir` under a name derived from a hash
+    of its data, so rendering the same data twice returns the existing file.
+    Saving a chart removes the older files of the same kind, so the directory
+    holds one file per chart. Long series are decimated to `max_points` before drawing.
+    """
+
+    headless = os.environ.get("PORTFOLIO_HEADLESS") == "1"
+    output_dir = os.path.join("data", "charts")
+    image_format = "png"
+    max_points = 2000
+    _figures = {}
+
+    @classmethod
+    def configure(cls, headless=None, output_dir=None, image_format=None, max_points=None):
+        """Change rendering settings; None leaves a setting unchanged."""
+        if headless is not None:
+            cls.headless = headless
+        if output_dir is not None:
+            cls.output_dir = output_dir
+        if image_format is not None:
+            cls.image_format = image_format
+        if max_points is not None:
+            cls.max_points = max_points
+
+    # ------------------------------------------------------------- helpers
+
+    @classmethod
+    def _cache_path(cls, name, parts):
+        """Output file for a chart, named by a hash of everything that affects it."""
+        digest = hashlib.sha1(name.encode())
+        for part in parts:
+            digest.update(part if isinstance(part, bytes) else repr(part).encode())
+        digest.update(repr((cls.image_format, cls.max_points)).encode())
+        return os.path.join(cls.output_dir, f"{name}-{digest.hexdigest()[:16]}.{cls.image_format}")
+
+    @classmethod
+    def _axes(cls, name):
+        """A cleared Axes on the reused figure for this chart kind."""
+        if cls.headless:
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            from matplotlib.figure import Figure
+
+            figure = cls._figures.get(name)
+            if figure is None:
+                figure = Figure(figsize=(10, 5))
+                FigureCanvasAgg(figure)
+                cls._figures[name] = figure
+            figure.clear()
+        else:
+            import matplotlib.pyplot as plt
+
+            figure = plt.figure(name, figsize=(10, 5))
+            figure.clear()
+        return figure.add_subplot()
+
+    @classmethod
+    def _finish(cls, axes, path):
+        """Save the figure in headless mode (returning its path) or show it."""
+        if cls.headless:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with metrics.timer("charts.save"):
+                axes.figure.savefig(path, format=cls.image_format)
+            cls._prune(path)
+            return path
+
+        import matplotlib.pyplot as plt
+
+        plt.show()
+        return None
+
+    @staticmethod
+    def _prune(path):
+        """Delete the other hashed files of the chart kind just saved to `path`."""
+        directory, filename = os.path.split(path)
+        pattern = re.compile(re.escape(filename.rsplit("-", 1)[0]) + r"-[0-9a-f]{16}\.(png|svg)")
+        for other in os.listdir(directory):
+            if other != filename and pattern.fullmatch(other):
+                os.remove(os.path.join(directory, other))
+                metrics.count("charts.pruned")
+
+    @classmethod
+    def _decimate(cls, x, y):
+        """Keep the min and max of each bucket so peaks survive downsampling."""
+        if len(y) <= cls.max_points:
+            return x, y
+        buckets = np.array_split(np.arange(len(y)), cls.max_points // 2)
+        keep = np.unique(np.concatenate([[b[np.argmin(y[b])], b[np.argmax(y[b])]] for b in buckets]))
+        return x[keep], y[keep]
+
     @staticmethod
-    def plot_asset_prices(price_data, current_prices):
+    def _series_key(series):
+        return [series.index.asi8.tobytes() if hasattr(series.index, "asi8") else repr(list(series.index)),
+                np.asarray(series.values, dtype=np.float64).tobytes()]
+
+    # -------------------------------------------------------------- charts
+
+    @classmethod
+    def plot_asset_prices(cls, price_data, current_prices):
         """Plot historical price data with the latest current price."""
-        plt.figure(figsize=(10, 5))
+        import pandas as pd
 
+        series = {}
         for ticker, prices in price_data.items():
             if prices is not None and not prices.empty:
                 prices.index = prices.index.tz_localize(None)
-                if ticker in current_prices:
+                if current_prices.get(ticker) is not None:
                     today = pd.Timestamp("now").normalize()
                     prices.loc[today] = current_prices[ticker]
-                prices.plot(label=ticker)
+                series[ticker] = prices
 
-        plt.xlabel("Date")
-        plt.ylabel("Price (USD)")
-        plt.title(" Current & Historical Asset Prices")
-        plt.legend()
-        plt.grid()
-        plt.show()
+        key = [part for ticker, prices in series.items() for part in [ticker] + cls._series_key(prices)]
+        path = cls._cache_path("asset-prices", key)
+        if cls.headless and os.path.exists(path):
+            return path
 
-    @staticmethod
-    def plot_portfolio_performance(portfolio_value):
+        axes = cls._axes("asset-prices")
+        for ticker, prices in series.items():
+            x, y = cls._decimate(prices.index.to_numpy(), prices.to_numpy(dtype=np.float64))
+            axes.plot(x, y, label=ticker)
+
+        axes.set_xlabel("Date")
+        axes.set_ylabel("Price (USD)")
+        axes.set_title(" Current & Historical Asset Prices")
+        axes.legend()
+        axes.grid()
+        return cls._finish(axes, path)
+
+    @classmethod
+    def plot_portfolio_performance(cls, portfolio_value):
         """Plot portfolio value over time."""
-        plt.figure(figsize=(10, 5))
-        portfolio_value.plot(color='blue', label='Portfolio Value', linewidth=2)
-        plt.xlabel("Date")
-        plt.ylabel("Total Portfolio Value (USD)")
-        plt.title(" Portfolio Performance Over Time")
-        plt.legend()
-        plt.grid()
-        plt.show()
+        path = cls._cache_path("portfolio-performance", cls._series_key(portfolio_value))
+        if cls.headless and os.path.exists(path):
+            return path
+
+        axes = cls._axes("portfolio-performance")
+        x, y = cls._decimate(portfolio_value.index.to_numpy(), portfolio_value.to_numpy(dtype=np.float64))
+        axes.plot(x, y, color='blue', label='Portfolio Value', linewidth=2)
+        axes.set_xlabel("Date")
+        axes.set_ylabel("Total Portfolio Value (USD)")
+        axes.set_title(" Portfolio Performance Over Time")
+        axes.legend()
+        axes.grid()
+        return cls._finish(axes, path)
+
+    @classmethod
+    def plot_backtest(cls, curves):
+        """Plot the equity curve of each backtested strategy ({name: value Series})."""
+        key = [part for name, curve in curves.items() for part in [name] + cls._series_key(curve)]
+        path = cls._cache_path("backtest", key)
+        if cls.headless and os.path.exists(path):
+            return path
+
+        axes = cls._axes("backtest")
+        for name, curve in curves.items():
+            x, y = cls._decimate(curve.index.to_numpy(), curve.to_numpy(dtype=np.float64))
+            axes.plot(x, y, label=name.replace("_", " ").title(), linewidth=1.5)
+        axes.set_xlabel("Date")
+        axes.set_ylabel("Portfolio Value (USD)")
+        axes.set_title(" Backtest of Rebalancing Strategies")
+        axes.legend()
+        axes.grid()
+        return cls._finish(axes, path)
+
+    @classmethod
+    def plot_monte_carlo(cls, simulations, mode="fan", max_paths=100, seed=0):
+        """Plot simulated value paths (one row per simulation).
+
+        mode="fan" draws percentile bands and the median; mode="paths" draws a
+        random sample of at most `max_paths` paths as a single LineCollection.
+        """
+        from matplotlib.collections import LineCollection
+
+        simulations = np.asarray(simulations, dtype=np.float64)
+        path = cls._cache_path(f"monte-carlo-{mode}", [simulations.shape, simulations.tobytes(), max_paths, seed])
+        if cls.headless and os.path.exists(path):
+            return path
+
+        axes = cls._axes("monte-carlo")
+        days = np.arange(simulations.shape[1])
+
+        if mode == "fan":
+            levels = sorted({p for band in MONTE_CARLO_BANDS for p in band} | {50})
+            percentiles = dict(zip(levels, np.percentile(simulations, levels, axis=0)))
+            for alpha, (low, high) in zip((0.2, 0.35), MONTE_CARLO_BANDS):
+                axes.fill_between(days, percentiles[low], percentiles[high], color="blue", alpha=alpha,
+                                  linewidth=0, label=f"{low}th-{high}th percentile")
+            axes.plot(days, percentiles[50], color="blue", linewidth=1.5, label="Median")
+            axes.legend(loc="upper left")
+        else:
+            rng = np.random.default_rng(seed)
+            rows = simulations
+            if len(rows) > max_paths:
+                rows = rows[np.sort(rng.choice(len(rows), max_paths, replace=False))]
+            segments = np.stack([np.broadcast_to(days, rows.shape), rows], axis=-1)
+            axes.add_collection(LineCollection(segments, colors="blue", alpha=0.1, linewidths=1))
+            axes.autoscale_view()
+
+        axes.set_title(f"Monte Carlo Portfolio Projection ({len(simulations)} Simulations)")
+        axes.set_xlabel("Days")
+        axes.set_ylabel("Portfolio Value")
+        return cls._finish(axes, path)
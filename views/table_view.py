@@ -0,0 +1,173 @@
+"""Sorted, filtered and paged holdings tables.
+
+`HoldingsTable` picks its rows once with vectorized selects on the columnar
+holdings and keeps them as arrays of codes and numbers. Only the rows that
+are shown get turned into text: `render` formats a single page, and the CSV
+and JSON writers stream the rows in chunks, so memory stays flat however
+large the book is.
+"""
+import csv
+import json
+
+import numpy as np
+from tabulate import tabulate
+
+from services import metrics
+
+GROUP_BY = ("ticker", "sector", "asset_class")
+LOT_COLUMNS = ("ticker", "sector", "asset_class", "quantity", "purchase_price", "transaction_value",
+               "current_value", "weight")
+GROUP_COLUMNS = ("lots", "quantity", "transaction_value", "current_value", "weight")
+SORT_COLUMNS = LOT_COLUMNS + ("lots", "current_price")
+HEADERS = {
+    "ticker": "Ticker", "sector": "Sector", "asset_class": "Asset Class", "lots": "Lots", "quantity": "Quantity",
+    "purchase_price": "Purchase Price", "transaction_value": "Transaction Value", "current_value": "Current Value",
+    "weight": "Weight",
+}
+FORMATS = {
+    "quantity": "{:,.10g}".format, "lots": "{:d}".format, "purchase_price": "${:,.2f}".format,
+    "transaction_value": "${:,.2f}".format, "current_value": "${:,.2f}".format, "weight": "{:.2%}".format,
+}
+CHUNK_ROWS = 10_000
+
+
+class HoldingsTable:
+    """One view of the holdings: lots or per-group totals, filtered, sorted and optionally cut to the top rows.
+
+    With `group_by` ("ticker", "sector" or "asset_class") lots are summed per
+    group first. With `top`, only the first `top` rows are kept (by current
+    value, largest first, unless `sort` is given) and the rest are folded
+    into one "Other" row. Weights are shares of the whole book's value, so
+    they do not change when filtering.
+    """
+
+    def __init__(self, holdings, sort=None, descending=False, sector=None, asset_class=None, prefix=None,
+                 top=None, group_by=None):
+        if group_by is not None and group_by not in GROUP_BY:
+            raise ValueError(f"Cannot group holdings by {group_by}")
+        if sort is not None and sort not in SORT_COLUMNS:
+            raise ValueError(f"Cannot sort holdings by {sort}")
+        if top is not None and sort is None:
+            sort, descending = "current_value", True
+
+        with metrics.timer("table.select"):
+            book_value = holdings.total_value()
+            if group_by is None:
+                if sort == "lots":
+                    raise ValueError("Lots can only be sorted by lot count when grouped")
+                self.names = LOT_COLUMNS
+                rows = holdings.select(sector, asset_class, prefix, {"weight": "current_value"}.get(sort, sort),
+                                       descending)
+                self.columns = {name: holdings.column(name)[rows]
+                                for name in ("ticker", "sector", "asset_class", "quantity", "purchase_price")}
+                self.columns["transaction_value"] = self.columns["quantity"] * self.columns["purchase_price"]
+                self.columns["current_value"] = self.columns["quantity"] * holdings.column("current_price")[rows]
+            else:
+                self.names = (group_by,) + GROUP_COLUMNS
+                self.columns = holdings.aggregate(group_by, holdings.select(sector, asset_class, prefix))
+                if sort is not None:
+                    self._sort_groups(holdings, group_by, sort, descending)
+            self.columns["weight"] = self.columns["current_value"] / book_value if book_value else \
+                np.zeros(len(self.columns["current_value"]))
+            self.labels = {name: holdings.tables[name].labels for name in GROUP_BY if name in self.columns}
+
+            self.totals = {name: float(self.columns[name].sum())
+                           for name in ("transaction_value", "current_value", "weight")}
+            self.totals["lots"] = int(self.columns["lots"].sum()) if "lots" in self.columns else len(rows)
+            self.other = None
+            if top is not None and len(self.columns["current_value"]) > top:
+                self.other = self._fold(top)
+
+    def _sort_groups(self, holdings, group_by, sort, descending):
+        if sort in GROUP_BY and sort != group_by:
+            raise ValueError(f"Cannot sort {group_by} totals by {sort}")
+        if sort == group_by:
+            key = holdings.label_ranks(group_by)[self.columns[group_by]]
+        elif sort in ("purchase_price", "current_price"):
+            raise ValueError(f"Cannot sort {group_by} totals by {sort}")
+        else:
+            key = self.columns["current_value" if sort == "weight" else sort]
+        order = np.argsort(-key if descending else key, kind="stable")
+        self.columns = {name: column[order] for name, column in self.columns.items()}
+
+    def _fold(self, top):
+        """Keep the first `top` rows and return the totals of the rest."""
+        rest = {name: column[top:] for name, column in self.columns.items()}
+        self.columns = {name: column[:top] for name, column in self.columns.items()}
+        lots = int(rest["lots"].sum()) if "lots" in rest else len(rest["current_value"])
+        other = {name: float(rest[name].sum()) for name in ("quantity", "transaction_value", "current_value", "weight")}
+        other.update({name: "" for name in self.names if name in GROUP_BY})
+        other[self.names[0]] = f"Other ({lots} lots)"
+        other["lots"] = lots
+        other["purchase_price"] = other["transaction_value"] / other["quantity"] if other["quantity"] else 0.0
+        return other
+
+    def __len__(self):
+        return len(self.columns["current_value"]) + (self.other is not None)
+
+    # ------------------------------------------------------------ rows
+
+    def rows(self, start=0, stop=None):
+        """Rows `start` to `stop` as lists of plain values in `self.names` order, labels decoded."""
+        count = len(self.columns["current_value"])
+        stop = len(self) if stop is None else min(stop, len(self))
+        cells = []
+        for name in self.names:
+            values = self.columns[name][start:min(stop, count)].tolist()
+            if name in self.labels:
+                labels = self.labels[name]
+                values = [labels[code] for code in values]
+            cells.append(values)
+        rows = [list(row) for row in zip(*cells)]
+        if self.other is not None and stop > count >= start:
+            rows.append([self.other[name] for name in self.names])
+        return rows
+
+    def records(self, start=0, stop=None):
+        """Rows as JSON-friendly dicts."""
+        return [dict(zip(self.names, row)) for row in self.rows(start, stop)]
+
+    def _chunks(self, start, stop, chunk_rows):
+        stop = len(self) if stop is None else min(stop, len(self))
+        for first in range(start, stop, chunk_rows):
+            yield self.rows(first, min(first + chunk_rows, stop))
+
+    # ------------------------------------------------------------ output
+
+    def render(self, page=1, page_size=50):
+        """One page as a text table, with the position and totals underneath."""
+        pages = max(1, -(-len(self) // page_size))
+        page = min(max(page, 1), pages)
+        start = (page - 1) * page_size
+        with metrics.timer("table.render"):
+            rows = [[FORMATS[name](value) if name in FORMATS and value != "" else value
+                     for name, value in zip(self.names, row)]
+                    for row in self.rows(start, start + page_size)]
+            lines = [tabulate(rows, headers=[HEADERS[name] for name in self.names], tablefmt="grid")]
+        lines.append(f" Rows {start + 1 if rows else 0}-{start + len(rows)} of {len(self)} (page {page}/{pages})  "
+                     f"Lots: {self.totals['lots']}  Transaction Value: ${self.totals['transaction_value']:,.2f}  "
+                     f"Current Value: ${self.totals['current_value']:,.2f} ({self.totals['weight']:.2%} of book)")
+        return "\n".join(lines)
+
+    def write_csv(self, stream, portfolio=None, header=True, start=0, stop=None, chunk_rows=CHUNK_ROWS):
+        """Stream rows `start` to `stop` (all by default) as CSV, `chunk_rows` at a time.
+
+        With `portfolio` its path is written as the first column of every row.
+        """
+        writer = csv.writer(stream)
+        prefix = [] if portfolio is None else [portfolio]
+        if header:
+            writer.writerow((["portfolio"] if prefix else []) + list(self.names))
+        for chunk in self._chunks(start, stop, chunk_rows):
+            writer.writerows(prefix + row for row in chunk)
+            metrics.count("table.rows_written", len(chunk))
+
+    def write_json(self, stream, start=0, stop=None, chunk_rows=CHUNK_ROWS):
+        """Stream rows `start` to `stop` (all by default) as a JSON array with one object per line."""
+        stream.write("[")
+        separator = "\n    "
+        for chunk in self._chunks(start, stop, chunk_rows):
+            stream.write(separator + ",\n    ".join(json.dumps(dict(zip(self.names, row))) for row in chunk))
+            separator = ",\n    "
+            metrics.count("table.rows_written", len(chunk))
+        stream.write("]" if separator == "\n    " else "\n  ]")